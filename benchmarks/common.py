@@ -0,0 +1,43 @@
+"""Module with the tools shared by the benchmark programs.
+
+Functions:
+  get_commit.
+  get_run_data.
+"""
+import os
+import platform
+import subprocess
+from controls.commons_controls.time import get_time
+
+def get_commit():
+  """Return the git commit of the repository.
+
+  Returns:
+    String commit hash, None if it is not available.
+  """
+  try:
+    return subprocess.check_output(
+      ['git', 'rev-parse', 'HEAD'],
+      cwd=os.path.dirname(os.path.realpath(__file__)),
+      stderr=subprocess.DEVNULL
+    ).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def get_run_data(benchmark):
+  """Return the data of a benchmark run, to compare results across commits and machines.
+
+  Args:
+    benchmark: Name of the benchmark.
+
+  Returns:
+    Dictionary with the benchmark name, date, commit, python version, platform and CPUs.
+  """
+  return {
+    'benchmark': benchmark,
+    'date': get_time().isoformat(),
+    'commit': get_commit(),
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'cpus': os.cpu_count()
+  }
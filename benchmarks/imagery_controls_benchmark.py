@@ -0,0 +1,318 @@
+"""Benchmark of the image controls on synthetic GeoTIFFs generated with GDAL.
+
+Every case generates one image with a size, number of bands, data type, layout, overviews
+and nodata, times every RasterManager statistic and the end-to-end control_img of every
+control, and reports MB/s, files/s and peak RSS. The image is generated in one process and
+the case runs in another one, so the peak RSS is the one of the controls. Results are written as JSON, to compare them across commits.
+
+Examples:
+  $python imagery_controls_benchmark.py -h.
+  $python imagery_controls_benchmark.py results.json.
+  $python imagery_controls_benchmark.py results.json --sizes 1000 5000 --bands 1 3
+  --dtypes uint8 --layouts tiled.
+
+Functions:
+  get_args.
+  get_cases.
+  get_case_name.
+  create_image.
+  create_case_image.
+  get_peak_rss.
+  run_case.
+  main.
+"""
+import os
+import sys
+import argparse
+import gettext
+import itertools
+import json
+import multiprocessing
+import shutil
+import tempfile
+import time
+import numpy as np
+from osgeo import gdal
+# add top level package to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+#pylint: disable=wrong-import-position
+from controls.imagery_controls.enums import Control
+from controls.imagery_controls.raster import RasterManager
+from controls.imagery_controls import main as imagery
+from controls.commons_controls.file import FileFormat
+from benchmarks.common import get_run_data
+#pylint: enable=wrong-import-position
+try:
+  import resource
+except ImportError:
+  resource = None
+_ = gettext.gettext
+
+# GDAL type, numpy type and random values range of every data type
+DTYPES = {
+  'uint8': (gdal.GDT_Byte, np.uint8, 255),
+  'uint16': (gdal.GDT_UInt16, np.uint16, 4095),
+  'float32': (gdal.GDT_Float32, np.float32, 1000.0)
+}
+LAYOUTS = ['tiled', 'striped']
+NODATA = 0
+# conform and deviation values of every control, as in a production run
+CONTROLS = {
+  Control.pixel_size.value: (0.5, 0.1),
+  Control.bands_len.value: (3, None),
+  Control.dig_level.value: (8, None),
+  Control.rad_balance.value: (0.01, 0.01),
+  Control.nodata.value: (0.05, None)
+}
+
+def get_args():
+  """ Return arguments from input. """
+  parser = argparse.ArgumentParser(
+    description=_(
+      'benchmark the image controls on synthetic images'
+    )
+  )
+  parser.add_argument('output', help=_('JSON results file'))
+  parser.add_argument(
+    '--sizes',
+    type=int,
+    nargs='+',
+    default=[1000, 5000, 10000, 30000],
+    help=_('width and height of the images, in pixels'))
+  parser.add_argument(
+    '--bands',
+    type=int,
+    nargs='+',
+    default=[1, 2, 3, 4],
+    help=_('number of bands of the images'))
+  parser.add_argument(
+    '--dtypes',
+    choices=list(DTYPES),
+    nargs='+',
+    default=list(DTYPES),
+    help=_('data types of the images'))
+  parser.add_argument(
+    '--layouts',
+    choices=LAYOUTS,
+    nargs='+',
+    default=LAYOUTS,
+    help=_('layouts of the images'))
+  parser.add_argument(
+    '--overviews',
+    choices=['yes', 'no'],
+    nargs='+',
+    default=['yes', 'no'],
+    help=_('images with and without overviews'))
+  parser.add_argument(
+    '--nodata',
+    choices=['yes', 'no'],
+    nargs='+',
+    default=['yes', 'no'],
+    help=_('images with and without nodata'))
+  parser.add_argument(
+    '--repeat',
+    type=int,
+    default=3,
+    help=_('number of runs of every control'))
+  parser.add_argument(
+    '--work-dir',
+    default=None,
+    help=_('folder of the synthetic images (default a temporary folder)'))
+  parser.add_argument(
+    '--keep',
+    action='store_true',
+    help=_('keep the synthetic images'))
+  args = parser.parse_args()
+  return args
+
+def get_cases(args):
+  """ Return the list of cases of the benchmark.
+
+  Args:
+    args: Arguments from input.
+
+  Returns:
+    List of dictionaries with the size, bands, dtype, layout, overviews and nodata of the
+    images.
+  """
+  cases = []
+  for size, bands, dtype, layout, overviews, nodata in itertools.product(
+      args.sizes, args.bands, args.dtypes, args.layouts, args.overviews, args.nodata):
+    cases.append({
+      'size': size,
+      'bands': bands,
+      'dtype': dtype,
+      'layout': layout,
+      'overviews': overviews == 'yes',
+      'nodata': nodata == 'yes'
+    })
+  return cases
+
+def get_case_name(case):
+  """ Return the name of the folder of a case. """
+  return '{size}_{bands}_{dtype}_{layout}_{overviews:d}_{nodata:d}'.format(**case)
+
+def create_image(file_path, case):
+  """ Create a synthetic GeoTIFF and its world file. The image is written by strips of rows,
+  so memory does not grow with the size.
+
+  Args:
+    file_path: Path of the image.
+    case: Dictionary with the size, bands, dtype, layout, overviews and nodata of the image.
+  """
+  gdal_type, dtype, vmax = DTYPES[case['dtype']]
+  size = case['size']
+  options = ['BIGTIFF=IF_SAFER']
+  if case['layout'] == 'tiled':
+    options += ['TILED=YES', 'BLOCKXSIZE=256', 'BLOCKYSIZE=256']
+  driver = gdal.GetDriverByName('GTiff')
+  dataset = driver.Create(file_path, size, size, case['bands'], gdal_type, options)
+  dataset.SetGeoTransform((0.0, 0.5, 0.0, 0.0, 0.0, -0.5))
+  rng = np.random.default_rng(size + case['bands'])
+  rows = max(1, (16 * 1024 * 1024) // (size * np.dtype(dtype).itemsize))
+  for b__ in range(case['bands']):
+    band = dataset.GetRasterBand(b__ + 1)
+    if case['nodata']:
+      band.SetNoDataValue(NODATA)
+    for row in range(0, size, rows):
+      height = min(rows, size - row)
+      # strips built with the type of the image, not with int64 or float64
+      if case['dtype'] == 'float32':
+        arr = rng.standard_normal((height, size), dtype=dtype)
+        arr *= vmax / 8
+        arr += vmax / 2
+      else:
+        arr = rng.integers(1, vmax, (height, size), dtype=dtype, endpoint=True)
+      if case['nodata']:
+        # about 1% of nodata pixels
+        arr[rng.random((height, size), dtype=np.float32) < 0.01] = NODATA
+      band.WriteArray(arr, 0, row)
+  if case['overviews']:
+    dataset.BuildOverviews('AVERAGE', [2, 4, 8, 16])
+  dataset = None
+  with open('{}.tfw'.format(file_path[:-4]), 'w') as twf_file:
+    twf_file.write('0.5\n0.0\n0.0\n-0.5\n0.25\n-0.25\n')
+
+def create_case_image(case, work_dir):
+  """ Create the synthetic image of a case, in its own process, so its memory is not counted
+  in the peak RSS of the case.
+
+  Args:
+    case: Dictionary with the size, bands, dtype, layout, overviews and nodata of the image.
+    work_dir: Folder of the synthetic image.
+
+  Returns:
+    Seconds to create the image.
+  """
+  gdal.UseExceptions()
+  case_dir = os.path.join(work_dir, get_case_name(case))
+  os.makedirs(case_dir, exist_ok=True)
+  start = time.perf_counter()
+  create_image(os.path.join(case_dir, 'img.tif'), case)
+  return time.perf_counter() - start
+
+def get_peak_rss():
+  """ Return the peak resident set size of the process in MB, None if it is not available. """
+  if resource is None:
+    return None
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # kilobytes in Linux, bytes in macOS
+  if sys.platform == 'darwin':
+    return rss / (1024 * 1024)
+  return rss / 1024
+
+def run_case(case, work_dir, repeat, create_seconds):
+  """ Run a case of the benchmark, on the image created by create_case_image.
+
+  Args:
+    case: Dictionary with the size, bands, dtype, layout, overviews and nodata of the image.
+    work_dir: Folder of the synthetic image.
+    repeat: Number of runs of every control.
+    create_seconds: Seconds to create the image.
+
+  Returns:
+    Dictionary with the case, the MB of the image and the results.
+  """
+  # statistics are not written to .aux.xml files, so every run computes them
+  gdal.SetConfigOption('GDAL_PAM_ENABLED', 'NO')
+  gdal.UseExceptions()
+  case_dir = os.path.join(work_dir, get_case_name(case))
+  img = os.path.join(case_dir, 'img.tif')
+  file_mb = case['size'] * case['size'] * case['bands'] \
+    * np.dtype(DTYPES[case['dtype']][1]).itemsize / 2**20
+  result = dict(case)
+  result['file_mb'] = file_mb
+  result['create_seconds'] = create_seconds
+  # every RasterManager statistic, with a new manager
+  statistics = {
+    'open': lambda raster: None,
+    'get_raster_units_per_pixel': lambda raster: raster.get_raster_units_per_pixel(),
+    'get_raster_bands_len': lambda raster: raster.get_raster_bands_len(),
+    'get_raster_bands_datatype': lambda raster: raster.get_raster_bands_datatype(),
+    'get_raster_bands_rad_balance': lambda raster: raster.get_raster_bands_rad_balance(0.01),
+    'get_raster_bands_nodata': lambda raster: raster.get_raster_bands_nodata()
+  }
+  result['statistics'] = {}
+  for statistic, function in statistics.items():
+    seconds = []
+    for __ in range(repeat):
+      start = time.perf_counter()
+      function(RasterManager(img))
+      seconds.append(time.perf_counter() - start)
+    best = min(seconds)
+    result['statistics'][statistic] = {
+      'seconds': best,
+      'mb_s': file_mb / best if best > 0 else None
+    }
+  # end to end control of the image
+  fman = imagery.init_file_manager(os.path.join(case_dir, 'output'), Control.aall.value)
+  result['control_img'] = {}
+  for control, (conform, deviation) in CONTROLS.items():
+    args = argparse.Namespace(
+      control=control, conform=conform, deviation=deviation, detail='detail', twf=True,
+      format=FileFormat.csv.value)
+    imagery.init_detail_file(fman, args.detail, control, args.format)
+    summary_data = {}
+    imagery.init_summary_data('', 1, summary_data)
+    start = time.perf_counter()
+    for __ in range(repeat):
+      imagery.control_img(fman, img, args, summary_data)
+    seconds = time.perf_counter() - start
+    result['control_img'][control] = {
+      'seconds': seconds / repeat,
+      'mb_s': file_mb * repeat / seconds if seconds > 0 else None,
+      'files_s': repeat / seconds if seconds > 0 else None
+    }
+  result['peak_rss_mb'] = get_peak_rss()
+  return result
+
+def main():
+  """Main procedure."""
+  args = get_args()
+  work_dir = args.work_dir or tempfile.mkdtemp(prefix='imagery_benchmark_')
+  os.makedirs(work_dir, exist_ok=True)
+  cases = get_cases(args)
+  results = get_run_data('imagery_controls')
+  results['gdal'] = gdal.__version__
+  results['numpy'] = np.__version__
+  results['cases'] = []
+  # a new process for every image and every case, so the peak RSS is the one of the case
+  context = multiprocessing.get_context('spawn')
+  try:
+    with context.Pool(1, maxtasksperchild=1) as pool:
+      for i__, case in enumerate(cases):
+        print('{} {}/{}: {}'.format(_('Case'), i__ + 1, len(cases), case))
+        create_seconds = pool.apply(create_case_image, (case, work_dir))
+        results['cases'].append(
+          pool.apply(run_case, (case, work_dir, args.repeat, create_seconds)))
+        if not args.keep:
+          shutil.rmtree(os.path.join(work_dir, get_case_name(case)), ignore_errors=True)
+  finally:
+    with open(args.output, 'w', encoding='utf-8') as json_file:
+      json.dump(results, json_file, indent=2)
+    if not args.keep and not args.work_dir:
+      shutil.rmtree(work_dir, ignore_errors=True)
+  print('{}.'.format(_('End')))
+
+if __name__ == '__main__':
+  main()
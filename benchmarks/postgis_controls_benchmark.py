@@ -0,0 +1,335 @@
+"""Benchmark of the vectorial controls on synthetic schemas loaded in a local PostGIS.
+
+For every number of rows, a schema is generated in the database with a table of points, one
+of lines and one of polygons, with controlled rates of invalid, duplicate, multipart, null
+and intersecting features. Every get_* method of PGDBManager and get_not_allowed_intersection
+is timed on every table, and the EXPLAIN (ANALYZE, BUFFERS) of their queries is captured.
+Results are written as JSON, to serve as a regression baseline.
+
+Examples:
+  $python postgis_controls_benchmark.py -h.
+  $python postgis_controls_benchmark.py test_vector_db test_user test_password results.json.
+  $python postgis_controls_benchmark.py test_vector_db test_user test_password results.json
+  --rows 10000 100000 --invalid 0.05 --methods invalid duplicate.
+
+Functions:
+  get_args.
+  get_rates.
+  table_query.
+  create_schema.
+  drop_schema.
+  get_admissibles.
+  explain_query.
+  time_method.
+  run_table.
+  main.
+"""
+import os
+import sys
+import argparse
+import gettext
+import json
+import math
+import time
+import psycopg2
+# add top level package to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+#pylint: disable=wrong-import-position
+from controls.postgis_controls.pgdb import (
+  PGDBManager, PGDBConnection, PGDBCredentials, invalid_geoms_query, duplicate_geoms_query,
+  multipart_geoms_query, null_geoms_query, intersection_query
+)
+from benchmarks.common import get_run_data
+#pylint: enable=wrong-import-position
+_ = gettext.gettext
+
+# categories of the synthetic features, in the order of their rates
+CATEGORIES = ['null', 'invalid', 'duplicate', 'multipart', 'intersecting']
+# size of the cells of the grid of features, every feature is drawn in its cell
+CELL = 10
+# geometry of every table for every category, from the cell (x, y) and the previous cell
+# (px, py). Polygons, lines and points of a cell do not intersect, unless intersecting.
+GEOMETRIES = {
+  'polygons': {
+    'normal': 'ST_MakeEnvelope(x, y, x + 3, y + 3)',
+    'invalid': (
+      "ST_GeomFromText(format('POLYGON((%1$s %2$s,%3$s %4$s,%3$s %2$s,%1$s %4$s,%1$s %2$s))', "
+      'x, y, x + 3, y + 3))'),
+    'duplicate': 'ST_MakeEnvelope(px, py, px + 3, py + 3)',
+    'multipart': (
+      'ST_Collect(ST_MakeEnvelope(x, y, x + 1, y + 1), '
+      'ST_MakeEnvelope(x + 2, y + 2, x + 3, y + 3))'),
+    'intersecting': 'ST_MakeEnvelope(x, y, x + 6, y + 6)'
+  },
+  'linestrings': {
+    'normal': 'ST_MakeLine(ST_MakePoint(x + 4, y + 1), ST_MakePoint(x + 7, y + 4))',
+    'invalid': 'ST_MakeLine(ST_MakePoint(x + 4, y + 1), ST_MakePoint(x + 4, y + 1))',
+    'duplicate': (
+      'ST_MakeLine(ST_MakePoint(px + 4, py + 1), ST_MakePoint(px + 7, py + 4))'),
+    'multipart': (
+      'ST_Collect(ST_MakeLine(ST_MakePoint(x + 4, y + 1), ST_MakePoint(x + 5, y + 2)), '
+      'ST_MakeLine(ST_MakePoint(x + 6, y + 3), ST_MakePoint(x + 7, y + 4)))'),
+    'intersecting': (
+      'ST_MakeLine(ST_MakePoint(x + 4, y + 1), ST_MakePoint(x + 12, y + 3.5))')
+  },
+  'points': {
+    'normal': 'ST_MakePoint(x + 8.5, y + 8.5)',
+    'invalid': "ST_MakePoint('NaN'::float8, y + 8.5)",
+    'duplicate': 'ST_MakePoint(px + 8.5, py + 8.5)',
+    'multipart': 'ST_Collect(ST_MakePoint(x + 8.5, y + 8.5), ST_MakePoint(x + 9, y + 9))',
+    'intersecting': 'ST_MakePoint(x + 5.5, y + 2.5)'
+  }
+}
+METHODS = ['invalid', 'duplicate', 'multipart', 'null', 'intersect']
+
+def get_args():
+  """ Return arguments from input. """
+  parser = argparse.ArgumentParser(
+    description=_(
+      'benchmark the vectorial controls on synthetic schemas'
+    )
+  )
+  parser.add_argument('dbname', help=_('database name'))
+  parser.add_argument('user', help=_('database user'))
+  parser.add_argument('password', help=_('database password'))
+  parser.add_argument('output', help=_('JSON results file'))
+  parser.add_argument('--host', default='localhost', help=_('database host'))
+  parser.add_argument('--port', type=int, default=5432, help=_('database port'))
+  parser.add_argument(
+    '--rows',
+    type=int,
+    nargs='+',
+    default=[10000, 100000, 1000000, 10000000],
+    help=_('number of rows of every table of the schemas'))
+  for category in CATEGORIES:
+    parser.add_argument(
+      '--{}'.format(category),
+      type=float,
+      default=0.01,
+      help=_('rate of {} features').format(category))
+  parser.add_argument(
+    '--methods',
+    choices=METHODS,
+    nargs='+',
+    default=METHODS,
+    help=_('controls to time'))
+  parser.add_argument('--srid', type=int, default=32721, help=_('SRID of the geometries'))
+  parser.add_argument('--seed', type=float, default=0.5, help=_('seed of the random rates'))
+  parser.add_argument(
+    '--repeat',
+    type=int,
+    default=3,
+    help=_('number of runs of every control'))
+  parser.add_argument(
+    '--prefix',
+    default='benchmark',
+    help=_('prefix of the names of the synthetic schemas'))
+  parser.add_argument(
+    '--keep',
+    action='store_true',
+    help=_('keep the synthetic schemas'))
+  args = parser.parse_args()
+  if sum(get_rates(args).values()) > 1:
+    parser.error(_('the sum of the rates can not be greater than 1'))
+  return args
+
+def get_rates(args):
+  """ Return dictionary with the rate of every category of features. """
+  return {category: getattr(args, category) for category in CATEGORIES}
+
+def table_query(schema, table, rows, rates, srid):
+  """Returns sql query to create a synthetic table.
+
+  Args:
+    schema: Name of the schema.
+    table: Name of the table, one of polygons, linestrings or points.
+    rows: Number of rows.
+    rates: Dictionary with the rate of every category of features.
+    srid: SRID of the geometries.
+
+  Returns:
+    String sql query.
+  """
+  geometries = GEOMETRIES[table]
+  cases = []
+  limit = 0
+  for category in CATEGORIES:
+    limit += rates[category]
+    geometry = 'NULL' if category == 'null' else geometries[category]
+    cases.append('WHEN r < {} THEN {}'.format(limit, geometry))
+  side = max(1, math.ceil(math.sqrt(rows)))
+  return (
+    'CREATE TABLE {0}.{1} AS '
+    'SELECT i AS id, ST_SetSRID(CASE {2} ELSE {3} END, {4})::geometry(Geometry, {4}) AS geom '
+    'FROM ('
+      'SELECT i, random() AS r, '
+      '(i % {5}) * {6} AS x, (i / {5}) * {6} AS y, '
+      '((i - 1) % {5}) * {6} AS px, ((i - 1) / {5}) * {6} AS py '
+      'FROM generate_series(1, {7}) AS i'
+    ') AS cells'
+  ).format(
+    schema, table, ' '.join(cases), geometries['normal'], srid, side, CELL,
+    rows)
+
+def create_schema(conn, schema, rows, rates, args):
+  """Create a schema with the synthetic tables, their primary keys and spatial indexes.
+
+  Args:
+    conn: Connection to the database, in autocommit mode.
+    schema: Name of the schema.
+    rows: Number of rows of every table.
+    rates: Dictionary with the rate of every category of features.
+    args: Arguments from input.
+
+  Returns:
+    Seconds of the load of the schema.
+  """
+  start = time.perf_counter()
+  with conn.cursor() as cursor:
+    cursor.execute('DROP SCHEMA IF EXISTS {} CASCADE'.format(schema))
+    cursor.execute('CREATE SCHEMA {}'.format(schema))
+    for table in GEOMETRIES:
+      cursor.execute('SELECT setseed(%s)', (args.seed, ))
+      cursor.execute(table_query(schema, table, rows, rates, args.srid))
+      cursor.execute('ALTER TABLE {}.{} ADD PRIMARY KEY (id)'.format(schema, table))
+      cursor.execute('CREATE INDEX ON {}.{} USING GIST (geom)'.format(schema, table))
+      cursor.execute('ANALYZE {}.{}'.format(schema, table))
+  return time.perf_counter() - start
+
+def drop_schema(conn, schema):
+  """Drop a synthetic schema.
+
+  Args:
+    conn: Connection to the database, in autocommit mode.
+    schema: Name of the schema.
+  """
+  with conn.cursor() as cursor:
+    cursor.execute('DROP SCHEMA IF EXISTS {} CASCADE'.format(schema))
+
+def get_admissibles():
+  """ Return the admissibles intersections dictionary, every table with the other ones. """
+  return {table: [other for other in GEOMETRIES if other != table] for table in GEOMETRIES}
+
+def explain_query(pgdb, query):
+  """Return the plan of a query, executing it.
+
+  Args:
+    pgdb: PGDBManager instance.
+    query: SQL string query.
+
+  Returns:
+    EXPLAIN (ANALYZE, BUFFERS) plan, as JSON object.
+  """
+  return pgdb.get_query_result('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {}'.format(query))[0][0]
+
+def time_method(method, repeat):
+  """Return the best time and the result of a method.
+
+  Args:
+    method: Function without arguments.
+    repeat: Number of runs.
+
+  Returns:
+    Best seconds and result of the last run.
+  """
+  best = None
+  result = None
+  for __ in range(repeat):
+    start = time.perf_counter()
+    result = method()
+    seconds = time.perf_counter() - start
+    best = seconds if best is None else min(best, seconds)
+  return best, result
+
+def run_table(pgdb, schema, table, rows, args):
+  """Time the controls of a table.
+
+  Args:
+    pgdb: PGDBManager instance.
+    schema: Name of the schema.
+    table: Name of the table.
+    rows: Number of rows of the table.
+    args: Arguments from input.
+
+  Returns:
+    Dictionary with the seconds, number of results and plans of every control.
+  """
+  tables = list(GEOMETRIES)
+  admissibles = get_admissibles()
+  methods = {
+    'invalid': (
+      lambda: pgdb.get_invalid_geoms_from_table(schema, table),
+      {table: invalid_geoms_query(schema, table)}),
+    'duplicate': (
+      lambda: pgdb.get_duplicate_geoms_from_table(schema, table),
+      {table: duplicate_geoms_query(schema, table)}),
+    'multipart': (
+      lambda: pgdb.get_multipart_geoms_from_table(schema, table),
+      {table: multipart_geoms_query(schema, table)}),
+    'null': (
+      lambda: pgdb.get_null_geoms_from_table(schema, table),
+      {table: null_geoms_query(schema, table)}),
+    'intersect': (
+      lambda: pgdb.get_not_allowed_intersection(schema, table, tables, admissibles),
+      {table2: intersection_query(schema, table, table2) for table2 in tables})
+  }
+  results = {}
+  for name in args.methods:
+    method, queries = methods[name]
+    seconds, values = time_method(method, args.repeat)
+    if name == 'intersect':
+      count = len(values.point) + len(values.line) + len(values.polygon) + len(values.collection)
+    else:
+      count = len(values)
+    results[name] = {
+      'seconds': seconds,
+      'rows_s': rows / seconds if seconds > 0 else None,
+      'results': count,
+      'explain': {key: explain_query(pgdb, query) for key, query in queries.items()}
+    }
+  return results
+
+def main():
+  """Main procedure."""
+  args = get_args()
+  rates = get_rates(args)
+  conn = psycopg2.connect(
+    host=args.host, port=args.port, dbname=args.dbname, user=args.user, password=args.password)
+  conn.autocommit = True
+  pgdb = PGDBManager(
+    PGDBConnection(args.host, args.port, args.dbname),
+    PGDBCredentials(args.user, args.password)
+  )
+  pgdb.connect()
+  results = get_run_data('postgis_controls')
+  results['postgres'] = pgdb.get_query_result('SELECT version()')[0][0]
+  results['postgis'] = pgdb.get_query_result('SELECT postgis_full_version()')[0][0]
+  results['rates'] = rates
+  results['cases'] = []
+  try:
+    for rows in args.rows:
+      schema = '{}_{}'.format(args.prefix, rows)
+      print('{}: {}'.format(_('Schema'), schema))
+      case = {
+        'rows': rows,
+        'schema': schema,
+        'load_seconds': create_schema(conn, schema, rows, rates, args),
+        'tables': {}
+      }
+      for table in GEOMETRIES:
+        print('  {}'.format(table))
+        case['tables'][table] = run_table(pgdb, schema, table, rows, args)
+      # the controls are only read queries
+      pgdb.conn.rollback()
+      results['cases'].append(case)
+      if not args.keep:
+        drop_schema(conn, schema)
+  finally:
+    with open(args.output, 'w', encoding='utf-8') as json_file:
+      json.dump(results, json_file, indent=2)
+    conn.close()
+    pgdb.conn.close()
+  print('{}.'.format(_('End')))
+
+if __name__ == '__main__':
+  main()
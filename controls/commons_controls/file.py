@@ -1,5 +1,8 @@
 """Util module that contains the tools to manage input/output files of a control.
 
+Enumerates:
+  FileFormat.
+
 Functions:
   read_json_file.
   read_twf_file.
@@ -7,6 +10,7 @@ Functions:
 
 Classes:
   FileManagerError.
+  ParquetFileWriter.
   FileManager.
 """
 import os
@@ -15,6 +19,17 @@ import csv
 import gettext
 import logging
 import json
+from enum import Enum
+try:
+  import pyarrow
+  import pyarrow.parquet
+except ImportError:
+  pyarrow = None
+
+class FileFormat(Enum):
+  """Enumerate of result file formats."""
+  csv = 'csv'
+  parquet = 'parquet'
 
 def read_json_file(file_name):
   """Read a JSON file.
@@ -85,6 +100,59 @@ def get_files_path(start_dir, file_type, recursive=False):
 class FileManagerError(Exception):
   """Exception for FileManager."""
 
+class ParquetFileWriter:
+  """Class to write rows to a Parquet file in row group batches.
+
+  Attributes:
+    file_path: Path of the file.
+    schema: Arrow schema of the file.
+    batch_size: Number of rows of each row group.
+    rows: Rows waiting to be written.
+  """
+
+  def __init__(self, file_path, columns, batch_size=65536):
+    # internal
+    self._ = gettext.gettext
+    if pyarrow is None:
+      raise FileManagerError(self._('Cannot write parquet files without pyarrow'))
+    # parameters
+    self.file_path = file_path
+    self.schema = pyarrow.schema([
+      (name, getattr(pyarrow, type_name)()) for name, type_name in columns
+    ])
+    self.batch_size = batch_size
+    self.rows = []
+    self._writer = pyarrow.parquet.ParquetWriter(file_path, self.schema)
+
+  def append(self, rows):
+    """Append rows to the file, writing a row group every batch size rows.
+
+    Args:
+      rows: Rows to append, with one value per column.
+    """
+    for row in rows:
+      self.rows.append(row)
+      if len(self.rows) >= self.batch_size:
+        self.flush()
+
+  def flush(self):
+    """Write the waiting rows to the file as a row group."""
+    if not self.rows:
+      return
+    arrays = []
+    for i__, field in enumerate(self.schema):
+      values = [row[i__] for row in self.rows]
+      if field.type == pyarrow.binary():
+        values = [bytes(val) if val is not None else None for val in values]
+      arrays.append(pyarrow.array(values, type=field.type))
+    self._writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+    self.rows = []
+
+  def close(self):
+    """Write the waiting rows and close the file."""
+    self.flush()
+    self._writer.close()
+
 class FileManager:
   """Class to manage input/output files of a control.
 
@@ -99,6 +167,7 @@ class FileManager:
     self.logger = logger or logging.getLogger(__name__)
     # internal
     self._ = gettext.gettext
+    self._parquet_writers = {}
     # check dirs
     try:
       os.makedirs(self.output_dir)
@@ -177,6 +246,19 @@ class FileManager:
       if row:
         writer.writerow(row)
 
+  def append_csv_rows(self, file_name, rows, dir_name=None):
+    """Append rows to a CSV file, opening the file once.
+
+    Args:
+      file_name: Name of the file.
+      rows: Rows to append to the file.
+    """
+    if not rows:
+      return
+    with open(self._output_file_path(dir_name, file_name), 'a', newline='') as csvfile:
+      writer = csv.writer(csvfile)
+      writer.writerows(rows)
+
   def write_csv_file(self, dir_name, file_name, hrow, rows):
     """Write a CSV file to a folder in the output folder.
 
@@ -199,6 +281,103 @@ class FileManager:
         for row in rows:
           writer.writerow(row)
 
+  def merge_csv_files(self, file_name, file_names, dir_name=None):
+    """Merge CSV files of a folder in the output folder into one CSV file of the output folder,
+    keeping the header of the first file, and remove the merged files.
+
+    Args:
+      file_name: Name of the merged file.
+      file_names: Names of the files to merge, in order.
+      dir_name: Name of the folder of the files to merge.
+
+    Returns:
+      Number of merged files.
+    """
+    merged = 0
+    with open(
+      self._output_file_path(None, file_name),
+      'w',
+      newline='',
+      encoding='utf-8'
+      ) as csvfile:
+      for name in file_names:
+        file_path = self._output_file_path(dir_name, name)
+        if not os.path.isfile(file_path):
+          continue
+        with open(file_path, newline='', encoding='utf-8') as partfile:
+          header = partfile.readline()
+          if not merged:
+            csvfile.write(header)
+          for line in partfile:
+            csvfile.write(line)
+        os.remove(file_path)
+        merged += 1
+    return merged
+
+  def copy_csv_file(self, dir_name, file_name, hrow, copy):
+    """Write a CSV file to a folder in the output folder, with rows written by a copy function.
+    If the copy function does not write any row, the file is removed.
+
+    Args:
+      dir_name: Name of the folder in the output folder.
+      file_name: Name of the file.
+      hrow: Header of the file.
+      copy: Function that receives the file object and writes the CSV rows.
+
+    Returns:
+      True if any row was written, False otherwise.
+    """
+    file_path = self._output_file_path(dir_name, file_name)
+    with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+      # same line terminator as the rows written by COPY
+      writer = csv.writer(csvfile, lineterminator='\n')
+      if hrow:
+        writer.writerow(hrow)
+      start = csvfile.tell()
+      copy(csvfile)
+      has_rows = csvfile.tell() != start
+    if not has_rows:
+      os.remove(file_path)
+    return has_rows
+
+  def start_parquet_file(self, file_name, columns, dir_name=None):
+    """Initialize a Parquet file with the typed columns.
+
+    Args:
+      file_name: Name of the file.
+      columns: List of column name and pyarrow type name pairs, like ('id', 'int64').
+      dir_name: Name of the folder in the output folder.
+
+    Raises:
+      FileManagerError
+    """
+    file_path = self._output_file_path(dir_name, file_name)
+    if file_path in self._parquet_writers:
+      self._parquet_writers[file_path].close()
+    self._parquet_writers[file_path] = ParquetFileWriter(file_path, columns)
+
+  def append_parquet_file(self, file_name, rows, dir_name=None):
+    """Append rows to a Parquet file initialized with start_parquet_file.
+
+    Args:
+      file_name: Name of the file.
+      rows: Rows to append to the file.
+      dir_name: Name of the folder in the output folder.
+
+    Raises:
+      FileManagerError
+    """
+    file_path = self._output_file_path(dir_name, file_name)
+    if file_path not in self._parquet_writers:
+      raise FileManagerError(self._('Parquet file not started'))
+    self._parquet_writers[file_path].append(rows)
+
+  def close_parquet_files(self):
+    """Write the waiting rows and close all the Parquet files."""
+    for writer in self._parquet_writers.values():
+      writer.close()
+    self._parquet_writers = {}
+
   def write_txt_file(self, file_name, data):
     """Write a text file to the output folder.
 
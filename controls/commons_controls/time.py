@@ -6,13 +6,20 @@ Enumerates:
 Functions:
   get_time.
   get_duration.
+  get_span.
 
 Classes:
   TimeManagerError.
   TimeManager.
 """
+import os
+import json
 import gettext
 import logging
+import threading
+import functools
+import contextlib
+import time
 from enum import Enum
 from datetime import datetime, timedelta
 
@@ -52,7 +59,7 @@ def get_duration(start, end, unit=TimeUnit.second):
   """
   if not start or not end:
     return None
-  duration = int(timedelta.total_seconds(end - start))
+  duration = timedelta.total_seconds(end - start)
   if unit.value > TimeUnit.second.value:
     duration = duration / 60
   if unit.value > TimeUnit.minute.value:
@@ -61,25 +68,54 @@ def get_duration(start, end, unit=TimeUnit.second):
     duration = duration / 24
   return duration
 
+def get_span(tman, name, args=None):
+  """Function to obtain a span of a TimeManager, that does nothing without TimeManager.
+
+  Args:
+    tman: TimeManager instance or None.
+    name: Name of the span.
+    args: Dictionary of values shown with the trace event of the span.
+
+  Returns:
+    Context manager.
+  """
+  if tman is None:
+    return contextlib.nullcontext()
+  return tman.span(name, args)
+
 class TimeManagerError(Exception):
   """Exception for TimeManager."""
 
 class TimeManager:
   """Class to manage time execution of a control.
 
+  Spans measure the duration of parts of the execution, nested in the open spans of their
+  thread, and are accumulated by path with the number of executions. When tracing, every span
+  is also kept as a Chrome Trace Event, with its process and thread ids.
+
   Attributes:
       logger: Logging object.
       dt_start: Initial datetime.
       dt_end: End datetime.
+      spans: Dictionary from span path tuple to list with the count and nanoseconds.
+      counters: Dictionary from counter name to value.
+      trace: Boolean indicating if the spans are kept as trace events.
+      events: List of trace events.
   """
 
-  def __init__(self, logger=None):
+  def __init__(self, logger=None, trace=False):
     # parameters
     self.logger = logger or logging.getLogger(__name__)
     self.dt_start = None
     self.dt_end = None
+    self.spans = {}
+    self.counters = {}
+    self.trace = trace
+    self.events = []
     # internal
     self._ = gettext.gettext
+    self._local = threading.local()
+    self._lock = threading.Lock()
 
   def start(self):
     """Method to set the initial datetime."""
@@ -106,3 +142,135 @@ class TimeManager:
     if not self.dt_end:
       raise TimeManagerError(self._('Time not ended'))
     return get_duration(self.dt_start, self.dt_end, unit)
+
+  def _get_stack(self):
+    """Helper method to return the names of the open spans of the thread."""
+    stack = getattr(self._local, 'stack', None)
+    if stack is None:
+      stack = []
+      self._local.stack = stack
+    return stack
+
+  @contextlib.contextmanager
+  def span(self, name, args=None):
+    """Context manager to measure the duration of a span, nested in the open spans of the
+    thread.
+
+    Args:
+      name: Name of the span.
+      args: Dictionary of values shown with the trace event of the span, like the file or
+        table name.
+    """
+    stack = self._get_stack()
+    stack.append(name)
+    path = tuple(stack)
+    start = time.perf_counter_ns()
+    try:
+      yield
+    finally:
+      duration = time.perf_counter_ns() - start
+      stack.pop()
+      with self._lock:
+        record = self.spans.setdefault(path, [0, 0])
+        record[0] += 1
+        record[1] += duration
+        if self.trace:
+          self.events.append(self._get_event(name, path, start, duration, args))
+
+  def _get_event(self, name, path, start, duration, args):
+    """Helper method to return the complete trace event of a span, in microseconds."""
+    # perf_counter is a system wide monotonic clock, so the events of the workers line up
+    event = {
+      'name': name,
+      'cat': path[0],
+      'ph': 'X',
+      'ts': start / 1000,
+      'dur': duration / 1000,
+      'pid': os.getpid(),
+      'tid': threading.get_ident()
+    }
+    if args:
+      event['args'] = args
+    return event
+
+  def add_events(self, events):
+    """Method to add the trace events of other process, like a worker.
+
+    Args:
+      events: List of trace events.
+    """
+    with self._lock:
+      self.events.extend(events)
+
+  def write_trace(self, file_path):
+    """Method to write the trace events to a Chrome Trace Event JSON file, to open it with
+    chrome://tracing, Perfetto or speedscope.
+
+    Args:
+      file_path: Path of the trace file.
+    """
+    with self._lock:
+      events = sorted(self.events, key=lambda event: (event['pid'], event['tid'], event['ts']))
+    with open(file_path, 'w', encoding='utf-8') as json_file:
+      json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, json_file)
+
+  def timed(self, name=None):
+    """Decorator to measure the duration of every call of a function as a span.
+
+    Args:
+      name: Name of the span, the function name by default.
+
+    Returns:
+      Decorator.
+    """
+    def decorator(function):
+      @functools.wraps(function)
+      def wrapper(*args, **kwargs):
+        with self.span(name or function.__name__):
+          return function(*args, **kwargs)
+      return wrapper
+    return decorator
+
+  def count(self, name, value=1):
+    """Method to increase a counter.
+
+    Args:
+      name: Name of the counter.
+      value: Value to add to the counter.
+    """
+    with self._lock:
+      self.counters[name] = self.counters.get(name, 0) + value
+
+  def get_breakdown(self):
+    """Method to obtain the durations of the spans, every span after its parent.
+
+    Returns:
+      List of span path tuple, count, seconds and percentage of the parent span duration,
+      or of the execution duration for the first level spans.
+    """
+    total = None
+    if self.dt_start and self.dt_end:
+      total = get_duration(self.dt_start, self.dt_end) * 1e9
+    if not total:
+      total = sum(record[1] for path, record in self.spans.items() if len(path) == 1)
+    breakdown = []
+    for path in sorted(self.spans):
+      count, ns_ = self.spans[path]
+      parent = self.spans[path[:-1]][1] if path[:-1] in self.spans else total
+      breakdown.append((path, count, ns_ / 1e9, 100 * ns_ / parent if parent else 0))
+    return breakdown
+
+  def get_summary_data(self):
+    """Method to obtain the timing breakdown and the counters, as summary data.
+
+    Returns:
+      Dictionary from summary key to value.
+    """
+    summary_data = {}
+    for path, count, seconds, percentage in self.get_breakdown():
+      key = '{} {}'.format(self._('Time'), '/'.join(path))
+      summary_data[key] = '{:.3f} s, {} {}, {:.1f}%'.format(
+        seconds, count, self._('calls'), percentage)
+    for name in sorted(self.counters):
+      summary_data['{} {}'.format(self._('Count'), name)] = self.counters[name]
+    return summary_data
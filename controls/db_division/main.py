@@ -15,13 +15,46 @@ Examples:
 
     $python main.py localhost 5432 CN_HID_10K_R_01 cartografia_nacional_hidrografia
     postgres postgres files\sql\Remesa_Urbana.sql public remesa_urbana ru
+
+    $python main.py localhost 5432 CN_HID_10K_R_01 cartografia_nacional_hidrografia
+    postgres postgres files\Remesa_Nacional.sql public remesa_nacional rn --mode scan
+
+    $python main.py localhost 5432 CN_HID_10K_R_01 cartografia_nacional_hidrografia
+    postgres postgres files\Remesa_Nacional.sql public remesa_nacional rn --jobs 8
+
+    $python main.py localhost 5432 CN_HID_10K_R_01 cartografia_nacional_hidrografia
+    postgres postgres files\Remesa_Nacional.sql public remesa_nacional rn --max-vertices 0
+
+    $python main.py localhost 5432 CN_HID_10K_R_01 cartografia_nacional_hidrografia
+    postgres postgres files\Remesa_Nacional.sql public remesa_nacional rn --bulk --jobs 8
+
+    $python main.py localhost 5432 CN_HID_10K_R_01 cartografia_nacional_hidrografia
+    postgres postgres files\Remesa_Nacional.sql public remesa_nacional rn --mode views --materialized
+
+    $python main.py localhost 5432 CN_HID_10K_R_01 cartografia_nacional_hidrografia
+    postgres postgres files\Remesa_Nacional.sql public remesa_nacional rn --mode views --refresh
+
+    $python main.py localhost 5432 CN_HID_10K_R_01 cartografia_nacional_hidrografia
+    postgres postgres files\Remesa_Nacional.sql public remesa_nacional rn --incremental
+
+    $python main.py localhost 5432 CN_HID_10K_R_01 cartografia_nacional_hidrografia
+    postgres postgres files\Remesa_Nacional.sql public remesa_nacional rn --jobs 8 --trace trace.json
 """
 
+import os
 import sys
 import argparse
 import logging
 import gettext
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 import psycopg2
+import psycopg2.extensions
+# add top level package to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+# pylint: disable=wrong-import-position
+from controls.commons_controls.time import TimeManager, get_span
 
 
 # set gettext function
@@ -51,7 +84,53 @@ def get_args():
     parser.add_argument('consignments_table', help=_('name of the consignments table'))
     parser.add_argument('consignments_schema_prefix',
                         help=_('prefix for the schema names to be created for every consignment'))
-    return parser.parse_args()
+    parser.add_argument('--mode', choices=['consignment', 'scan', 'views'], default='consignment',
+                        help=_('division mode, consignment joins every table with each \
+                        consignment, scan joins every table with all the consignments at once, \
+                        views creates views filtered by each consignment instead of copying the data'))
+    parser.add_argument('--jobs', type=int, default=1,
+                        help=_('number of database connections used to divide the consignments, \
+                        or the tables in scan mode, concurrently'))
+    parser.add_argument('--max-vertices', type=int, default=256,
+                        help=_('maximum number of vertices of the consignments pieces used to \
+                        search intersecting objects, 0 uses the consignments as they are'))
+    parser.add_argument('--bulk', action='store_true',
+                        help=_('load the data into unlogged tables, switching them to logged \
+                        when loaded, before building their indexes'))
+    parser.add_argument('--materialized', action='store_true',
+                        help=_('create materialized views in views mode'))
+    parser.add_argument('--refresh', action='store_true',
+                        help=_('refresh the materialized views of the existing consignment schemas, \
+                        concurrently if their tables have a primary key, instead of creating them'))
+    parser.add_argument('--incremental', action='store_true',
+                        help=_('rebuild only the consignments whose geometry changed since the last \
+                        division, and update only the changed rows in the other consignments'))
+    parser.add_argument('--trace', default=None,
+                        help=_('Chrome Trace Event JSON file with the time of every job, query and \
+                        fetch, in every connection'))
+    args = parser.parse_args()
+    if args.refresh and args.mode != 'views':
+        parser.error(_('--refresh requires --mode views'))
+    if args.incremental and args.mode == 'views':
+        parser.error(_('--incremental can not be used with --mode views'))
+    return args
+
+class TracedCursor(psycopg2.extensions.cursor):
+    """ Cursor that times the execution of the queries and the fetch of their rows, with the
+    TimeManager of the class, if any.
+
+    Attributes:
+        tman: TimeManager instance shared by all the connections, or None.
+    """
+    tman = None
+
+    def execute(self, query, vars=None): # pylint: disable=redefined-builtin
+        with get_span(self.tman, 'query', {'query': query}):
+            return super().execute(query, vars)
+
+    def fetchall(self):
+        with get_span(self.tman, 'fetch'):
+            return super().fetchall()
 
 def db_connect(host, port, database, user, password):
     """ Helper function to connect to the database.
@@ -74,15 +153,37 @@ def db_connect(host, port, database, user, password):
     try:
         connection = psycopg2.connect(**connection_parameters)
         connection.autocommit = True
+        connection.cursor_factory = TracedCursor
     except:
         logger.error('{}\n{}'.format(_('It is not possible to connect to the database.'),
                                      sys.exc_info()))
         sys.exit()
     return connection
 
+def get_geometry_columns(cursor, data_schema, consignments_schema, consignments_table):
+    """ Helper function to get the SRID and geometry type of the geom column of every table in the
+    data schema, and of the consignments table, with a single catalog query.
+    Args:
+        cursor: DB cursor.
+        data_schema: schema with the data.
+        consignments_schema: consignments schema name.
+        consignments_table: consingments table name.
+    Returns:
+        A dictionary with the (SRID, geometry type) of every (schema, table) with a geom column.
+    """
+    try:
+        statement = "SELECT f_table_schema, f_table_name, srid, type FROM geometry_columns\
+                WHERE f_geometry_column = 'geom' AND (f_table_schema = '" + data_schema + "'\
+                OR (f_table_schema = '" + consignments_schema + "' AND f_table_name = '" + consignments_table + "'))"
+        cursor.execute(statement)
+        return {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to query the geometry columns.'), sys.exc_info()))
+        sys.exit()
+
 def create_consignments_table(cursor, consignments_schema, consignments_table, sql_file,
                               data_schema, tables_all):
-    """ Helper procedure to create the consignments table.
+    """ Helper function to create the consignments table.
     Args:
         cursor: DB cursor.
         consignments_schema: schema name to be used.
@@ -90,54 +191,52 @@ def create_consignments_table(cursor, consignments_schema, consignments_table, s
         sql_file: sql file with consignments definitions.
         data_schema: schema with the data.
         tables_all: list of all tables names.
+    Returns:
+        A dictionary with the (SRID, geometry type) of every (schema, table) with a geom column.
     """
     try:
-        # delete existing consignments definitions
-        statement = 'DROP TABLE IF EXISTS {}.{}'.format(consignments_schema, consignments_table)
+        # delete existing consignments definitions, and the views that depends on them
+        statement = 'DROP TABLE IF EXISTS {}.{} CASCADE'.format(consignments_schema, consignments_table)
         cursor.execute(statement)
         # load consignments definition in the database from sql file
         with open(sql_file, "r") as file:
             cursor.execute(file.read())
         # convert consignments SRID to the SRID used in data
-        convert_consignments_srid(cursor, consignments_schema, consignments_table,
-                                  data_schema, tables_all)
+        return convert_consignments_srid(cursor, consignments_schema, consignments_table,
+                                         data_schema, tables_all)
     except:
         logger.error('{}\n{}'.format(_('It is not possibe to create consignments table.'), sys.exc_info()))
         sys.exit()
 
 def convert_consignments_srid(cursor, consignments_schema, consignments_table, data_schema,
                               tables_all):
-    """ Helper procedure to change the consigments definition SRID.
+    """ Helper function to change the consigments definition SRID.
     Args:
         cursor: DB cursor.
         consignments_schema: schema name to be used.
         consignments_table: consingments table name.
         data_schema: schema with the data.
         tables_all: list of all tables names.
+    Returns:
+        A dictionary with the (SRID, geometry type) of every (schema, table) with a geom column.
     """
     try:
-        # get SRID from consignments
+        # get SRID from consignments and data
         logger.info('{}...'.format(_('Searching for consignments and data SRID.')))
-        statement = "SELECT Find_SRID('{}', '{}', 'geom');".format(
-            consignments_schema, consignments_table)
-        cursor.execute(statement)
-        consignments_srid_tmp = cursor.fetchall()
-        consignments_srid = consignments_srid_tmp[0][0]
+        geometry_columns = get_geometry_columns(cursor, data_schema, consignments_schema,
+                                                consignments_table)
+        consignments_srid = geometry_columns.get((consignments_schema, consignments_table), (0, None))[0]
         if consignments_srid <= 0:
             logger.error('{}'.format(_('It is not possible to find the consignments SRID.')))
             sys.exit()
         logger.info('{}: {}'.format(_('consignments SRID'), str(consignments_srid)))
-        # get the SRID from data - Checking all tables to be sure that they use the same SRID
-        srid = -1
-        for table in tables_all:
-            statement = "SELECT Find_SRID('" + data_schema + "', '" + table[0] + "', 'geom');"
-            cursor.execute(statement)
-            result = cursor.fetchall()
-            if srid == -1:
-                srid = result[0][0]
-            elif srid != result[0][0]:
-                logger.error('{}'.format(_('Different tables in the same schema uses different SRID.')))
-                sys.exit()
+        # checking all tables to be sure that they use the same SRID, tables without geom are skipped
+        srids = {geometry_columns[(data_schema, table[0])][0] for table in tables_all
+                 if (data_schema, table[0]) in geometry_columns}
+        if len(srids) > 1:
+            logger.error('{}'.format(_('Different tables in the same schema uses different SRID.')))
+            sys.exit()
+        srid = srids.pop() if srids else -1
         if srid <= 0:
             logger.error('{}'.format(_('It is not possible to find the data SRID.')))
             sys.exit()
@@ -149,11 +248,65 @@ def convert_consignments_srid(cursor, consignments_schema, consignments_table, d
                     ALTER COLUMN geom TYPE geometry(MultiPolygon, ' + str(srid) +')\
                     USING ST_Transform(geom, ' + str(srid) +');'
             cursor.execute(statement)
+            geometry_columns[(consignments_schema, consignments_table)] = (srid, 'MULTIPOLYGON')
         else:
             logger.info('{}'.format(_('SRID conversions not needed.')))
     except:
         logger.error('{}\n{}'.format(_('It is not possible to convert the consignments SRID to the data SRID.'), sys.exc_info()))
         sys.exit()
+    return geometry_columns
+
+def get_pieces_table(consignments_table):
+    """ Helper function to get the name of the consignments pieces table.
+    Args:
+        consignments_table: consingments table name.
+    Returns:
+        The consignments pieces table name.
+    """
+    return '{}_pieces'.format(consignments_table)
+
+def create_consignments_pieces_table(cursor, consignments_schema, consignments_table, max_vertices):
+    """ Helper function to create a table with the consignments subdivided in pieces of at most
+    max_vertices vertices, with a spatial index, to accelerate the intersection searches.
+    Args:
+        cursor: DB cursor.
+        consignments_schema: consignments schema name.
+        consignments_table: consingments table name.
+        max_vertices: maximum number of vertices of every piece.
+    Returns:
+        Created table name.
+    """
+    pieces_table = get_pieces_table(consignments_table)
+    try:
+        logger.info('{}...'.format(_('Subdividing consignments')))
+        statement = 'DROP TABLE IF EXISTS {}.{} CASCADE'.format(consignments_schema, pieces_table)
+        cursor.execute(statement)
+        statement = 'CREATE TABLE {0}.{1} AS\
+                SELECT remesa, ST_Subdivide(ST_Force2D(geom), {3}) AS geom\
+                FROM {0}.{2}'.format(consignments_schema, pieces_table, consignments_table,
+                                     max_vertices)
+        cursor.execute(statement)
+        statement = 'CREATE INDEX {1}_geom_idx ON {0}.{1} USING GIST (geom)'.format(
+            consignments_schema, pieces_table)
+        cursor.execute(statement)
+        statement = 'ANALYZE {}.{}'.format(consignments_schema, pieces_table)
+        cursor.execute(statement)
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to create consignments pieces table.'), sys.exc_info()))
+        sys.exit()
+    return pieces_table
+
+def get_join_table(args):
+    """ Helper function to get the consignments table joined with the data, the pieces table if
+    the consignments are subdivided.
+    Args:
+        args: program arguments.
+    Returns:
+        The consignments or consignments pieces table name.
+    """
+    if args.max_vertices > 0:
+        return get_pieces_table(args.consignments_table)
+    return args.consignments_table
 
 def get_consignments(cursor, schema, table):
     """ Helper function to get a list of the consinments.
@@ -171,6 +324,16 @@ def get_consignments(cursor, schema, table):
         logger.error('{} {}.{}.\n{0}'.format(_('It is not possible to query the table'), schema, table, sys.exc_info()))
         sys.exit()
 
+def get_schema_name(consignments_schema_prefix, consignment_id):
+    """ Helper function to get the schema name of a consignment.
+    Args:
+        consignments_schema_prefix: prefix to be used in the schema.
+        consignment_id: consingments identification.
+    Returns:
+        The schema name.
+    """
+    return '{0}{1:0=2d}'.format(consignments_schema_prefix, consignment_id)
+
 def create_schema(cursor, consignment_table, consignments_schema_prefix, consignment_id):
     """ Helper function to create a schema.
     Args:
@@ -182,7 +345,7 @@ def create_schema(cursor, consignment_table, consignments_schema_prefix, consign
         Created schema name.
     """
     try:
-        schema = '{0}{1:0=2d}'.format(consignments_schema_prefix, consignment_id)
+        schema = get_schema_name(consignments_schema_prefix, consignment_id)
         logger.info('{}: {}'.format(_('Creating schema'), schema))
         statement = 'DROP SCHEMA IF EXISTS {} CASCADE'.format(schema)
         cursor.execute(statement)
@@ -210,20 +373,113 @@ def get_tables_from_original_schema(cursor, schema):
                                      sys.exc_info()))
         sys.exit()
 
-def create_table(cursor, table_src, table_dest):
+def create_table(cursor, table_src, table_dest, unlogged=False):
     """ Helper procedure to create table with the same structure than existing table.
     Args:
         cursor: DB cursor.
         table_src: existing table name.
         table_dest: new table name.
+        unlogged: create the table unlogged, to bulk load it.
     """
     try:
-        statement_create_table = 'CREATE TABLE ' + table_dest + ' ( like ' + table_src + ')'
+        statement_create_table = 'CREATE ' + ('UNLOGGED ' if unlogged else '') + 'TABLE ' + table_dest + ' ( like ' + table_src + ')'
         cursor.execute(statement_create_table)
     except:
         logger.error('{}\n{}'.format(_('It is not possible to create the table.'), sys.exc_info()))
         sys.exit()
 
+def get_primary_key(cursor, table_src):
+    """ Helper function to get the primary key columns of a table.
+    Args:
+        cursor: DB cursor.
+        table_src: table name.
+    Returns:
+        A list of the primary key columns names.
+    """
+    statement = "SELECT a.attname FROM pg_index AS i\
+            JOIN pg_attribute AS a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)\
+            WHERE i.indrelid = '" + table_src + "'::regclass AND i.indisprimary"
+    cursor.execute(statement)
+    return [row[0] for row in cursor.fetchall()]
+
+def finish_table(cursor, table_src, table_dest, has_geom=True):
+    """ Helper procedure to finish a loaded table, switching it to logged if it was bulk loaded,
+    building the primary key of the existing table and a spatial index, and analyzing it, so
+    every mode gives the same tables.
+    Args:
+        cursor: DB cursor.
+        table_src: existing table name.
+        table_dest: loaded table name.
+        has_geom: the table has a geom column to index.
+    """
+    try:
+        # switched before building the indexes, so they are not rewritten to the WAL again,
+        # it does nothing if the table is already logged
+        statement = 'ALTER TABLE ' + table_dest + ' SET LOGGED'
+        cursor.execute(statement)
+        # primary key of the existing table
+        pk_columns = get_primary_key(cursor, table_src)
+        if pk_columns:
+            statement = 'ALTER TABLE ' + table_dest + ' ADD PRIMARY KEY (' + ', '.join(pk_columns) + ')'
+            cursor.execute(statement)
+        # spatial index
+        if has_geom:
+            statement = 'CREATE INDEX ON ' + table_dest + ' USING GIST (geom)'
+            cursor.execute(statement)
+        statement = 'ANALYZE ' + table_dest
+        cursor.execute(statement)
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to finish the table.'), sys.exc_info()))
+        sys.exit()
+
+def create_view(cursor, consignments_schema, consignments_table, consignment_id, table_src,
+                table_dest, materialized=False):
+    """ Helper procedure to create a view of the data intersecting a consignment, instead of
+    copying it. Materialized views get a unique index on the primary key of the existing table, so
+    they can be refreshed concurrently, and a spatial index.
+    Args:
+        cursor: DB cursor.
+        consignments_schema: consignments schema name.
+        consignments_table: consingments table name.
+        consignment_id: consingments identification.
+        table_src: data table name.
+        table_dest: view name.
+        materialized: create a materialized view.
+    """
+    try:
+        statement_view = 'CREATE ' + ('MATERIALIZED ' if materialized else '') + 'VIEW ' + table_dest + ' AS\
+                SELECT cn.* \
+                FROM ' + table_src + ' AS cn\
+                WHERE EXISTS (SELECT 1 FROM ' + consignments_schema + '.' + consignments_table + ' AS r\
+                WHERE r.remesa = ' + str(consignment_id) + ' and ST_intersects(cn.geom, r.geom))'
+        cursor.execute(statement_view)
+        if materialized:
+            pk_columns = get_primary_key(cursor, table_src)
+            if pk_columns:
+                statement = 'CREATE UNIQUE INDEX ON ' + table_dest + ' (' + ', '.join(pk_columns) + ')'
+                cursor.execute(statement)
+            statement = 'CREATE INDEX ON ' + table_dest + ' USING GIST (geom)'
+            cursor.execute(statement)
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to create the view.'), sys.exc_info()))
+        sys.exit()
+
+def refresh_view(cursor, table_src, table_dest):
+    """ Helper procedure to refresh a materialized view, concurrently if the existing table has a
+    primary key, so the view can be read while refreshed.
+    Args:
+        cursor: DB cursor.
+        table_src: data table name.
+        table_dest: materialized view name.
+    """
+    try:
+        concurrently = len(get_primary_key(cursor, table_src)) > 0
+        statement = 'REFRESH MATERIALIZED VIEW ' + ('CONCURRENTLY ' if concurrently else '') + table_dest
+        cursor.execute(statement)
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to refresh the view.'), sys.exc_info()))
+        sys.exit()
+
 def load_data(cursor, consignments_schema, consignments_table, consignment_id, table_name, table_src, table_dest):
     """ Helper procedure to load intersecting data to a consignment schema.
     Args:
@@ -236,10 +492,12 @@ def load_data(cursor, consignments_schema, consignments_table, consignment_id, t
         table_dest: schema table name.
     """
     try:
+        # every data row is added once, even if it intersects many consignment rows or pieces
         statement_insert = 'INSERT INTO ' + table_dest +'\
-                SELECT DISTINCT cn.* \
-                FROM ' + table_src + ' AS cn, ' + consignments_schema + '.' + consignments_table + ' AS r\
-                WHERE r.remesa = ' + str(consignment_id) + ' and ST_intersects(cn.geom, r.geom)'
+                SELECT cn.* \
+                FROM ' + table_src + ' AS cn\
+                WHERE EXISTS (SELECT 1 FROM ' + consignments_schema + '.' + consignments_table + ' AS r\
+                WHERE r.remesa = ' + str(consignment_id) + ' and ST_intersects(cn.geom, r.geom))'
         cursor.execute(statement_insert)
     except:
         logger.error('{}\n{}'.format(_('It is not possible to add data in the table.'), sys.exc_info()))
@@ -248,35 +506,488 @@ def load_data(cursor, consignments_schema, consignments_table, consignment_id, t
         if cursor.rowcount > 0:
             logger.info('{} {}: {}...'.format(_('Objects added to the table'), table_name, str(cursor.rowcount)))
 
+def load_data_single_scan(cursor, consignments_schema, consignments_table, schemas, table_name,
+                          table_src):
+    """ Helper procedure to load intersecting data to every consignment schema, scanning the data
+    table once.
+    Args:
+        cursor: DB cursor.
+        consignments_schema: consignments schema name.
+        consignments_table: consingments table name.
+        schemas: dictionary with the schema name of every consignment identification.
+        table_name: table name, used in every consignment schema.
+        table_src: data table name.
+    """
+    try:
+        # pair every data row with all the consignments it intersects
+        cursor.execute('DROP TABLE IF EXISTS division_rows')
+        statement_division = 'CREATE TEMPORARY TABLE division_rows AS\
+                SELECT DISTINCT ON (r.remesa, cn.ctid) r.remesa AS remesa, cn AS row\
+                FROM ' + table_src + ' AS cn, ' + consignments_schema + '.' + consignments_table + ' AS r\
+                WHERE ST_intersects(cn.geom, r.geom)'
+        cursor.execute(statement_division)
+        # every consignment reads its rows by index, instead of scanning the whole table
+        cursor.execute('CREATE INDEX ON division_rows (remesa)')
+        cursor.execute('ANALYZE division_rows')
+        # route the rows to the consignment schemas
+        for consignment_id, schema in schemas.items():
+            statement_insert = 'INSERT INTO ' + schema + '.' + table_name + '\
+                    SELECT (d.row).* FROM division_rows AS d\
+                    WHERE d.remesa = ' + str(consignment_id)
+            cursor.execute(statement_insert)
+            if cursor.rowcount > 0:
+                logger.info('{} {}.{}: {}...'.format(_('Objects added to the table'), schema,
+                                                      table_name, str(cursor.rowcount)))
+        cursor.execute('DROP TABLE division_rows')
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to add data in the table.'), sys.exc_info()))
+        sys.exit()
+
+def get_state_tables(consignments_table):
+    """ Helper function to get the names of the bookkeeping tables of the incremental division.
+    Args:
+        consignments_table: consingments table name.
+    Returns:
+        The consignments state table name and the rows state table name.
+    """
+    return '{}_state'.format(consignments_table), '{}_rows_state'.format(consignments_table)
+
+def get_consignments_hashes_query(consignments_schema, consignments_table):
+    """ Helper function to get the query of the geometry hash of every consignment.
+    Args:
+        consignments_schema: consignments schema name.
+        consignments_table: consingments table name.
+    Returns:
+        The query, with the remesa and geom_hash columns.
+    """
+    return "SELECT remesa, md5(string_agg(encode(ST_AsEWKB(geom), 'hex'), ','\
+            ORDER BY encode(ST_AsEWKB(geom), 'hex'))) AS geom_hash\
+            FROM " + consignments_schema + '.' + consignments_table + ' GROUP BY remesa'
+
+def create_state_tables(cursor, consignments_schema, consignments_table):
+    """ Helper procedure to create, if they do not exist, the bookkeeping tables of the incremental
+    division, with the geometry hash of every consignment and the hash of every data row.
+    Args:
+        cursor: DB cursor.
+        consignments_schema: consignments schema name.
+        consignments_table: consingments table name.
+    """
+    state_table, rows_state_table = get_state_tables(consignments_table)
+    try:
+        statement = 'CREATE TABLE IF NOT EXISTS ' + consignments_schema + '.' + state_table + '\
+                (remesa integer PRIMARY KEY, geom_hash text)'
+        cursor.execute(statement)
+        statement = 'CREATE TABLE IF NOT EXISTS ' + consignments_schema + '.' + rows_state_table + '\
+                (table_name text, row_id text, row_hash text, PRIMARY KEY (table_name, row_id))'
+        cursor.execute(statement)
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to create the state tables.'), sys.exc_info()))
+        sys.exit()
+
+def get_changed_consignments(cursor, consignments_schema, consignments_table,
+                             consignments_schema_prefix):
+    """ Helper function to compare the geometry of every consignment with the one of the last
+    division. Consignments without schema are considered changed.
+    Args:
+        cursor: DB cursor.
+        consignments_schema: consignments schema name.
+        consignments_table: consingments table name.
+        consignments_schema_prefix: prefix of the consignments schemas.
+    Returns:
+        The lists of changed, unchanged and removed consignments identifications.
+    """
+    state_table = get_state_tables(consignments_table)[0]
+    try:
+        cursor.execute(get_consignments_hashes_query(consignments_schema, consignments_table))
+        hashes = {int(row[0]): row[1] for row in cursor.fetchall()}
+        cursor.execute('SELECT remesa, geom_hash FROM ' + consignments_schema + '.' + state_table)
+        state = {int(row[0]): row[1] for row in cursor.fetchall()}
+        cursor.execute('SELECT schema_name FROM information_schema.schemata')
+        schemas = {row[0] for row in cursor.fetchall()}
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to query the consignments state.'), sys.exc_info()))
+        sys.exit()
+    changed = []
+    unchanged = []
+    for consignment_id in sorted(hashes):
+        if state.get(consignment_id) != hashes[consignment_id] or \
+           get_schema_name(consignments_schema_prefix, consignment_id) not in schemas:
+            changed.append(consignment_id)
+        else:
+            unchanged.append(consignment_id)
+    removed = sorted(set(state) - set(hashes))
+    return changed, unchanged, removed
+
+def save_consignments_state(cursor, consignments_schema, consignments_table):
+    """ Helper procedure to save the geometry hash of every consignment.
+    Args:
+        cursor: DB cursor.
+        consignments_schema: consignments schema name.
+        consignments_table: consingments table name.
+    """
+    state_table = get_state_tables(consignments_table)[0]
+    try:
+        cursor.execute('DELETE FROM ' + consignments_schema + '.' + state_table)
+        statement = 'INSERT INTO ' + consignments_schema + '.' + state_table + ' ' + \
+                get_consignments_hashes_query(consignments_schema, consignments_table)
+        cursor.execute(statement)
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to save the consignments state.'), sys.exc_info()))
+        sys.exit()
+
+def get_row_id(alias, pk_columns):
+    """ Helper function to get the expression identifying a row by its primary key.
+    Args:
+        alias: table alias.
+        pk_columns: list of the primary key columns names.
+    Returns:
+        The row identification expression, as text.
+    """
+    return 'ROW(' + ', '.join(alias + '.' + column for column in pk_columns) + ')::text'
+
+def update_data(cursor, consignments_schema, consignments_table, join_table, schemas, table_name,
+                table_src, pk_columns):
+    """ Helper procedure to update the consignments schemas with the rows of a data table added,
+    modified or deleted since the last division, and to save the hash of every row.
+    Args:
+        cursor: DB cursor.
+        consignments_schema: consignments schema name.
+        consignments_table: consignments table name, owner of the rows state table.
+        join_table: consignments table name joined with the data.
+        schemas: dictionary with the schema name of every consignment identification to update.
+        table_name: table name, used in every consignment schema.
+        table_src: data table name.
+        pk_columns: list of the primary key columns names of the data table.
+    """
+    rows_state_table = consignments_schema + '.' + get_state_tables(consignments_table)[1]
+    try:
+        # hash every data row and compare with the last division
+        cursor.execute('DROP TABLE IF EXISTS division_rows_state')
+        statement = 'CREATE TEMPORARY TABLE division_rows_state AS\
+                SELECT ' + get_row_id('cn', pk_columns) + ' AS row_id, md5(cn::text) AS row_hash\
+                FROM ' + table_src + ' AS cn'
+        cursor.execute(statement)
+        cursor.execute('DROP TABLE IF EXISTS division_changed_rows')
+        statement = "CREATE TEMPORARY TABLE division_changed_rows AS\
+                SELECT row_id FROM division_rows_state AS n\
+                FULL JOIN (SELECT row_id, row_hash FROM " + rows_state_table + "\
+                WHERE table_name = '" + table_name + "') AS o USING (row_id)\
+                WHERE n.row_hash IS DISTINCT FROM o.row_hash"
+        cursor.execute(statement)
+        logger.info('{} {}: {}'.format(_('Changed objects of the table'), table_name, str(cursor.rowcount)))
+        if cursor.rowcount > 0:
+            cursor.execute('ANALYZE division_changed_rows')
+            # delete and insert again the changed rows
+            for consignment_id, schema in schemas.items():
+                statement = 'DELETE FROM ' + schema + '.' + table_name + ' AS d\
+                        WHERE ' + get_row_id('d', pk_columns) + ' IN (SELECT row_id FROM division_changed_rows)'
+                cursor.execute(statement)
+                statement = 'INSERT INTO ' + schema + '.' + table_name + '\
+                        SELECT cn.* \
+                        FROM ' + table_src + ' AS cn\
+                        WHERE ' + get_row_id('cn', pk_columns) + ' IN (SELECT row_id FROM division_changed_rows)\
+                        AND EXISTS (SELECT 1 FROM ' + consignments_schema + '.' + join_table + ' AS r\
+                        WHERE r.remesa = ' + str(consignment_id) + ' and ST_intersects(cn.geom, r.geom))'
+                cursor.execute(statement)
+        # save the hash of every row
+        cursor.execute("DELETE FROM " + rows_state_table + " WHERE table_name = '" + table_name + "'")
+        statement = "INSERT INTO " + rows_state_table + "\
+                SELECT '" + table_name + "', row_id, row_hash FROM division_rows_state"
+        cursor.execute(statement)
+        cursor.execute('DROP TABLE division_changed_rows')
+        cursor.execute('DROP TABLE division_rows_state')
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to update data in the table.'), sys.exc_info()))
+        sys.exit()
+
+def run_worker(args, procedure, jobs, failed):
+    """ Helper procedure to run a procedure for the jobs of a queue, in a new connection, until the
+    queue is empty or a job of any worker failed.
+    Args:
+        args: program arguments.
+        procedure: procedure receiving a DB cursor, the program arguments and the job arguments.
+        jobs: queue with the job arguments.
+        failed: event set when a job fails.
+    """
+    conn = None
+    try:
+        conn = db_connect(args.host, args.port, args.database, args.user, args.password)
+        with conn.cursor() as c:
+            while not failed.is_set():
+                try:
+                    job_args = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                with get_span(c.tman, procedure.__name__, {'job': str(job_args[-1])}):
+                    procedure(c, args, *job_args)
+    except BaseException:
+        # procedures exit on errors, so SystemExit stops the other workers too
+        failed.set()
+        raise
+    finally:
+        if conn is not None:
+            conn.close()
+
+def run_jobs(cursor, args, procedure, jobs_args):
+    """ Helper procedure to run a procedure for every job, in the main connection or concurrently in
+    args.jobs connections. The first failed job stops the workers, once their current jobs end, and
+    its error is raised.
+    Args:
+        cursor: DB cursor of the main connection.
+        args: program arguments.
+        procedure: procedure receiving a DB cursor, the program arguments and the job arguments.
+        jobs_args: list of job arguments.
+    """
+    if args.jobs <= 1:
+        for job_args in jobs_args:
+            with get_span(cursor.tman, procedure.__name__, {'job': str(job_args[-1])}):
+                procedure(cursor, args, *job_args)
+        return
+    jobs = queue.Queue()
+    for job_args in jobs_args:
+        jobs.put(job_args)
+    failed = threading.Event()
+    logger.info('{} {} {}.'.format(_('Running'), str(args.jobs), _('workers')))
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        workers = [executor.submit(run_worker, args, procedure, jobs, failed)
+                   for _worker in range(args.jobs)]
+        done, _pending = wait(workers, return_when=FIRST_EXCEPTION)
+        for worker in done:
+            worker.result()
+
+def divide_consignment(cursor, args, tables_all, geometry_columns, consignment_id):
+    """ Helper procedure to create the schema of a consignment and load its data.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+        tables_all: list of all tables names.
+        geometry_columns: dictionary with the (SRID, geometry type) of every (schema, table).
+        consignment_id: consingments identification.
+    """
+    # create schema for the new consignment
+    schema_new = create_schema(cursor, args.consignments_schema, args.consignments_schema_prefix, consignment_id)
+    # iterate over the schema tables that contains the objects
+    logger.info('{} {} {}.'.format(_('Creating'), str(len(tables_all)), _('tables')))
+    logger.info('{}...'.format(_('Searching objects that intersects with the consignment')))
+    for table in tables_all:
+        table_original = args.schema + '.' + table[0]
+        table_new = schema_new + '.' + table[0]
+        # create table
+        create_table(cursor, table_original, table_new, args.bulk)
+        has_geom = (args.schema, table[0]) in geometry_columns
+        # load intersecting objects into the table
+        if has_geom:
+            load_data(cursor, args.consignments_schema, get_join_table(args), consignment_id, table[0], table_original, table_new)
+        finish_table(cursor, table_original, table_new, has_geom)
+
+def view_consignment(cursor, args, tables_all, geometry_columns, consignment_id):
+    """ Helper procedure to create the schema of a consignment with views of its data.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+        tables_all: list of all tables names.
+        geometry_columns: dictionary with the (SRID, geometry type) of every (schema, table).
+        consignment_id: consingments identification.
+    """
+    # create schema for the new consignment
+    schema_new = create_schema(cursor, args.consignments_schema, args.consignments_schema_prefix, consignment_id)
+    logger.info('{} {} {}.'.format(_('Creating'), str(len(tables_all)), _('views')))
+    for table in tables_all:
+        table_original = args.schema + '.' + table[0]
+        table_new = schema_new + '.' + table[0]
+        if (args.schema, table[0]) in geometry_columns:
+            create_view(cursor, args.consignments_schema, get_join_table(args), consignment_id,
+                        table_original, table_new, args.materialized)
+        else:
+            # tables without geometries have no objects in the consignment
+            create_table(cursor, table_original, table_new)
+
+def refresh_consignment(cursor, args, consignment_id):
+    """ Helper procedure to refresh the materialized views of the schema of a consignment.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+        consignment_id: consingments identification.
+    """
+    schema = get_schema_name(args.consignments_schema_prefix, consignment_id)
+    try:
+        cursor.execute("SELECT matviewname FROM pg_matviews WHERE schemaname = '" + schema + "'")
+        views = cursor.fetchall()
+    except:
+        logger.error('{}\n{}'.format(_('It is not possible to query the materialized views.'), sys.exc_info()))
+        sys.exit()
+    logger.info('{} {}: {}'.format(_('Refreshing views of schema'), schema, str(len(views))))
+    for view in views:
+        refresh_view(cursor, args.schema + '.' + view[0], schema + '.' + view[0])
+
+def divide_table(cursor, args, schemas, geometry_columns, table):
+    """ Helper procedure to create a table in every consignment schema and load its data.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+        schemas: dictionary with the schema name of every consignment identification.
+        geometry_columns: dictionary with the (SRID, geometry type) of every (schema, table).
+        table: table name.
+    """
+    table_original = args.schema + '.' + table
+    for schema_new in schemas.values():
+        create_table(cursor, table_original, schema_new + '.' + table, args.bulk)
+    has_geom = (args.schema, table) in geometry_columns
+    # load intersecting objects into the tables
+    if has_geom:
+        load_data_single_scan(cursor, args.consignments_schema, get_join_table(args), schemas, table, table_original)
+    for schema_new in schemas.values():
+        finish_table(cursor, table_original, schema_new + '.' + table, has_geom)
+
+def update_table(cursor, args, schemas, geometry_columns, table):
+    """ Helper procedure to update a table in every unchanged consignment schema.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+        schemas: dictionary with the schema name of every unchanged consignment identification.
+        geometry_columns: dictionary with the (SRID, geometry type) of every (schema, table).
+        table: table name.
+    """
+    table_original = args.schema + '.' + table
+    # tables added since the last division
+    for schema in schemas.values():
+        cursor.execute("SELECT to_regclass('" + schema + '.' + table + "')")
+        if cursor.fetchall()[0][0] is None:
+            create_table(cursor, table_original, schema + '.' + table)
+    if (args.schema, table) not in geometry_columns:
+        return
+    pk_columns = get_primary_key(cursor, table_original)
+    if pk_columns:
+        update_data(cursor, args.consignments_schema, args.consignments_table, get_join_table(args),
+                    schemas, table, table_original, pk_columns)
+        return
+    # rows without primary key can not be followed, so the table is loaded again
+    logger.info('{} {}...'.format(_('Table without primary key, loading again'), table))
+    for consignment_id, schema in schemas.items():
+        cursor.execute('DELETE FROM ' + schema + '.' + table)
+        load_data(cursor, args.consignments_schema, get_join_table(args), consignment_id, table,
+                  table_original, schema + '.' + table)
+
+def divide_by_consignment(cursor, args, tables_all, geometry_columns):
+    """ Helper procedure to divide the data joining every table with each consignment.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+        tables_all: list of all tables names.
+        geometry_columns: dictionary with the (SRID, geometry type) of every (schema, table).
+    """
+    consignments = get_consignments(cursor, args.consignments_schema, args.consignments_table)
+    run_jobs(cursor, args, divide_consignment,
+             [(tables_all, geometry_columns, int(consignment_result[0])) for consignment_result in consignments])
+
+def divide_by_table(cursor, args, tables_all, geometry_columns):
+    """ Helper procedure to divide the data joining every table with all the consignments at once,
+    so every table is scanned once whatever the number of consignments.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+        tables_all: list of all tables names.
+        geometry_columns: dictionary with the (SRID, geometry type) of every (schema, table).
+    """
+    # create schema for every consignment
+    schemas = {}
+    for consignment_result in get_consignments(cursor, args.consignments_schema, args.consignments_table):
+        consignment_id = int(consignment_result[0])
+        schemas[consignment_id] = create_schema(cursor, args.consignments_schema, args.consignments_schema_prefix, consignment_id)
+    # iterate over the schema tables that contains the objects
+    logger.info('{} {} {}.'.format(_('Creating'), str(len(tables_all)), _('tables')))
+    logger.info('{}...'.format(_('Searching objects that intersects with the consignments')))
+    run_jobs(cursor, args, divide_table, [(schemas, geometry_columns, table[0]) for table in tables_all])
+
+def divide_by_views(cursor, args, tables_all, geometry_columns):
+    """ Helper procedure to divide the data creating views filtered by each consignment.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+        tables_all: list of all tables names.
+        geometry_columns: dictionary with the (SRID, geometry type) of every (schema, table).
+    """
+    consignments = get_consignments(cursor, args.consignments_schema, args.consignments_table)
+    run_jobs(cursor, args, view_consignment,
+             [(tables_all, geometry_columns, int(consignment_result[0])) for consignment_result in consignments])
+
+def refresh_views(cursor, args):
+    """ Helper procedure to refresh the materialized views of every consignment schema.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+    """
+    consignments = get_consignments(cursor, args.consignments_schema, args.consignments_table)
+    run_jobs(cursor, args, refresh_consignment,
+             [(int(consignment_result[0]), ) for consignment_result in consignments])
+
+def divide_incremental(cursor, args, tables_all, geometry_columns):
+    """ Helper procedure to divide the data since the last division, rebuilding the consignments
+    whose geometry changed and updating the changed rows in the others.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+        tables_all: list of all tables names.
+        geometry_columns: dictionary with the (SRID, geometry type) of every (schema, table).
+    """
+    create_state_tables(cursor, args.consignments_schema, args.consignments_table)
+    changed, unchanged, removed = get_changed_consignments(
+        cursor, args.consignments_schema, args.consignments_table, args.consignments_schema_prefix)
+    logger.info('{}: {}, {}: {}, {}: {}'.format(_('Changed consignments'), str(len(changed)),
+                                                _('unchanged'), str(len(unchanged)),
+                                                _('removed'), str(len(removed))))
+    for consignment_id in removed:
+        schema = get_schema_name(args.consignments_schema_prefix, consignment_id)
+        cursor.execute('DROP SCHEMA IF EXISTS {} CASCADE'.format(schema))
+    # rebuild the changed consignments
+    run_jobs(cursor, args, divide_consignment,
+             [(tables_all, geometry_columns, consignment_id) for consignment_id in changed])
+    # update the changed rows in the unchanged consignments
+    schemas = {consignment_id: get_schema_name(args.consignments_schema_prefix, consignment_id)
+               for consignment_id in unchanged}
+    run_jobs(cursor, args, update_table, [(schemas, geometry_columns, table[0]) for table in tables_all])
+    save_consignments_state(cursor, args.consignments_schema, args.consignments_table)
+
+def divide(cursor, args):
+    """ Helper procedure to create the consignments tables and divide the data.
+    Args:
+        cursor: DB cursor.
+        args: program arguments.
+    """
+    # get list of tables in the original schema
+    tables_all = get_tables_from_original_schema(cursor, args.schema)
+    # create table for querying consignments
+    geometry_columns = create_consignments_table(cursor, args.consignments_schema, args.consignments_table, args.consignments_sql_file, args.schema, tables_all)
+    if args.max_vertices > 0:
+        create_consignments_pieces_table(cursor, args.consignments_schema, args.consignments_table, args.max_vertices)
+    # divide the data
+    if args.incremental:
+        divide_incremental(cursor, args, tables_all, geometry_columns)
+    elif args.mode == 'scan':
+        divide_by_table(cursor, args, tables_all, geometry_columns)
+    elif args.mode == 'views':
+        divide_by_views(cursor, args, tables_all, geometry_columns)
+    else:
+        divide_by_consignment(cursor, args, tables_all, geometry_columns)
+
 def main():
     """Main procedure."""
     # execute logic
     logger.info('{}...'.format(_('Processing')))
     args = get_args()
+    if args.trace:
+        TracedCursor.tman = TimeManager(trace=True)
     # connect to db
     conn = db_connect(args.host, args.port, args.database, args.user, args.password)
     with conn.cursor() as c:
-        # get list of tables in the original schema
-        tables_all = get_tables_from_original_schema(c, args.schema)
-        tables_count = str(len(tables_all))
-        # create table for querying consignments
-        create_consignments_table(c, args.consignments_schema, args.consignments_table, args.consignments_sql_file, args.schema, tables_all)
-        # for every consignment
-        for consignment_result in get_consignments(c, args.consignments_schema, args.consignments_table):
-            consignment_id = int(consignment_result[0])
-            # create schema for the new consignment
-            schema_new = create_schema(c, args.consignments_schema, args.consignments_schema_prefix, consignment_id)
-            # iterate over the schema tables that contains the objects
-            logger.info('{} {} {}.'.format(_('Creating'), tables_count, _('tables')))
-            logger.info('{}...'.format(_('Searching objects that intersects with the consignment')))
-            for table in tables_all:
-                table_original = args.schema + '.' + table[0]
-                table_new = schema_new + '.' + table[0]
-                # create table
-                create_table(c, table_original, table_new)
-                # load intersecting objects into the table
-                load_data(c, args.consignments_schema, args.consignments_table, consignment_id, table[0], table_original, table_new)
+        if args.refresh:
+            # the consignments and the views already exist
+            refresh_views(c, args)
+        else:
+            divide(c, args)
     conn.close()
+    if args.trace:
+        TracedCursor.tman.write_trace(args.trace)
     logger.info('{}'.format(_('End.')))
 
 if __name__ == '__main__':
@@ -28,9 +28,9 @@ from controls.imagery_controls.results import (
   RadBalanceResult, NoDataResult
 )
 from controls.commons_controls.file import (
-  FileManager, FileManagerError, read_twf_file, get_files_path
+  FileManager, FileManagerError, FileFormat, read_twf_file, get_files_path
 )
-from controls.commons_controls.time import TimeManager, get_str_time
+from controls.commons_controls.time import TimeManager, get_str_time, get_span
 #pylint: enable=wrong-import-position
 _ = gettext.gettext
 # logging.basicConfig(level=logging.INFO)
@@ -79,6 +79,18 @@ def get_args():
     '--summary',
     default='summary.txt',
     help=_('summary file name'))
+  parser.add_argument(
+    '--trace',
+    default=None,
+    help=_('Chrome Trace Event JSON file of the run spans (default no trace)'))
+  parser.add_argument(
+    '--format',
+    choices=[
+      FileFormat.csv.value,
+      FileFormat.parquet.value
+    ],
+    default=FileFormat.csv.value,
+    help=_('detail file format'))
   parser.add_argument(
     '--recursive',
     dest='recursive',
@@ -144,16 +156,21 @@ def init_logging():
   # add the file handler to the logger
   logger.addHandler(handler)
 
-def init_detail_file(fman, detail, control):
+def init_detail_file(fman, detail, control, file_format=FileFormat.csv.value):
   """ Helper function to initialize the detail output file.
 
   Args:
     fman: FileManager instance.
     detail: Detail output file name.
     control: Control name.
+    file_format: Detail output file format.
+
+  Returns:
+    True if the detail output file was started.
   """
   controls = []
   hrows = []
+  types = []
   if control in [Control.pixel_size.value, Control.aall.value]:
     controls.append(Control.pixel_size.value)
     hrows.append([
@@ -163,6 +180,7 @@ def init_detail_file(fman, detail, control):
       _('vmin'),
       _('vmax')
     ])
+    types.append(['string', 'bool_', 'float64', 'float64', 'float64'])
   elif control in [Control.bands_len.value, Control.aall.value]:
     controls.append(Control.bands_len.value)
     hrows.append([
@@ -170,6 +188,7 @@ def init_detail_file(fman, detail, control):
       _('conform'),
       _('bands')
     ])
+    types.append(['string', 'bool_', 'int64'])
   elif control in [Control.dig_level.value, Control.aall.value]:
     controls.append(Control.dig_level.value)
     hrows.append([
@@ -177,6 +196,7 @@ def init_detail_file(fman, detail, control):
       _('conform'),
       _('bands')
     ])
+    types.append(['string', 'bool_', 'string'])
   elif control in [Control.rad_balance.value, Control.aall.value]:
     controls.append(Control.rad_balance.value)
     hrows.append([
@@ -184,6 +204,7 @@ def init_detail_file(fman, detail, control):
       _('conform'),
       _('bands')
     ])
+    types.append(['string', 'bool_', 'string'])
   elif control in [Control.nodata.value, Control.aall.value]:
     controls.append(Control.nodata.value)
     hrows.append([
@@ -191,11 +212,21 @@ def init_detail_file(fman, detail, control):
       _('conform'),
       _('bands')
     ])
+    types.append(['string', 'bool_', 'string'])
   try:
     for i__, __ in enumerate(controls):
-      fman.start_csv_file('{}.csv'.format(detail), hrows[i__], dir_name=controls[i__])
+      if file_format == FileFormat.parquet.value:
+        fman.start_parquet_file(
+          '{}.parquet'.format(detail),
+          list(zip(hrows[i__], types[i__])),
+          dir_name=controls[i__]
+        )
+      else:
+        fman.start_csv_file('{}.csv'.format(detail), hrows[i__], dir_name=controls[i__])
   except FileManagerError as err:
     logger.error('%s: %s', _('ERROR'), str(err), exc_info=True)
+    return False
+  return True
 
 def init_summary_data(in_params, num_images, summary_data):
   """ Helper procedure to initialize the summary output file.
@@ -215,7 +246,8 @@ def init_summary_data(in_params, num_images, summary_data):
   summary_data[Control.nodata.value] = []
 
 def end_summary_data(tman, summary_data):
-  """ Helper procedure to update process start and end time of summary data.
+  """ Helper procedure to update process start and end time, and the timing breakdown, of
+  summary data.
 
   Args:
     tman: TimeManager object to get start and end times.
@@ -223,8 +255,9 @@ def end_summary_data(tman, summary_data):
   """
   summary_data[_('Start time')] = tman.dt_start
   summary_data[_('End time')] = tman.dt_end
+  summary_data.update(tman.get_summary_data())
 
-def save_result(fman, name, control, data):
+def save_result(fman, name, control, data, file_format=FileFormat.csv.value, tman=None):
   """ Helper procedure to write control result to detail output file.
 
   Args:
@@ -232,10 +265,16 @@ def save_result(fman, name, control, data):
     name: Detail file name.
     control: Name of the control.
     data: Dictionary with the header and rows for the detail output file.
+    file_format: Detail output file format.
+    tman: TimeManager instance to time the write, or None.
   """
-  fman.append_csv_file('{}.csv'.format(name), data, control)
+  with get_span(tman, 'write'):
+    if file_format == FileFormat.parquet.value:
+      fman.append_parquet_file('{}.parquet'.format(name), [data], control)
+    else:
+      fman.append_csv_file('{}.csv'.format(name), data, control)
 
-def control_img(fman, img, args, summary_data):
+def control_img(fman, img, args, summary_data, tman=None):
   """Helper procedure to execute a control on a image.
 
   Args:
@@ -243,9 +282,10 @@ def control_img(fman, img, args, summary_data):
     img: image file path.
     control: Dictionary containing the name and parameters of the control.
     summary_data: Summary data dictionary.
+    tman: TimeManager instance to time the control, or None.
   """
   try:
-    raster = RasterManager(img)
+    raster = RasterManager(img, tman=tman)
   except RasterManagerError as err:
     logger.error('%s', str(err), exc_info=True)
     return
@@ -272,7 +312,9 @@ def control_img(fman, img, args, summary_data):
       fman,
       args.detail,
       args.control,
-      row
+      row,
+      args.format,
+      tman
     )
     if not res.is_conform:
       summary_data[args.control].append(img)
@@ -286,7 +328,9 @@ def control_img(fman, img, args, summary_data):
       fman,
       args.detail,
       args.control,
-      row
+      row,
+      args.format,
+      tman
     )
     if not res.is_conform:
       summary_data[args.control].append(img)
@@ -300,7 +344,9 @@ def control_img(fman, img, args, summary_data):
       fman,
       args.detail,
       args.control,
-      row
+      row,
+      args.format,
+      tman
     )
     if not res.is_conform:
       summary_data[args.control].append(img)
@@ -314,7 +360,9 @@ def control_img(fman, img, args, summary_data):
       fman,
       args.detail,
       args.control,
-      row
+      row,
+      args.format,
+      tman
     )
     if not res.is_conform:
       summary_data[args.control].append(img)
@@ -328,7 +376,9 @@ def control_img(fman, img, args, summary_data):
       fman,
       args.detail,
       args.control,
-      row
+      row,
+      args.format,
+      tman
     )
     if not res.is_conform:
       summary_data[args.control].append(img)
@@ -340,22 +390,30 @@ def main():
   fman = init_file_manager(args.output, args.control)
   if not fman:
     sys.exit()
-  imgs = get_files_path(args.input, 'tif', args.recursive)
-  tman = TimeManager()
+  tman = TimeManager(trace=args.trace is not None)
+  tman.start()
+  with tman.span('discovery', {'folder': args.input}):
+    imgs = get_files_path(args.input, 'tif', args.recursive)
   summary_data = {}
   init_summary_data(' '.join(sys.argv), len(imgs), summary_data)
   print('{}...'.format(_('Processing')))
   logger.info('%s...', _('Processing'))
   print('{}...'.format(_('Image')))
   logger.info('%s:', _('Image'))
-  init_detail_file(fman, args.detail, args.control)
+  if not init_detail_file(fman, args.detail, args.control, args.format):
+    sys.exit()
   for img in imgs:
     print('  {}'.format(img))
     logger.info('  %s', img)
-    control_img(fman, img, args, summary_data)
+    with tman.span('image', {'file': img}):
+      control_img(fman, img, args, summary_data, tman)
+    tman.count('images')
+  fman.close_parquet_files()
   tman.end()
   end_summary_data(tman, summary_data)
   fman.write_txt_file(args.summary, summary_data)
+  if args.trace:
+    tman.write_trace(args.trace)
   print('{}.'.format(_('End')))
   logger.info('%s.', _('End'))
 
@@ -9,6 +9,7 @@ import gettext
 import numpy as np
 from osgeo import gdal
 from controls.imagery_controls.results import WorldFileData
+from controls.commons_controls.time import get_span
 
 class RasterManagerError(Exception):
   """Exception for RasterManager."""
@@ -22,16 +23,19 @@ class RasterManager:
     logger: Logging object.
     conn: Connection to database.
     cursor: Cursor of connection to database.
+    tman: TimeManager instance to time the open, statistics and reads, or None.
   """
 
-  def __init__(self, raster=None, logger=None):
+  def __init__(self, raster=None, logger=None, tman=None):
     # internal
     self._ = gettext.gettext
     # parameters
     self.logger = logger or logging.getLogger(__name__)
     self.raster = raster
+    self.tman = tman
     try:
-      self.dataset = gdal.Open(self.raster)
+      with get_span(self.tman, 'open', {'file': self.raster}):
+        self.dataset = gdal.Open(self.raster)
     except RuntimeError:
       msg = '{}'.format(self._('Cannot open image'))
       self.logger.error(msg, exc_info=True)
@@ -135,15 +139,17 @@ class RasterManager:
     try:
       for r__ in range(self.dataset.RasterCount):
         band = self.get_raster_band(r__ + 1)
-        stats = band.GetStatistics(True, True)
+        with get_span(self.tman, 'statistics', {'band': r__ + 1}):
+          stats = band.GetStatistics(True, True)
         rmin = stats[0] * (1 + deviation)
         rmax = stats[1] * (1 - deviation)
-        band_arr = band.ReadAsArray(
-          0,
-          0,
-          self.dataset.RasterXSize,
-          self.dataset.RasterYSize
-        ).astype(np.float)
+        with get_span(self.tman, 'read', {'band': r__ + 1}):
+          band_arr = band.ReadAsArray(
+            0,
+            0,
+            self.dataset.RasterXSize,
+            self.dataset.RasterYSize
+          ).astype(np.float)
         cmin = np.count_nonzero(band_arr < rmin)
         cmax = np.count_nonzero(band_arr > rmax)
         cval = self.dataset.RasterXSize * self.dataset.RasterYSize
@@ -179,12 +185,13 @@ class RasterManager:
       for r__ in range(self.dataset.RasterCount):
         band = self.get_raster_band(r__ + 1)
         nodata = band.GetNoDataValue()
-        band_arr = band.ReadAsArray(
-          0,
-          0,
-          self.dataset.RasterXSize,
-          self.dataset.RasterYSize
-        ).astype(np.float)
+        with get_span(self.tman, 'read', {'band': r__ + 1}):
+          band_arr = band.ReadAsArray(
+            0,
+            0,
+            self.dataset.RasterXSize,
+            self.dataset.RasterYSize
+          ).astype(np.float)
         cnd = np.count_nonzero(band_arr == nodata)
         cval = self.dataset.RasterXSize * self.dataset.RasterYSize
         pnd = round(cnd/cval, 6)
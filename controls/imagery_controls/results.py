@@ -21,6 +21,8 @@ class WorldFileData: # pylint: disable=R0903
     rotation: rotation about x and y axis (B, D).
     coordinate: x and y coordinate of the center of the upper left pixel (C, F).
   """
+  __slots__ = ('pixel_size', 'rotation', 'coordinate')
+
   def __init__(self, pixel_size=None, rotation=None, coordinate=None):
     self.pixel_size = pixel_size
     self.rotation = rotation
@@ -53,6 +55,8 @@ class PixelSizeResult: # pylint: disable=R0903
       vmin: Conformity min value.
       vmax: Conformity max value.
   """
+  __slots__ = ('conform', 'deviation', 'is_conform', 'min_size', 'vmin', 'vmax')
+
   def __init__(self, xy_=None, conform=None, deviation=None):
     self.conform = conform
     self.deviation = deviation
@@ -89,6 +93,8 @@ class BandsLenResult: # pylint: disable=R0903
       is_conform: True if pixel size is conform.
       bands_len: Number of bands.
   """
+  __slots__ = ('conform', 'is_conform', 'bands_len')
+
   def __init__(self, bands_len=None, conform=None):
     self.conform = conform
     self.bands_len = bands_len
@@ -111,6 +117,8 @@ class DigitalLevelResult: # pylint: disable=R0903
       is_conform: True if pixel size is conform.
       bands_dt: Bands GDAL data types.
   """
+  __slots__ = ('conform', 'is_conform', 'bands_dl')
+
   def __init__(self, bands_dt=None, conform=None):
     self.conform = conform
     self.bands_dl = []
@@ -152,6 +160,8 @@ class RadBalanceResult: # pylint: disable=R0903
       is_conform: True if pixel size is conform.
       bands_stats: Bands statistics for radiometric balance.
   """
+  __slots__ = ('conform', 'is_conform', 'bands_stats')
+
   def __init__(self, bands_stats=None, conform=None):
     self.conform = conform
     self.bands_stats = bands_stats
@@ -180,6 +190,8 @@ class NoDataResult: # pylint: disable=R0903
       is_conform: True if pixel size is conform.
       bands_nodata: Bands percentage of nodata values.
   """
+  __slots__ = ('conform', 'is_conform', 'bands_nodata')
+
   def __init__(self, bands_nodata=None, conform=None):
     self.conform = conform
     self.bands_nodata = bands_nodata
@@ -2,6 +2,7 @@
 
 Enumerates:
   Rule.
+  Export.
 """
 
 from enum import Enum
@@ -14,3 +15,8 @@ class Rule(Enum):
   intersect = 'intersect'
   null = 'null'
   aall = 'all'
+
+class Export(Enum):
+  """Enumerate of result export modes"""
+  rows = 'rows'
+  copy = 'copy'
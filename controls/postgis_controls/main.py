@@ -10,6 +10,10 @@ Examples:
   --host local-data-server --rule multipart.
   $python main.py test_vector_db null_geoms test_user test_password output
   --host local-data-server --rule null.
+  $python main.py test_vector_db invalid_geoms test_user test_password output
+  --host local-data-server --rule invalid --export copy.
+  $python main.py test_vector_db invalid_geoms test_user test_password output
+  --host local-data-server --rule invalid --format parquet.
 """
 import os
 import sys
@@ -19,14 +23,15 @@ import logging
 # add top level package to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
 #pylint: disable=wrong-import-position
-from controls.postgis_controls.enums import Rule
+from controls.postgis_controls.enums import Rule, Export
 from controls.postgis_controls.pgdb import (
-  PGDBManager, PGDBManagerError, PGDBConnection, PGDBCredentials
+  PGDBManager, PGDBManagerError, PGDBConnection, PGDBCredentials,
+  invalid_geoms_query, duplicate_geoms_query, multipart_geoms_query, null_geoms_query, to_rows
 )
 from controls.commons_controls.file import (
-  FileManager, FileManagerError, read_json_file
+  FileManager, FileManagerError, FileFormat, read_json_file
 )
-from controls.commons_controls.time import TimeManager, get_str_time
+from controls.commons_controls.time import TimeManager, get_str_time, get_span
 #pylint: enable=wrong-import-position
 _ = gettext.gettext
 # logging.basicConfig(level=logging.INFO)
@@ -72,9 +77,31 @@ def get_args():
     '--summary',
     default='resumen.txt',
     help=_('summary file name'))
+  parser.add_argument(
+    '--trace',
+    default=None,
+    help=_('Chrome Trace Event JSON file of the run spans (default no trace)'))
   parser.add_argument(
     '--admissibles',
     help=_('admissible intersections file name'))
+  parser.add_argument(
+    '--export',
+    choices=[
+      Export.rows.value,
+      Export.copy.value
+    ],
+    default=Export.rows.value,
+    help=_('export mode, copy writes the results straight from the database')
+  )
+  parser.add_argument(
+    '--format',
+    choices=[
+      FileFormat.csv.value,
+      FileFormat.parquet.value
+    ],
+    default=FileFormat.csv.value,
+    help=_('result files format')
+  )
   args = parser.parse_args()
   return args
 
@@ -106,6 +133,40 @@ def init_file_manager(out_dir, rule):
     fman = None
   return fman
 
+def init_parquet_files(fman, rule):
+  """ Helper procedure to initialize one Parquet file per rule, appendable across tables.
+
+  Args:
+    fman: FileManager object to write detail output files.
+    rule: Name of the rule.
+  """
+  columns = {
+    Rule.invalid.value: [
+      (_('table'), 'string'), (_('id'), 'int64'), (_('reason'), 'string'),
+      (_('location'), 'binary')
+    ],
+    Rule.duplicate.value: [(_('table'), 'string'), (_('id'), 'int64'), (_('amount'), 'int64')],
+    Rule.multipart.value: [(_('table'), 'string'), (_('id'), 'int64'), (_('number'), 'int64')],
+    Rule.null.value: [(_('table'), 'string'), (_('id'), 'int64')]
+  }
+  for rule_ in columns:
+    if rule in (rule_, Rule.aall.value):
+      fman.start_parquet_file('{}.parquet'.format(rule_), columns[rule_], rule_)
+  if rule == Rule.intersect.value:
+    for key in ['point', 'line', 'polygon', 'collection']:
+      fman.start_parquet_file(
+        '{}_{}.parquet'.format(rule, key),
+        [
+          (_('table-1'), 'string'),
+          (_('table-1-id'), 'int64'),
+          (_('table-2'), 'string'),
+          (_('table-2-id'), 'int64'),
+          (_('intersection'), 'binary'),
+          (_('message'), 'string')
+        ],
+        rule
+      )
+
 def init_logging():
   """ Helper function to initialize logging."""
   logger.setLevel(logging.INFO)
@@ -119,7 +180,7 @@ def init_logging():
   logger.addHandler(handler)
 
 
-def init_pgdb(host, port, dbname, username, password):
+def init_pgdb(host, port, dbname, username, password, tman=None):
   """ Helper function to initialize the postgis manager.
 
   Args:
@@ -128,6 +189,7 @@ def init_pgdb(host, port, dbname, username, password):
     dbname: Name of the database.
     username: Name of the user.
     password: Password of the user.
+    tman: TimeManager instance to time the queries, or None.
 
   Returns:
     A PGDBManager object to handle all database operations.
@@ -136,7 +198,8 @@ def init_pgdb(host, port, dbname, username, password):
   try:
     pgdb = PGDBManager(
       PGDBConnection(host, port, dbname),
-      PGDBCredentials(username, password)
+      PGDBCredentials(username, password),
+      tman=tman
     )
     pgdb.connect()
   except PGDBManagerError as err:
@@ -161,7 +224,8 @@ def init_summary_data(in_params, num_tables, summary_data):
   summary_data[Rule.intersect.value] = []
 
 def end_summary_data(tman, summary_data):
-  """ Helper procedure to update process start and end time of summary data.
+  """ Helper procedure to update process start and end time, and the timing breakdown, of
+  summary data.
 
   Args:
     tman: TimeManager object to get start and end times.
@@ -169,90 +233,186 @@ def end_summary_data(tman, summary_data):
   """
   summary_data[_('Start time')] = tman.dt_start
   summary_data[_('End time')] = tman.dt_end
+  summary_data.update(tman.get_summary_data())
 
-def process_result(fman, rule, table, data, keys=None):
-  """ Helper procedure to write control result to detail output file.
+def process_result(
+  fman, rule, table, data, keys=None, file_format=FileFormat.csv.value, tman=None):
+  """ Helper function to write control result to detail output file.
 
   Args:
     fman: FileManager object to write detail output file.
     rule: Name of the rule.
     table: Name of the table.
-    data: Dictionary with the header and rows for the detail output file.
+    data: Dictionary with the header and rows, or the header and copy function,
+      for the detail output file.
     keys: Keys of row values to write.
+    file_format: Format of the detail output file. Parquet results are appended,
+      with the table name, to the rule file.
+    tman: TimeManager instance to time the write, or None.
+
+  Returns:
+    True if the detail output file was written.
   """
-  if keys:
-    for key in keys:
-      if data['rows'][key]:
-        fman.write_csv_file(
-          rule,
-          '{}_{}.csv'.format(table, key),
-          data['hrow'],
-          data['rows'][key].to_list()
+  with get_span(tman, 'write', {'rule': rule, 'table': table}):
+    if 'copy' in data:
+      return fman.copy_csv_file(rule, '{}.csv'.format(table), data['hrow'], data['copy'])
+    if file_format == FileFormat.parquet.value:
+      if keys:
+        for key in keys:
+          fman.append_parquet_file(
+            '{}_{}.parquet'.format(rule, key),
+            to_rows(getattr(data['rows'], key)),
+            rule
+          )
+      else:
+        fman.append_parquet_file(
+          '{}.parquet'.format(rule),
+          ([table] + row for row in data['rows']),
+          rule
         )
-  else:
-    fman.write_csv_file(rule, '{}.csv'.format(table), data['hrow'], data['rows'])
+    elif keys:
+      for key in keys:
+        if getattr(data['rows'], key):
+          fman.write_csv_file(
+            rule,
+            '{}_{}.csv'.format(table, key),
+            data['hrow'],
+            to_rows(getattr(data['rows'], key))
+          )
+    else:
+      fman.write_csv_file(rule, '{}.csv'.format(table), data['hrow'], data['rows'])
+    return True
+
+def copy_result(man, dbi, rule, hrow, query, summary_data):
+  """Helper procedure to export a rule result of a table straight from the database.
+
+  Args:
+    man: Dictionary containing FileManager and PGDBManager instances.
+    dbi: Dictionary containing schema, table and tables.
+    rule: Name of the rule.
+    hrow: Header of the detail output file.
+    query: Function that returns the sql query of the rule.
+    summary_data: Summary data dictionary.
+  """
+  if process_result(
+    man['fman'],
+    rule,
+    dbi['table'],
+    {
+      'hrow': hrow,
+      'copy': lambda file: man['pgdb'].copy_query_result(
+        query(dbi['dbschema'], dbi['table']),
+        file
+      )
+    },
+    tman=man.get('tman')
+  ):
+    summary_data[rule].append(dbi['table'])
+
+def get_rules(rule):
+  """ Helper function to get the rules executed by a rule option.
+
+  Args:
+    rule: Name of the rule option.
+
+  Returns:
+    List of rule names.
+  """
+  if rule == Rule.aall.value:
+    return [Rule.invalid.value, Rule.duplicate.value, Rule.multipart.value, Rule.null.value]
+  return [rule]
 
 def control_table(man, dbi, control, summary_data):
   """Helper procedure to execute a control on a table.
 
   Args:
-    man: Dictionary containing FileManager and PGDBManager instances.
+    man: Dictionary containing FileManager and PGDBManager instances, and optionally the
+      TimeManager instance to time the writes.
     dbi: Dictionary containing schema, table and tables.
-    control: Dictionary containing the rule and the admissibles intersections.
+    control: Dictionary containing the rule, the admissibles intersections, the export mode
+      and the result files format.
     summary_data: Summary data dictionary.
   """
   if control['rule'] in (Rule.invalid.value, Rule.aall.value):
-    invs = man['pgdb'].get_invalid_geoms_from_table(dbi['dbschema'], dbi['table'])
-    if invs:
-      process_result(
-        man['fman'],
-        Rule.invalid.value,
+    hrow = [_('id'), _('reason'), _('location')]
+    if control['export'] == Export.copy.value:
+      copy_result(man, dbi, Rule.invalid.value, hrow, invalid_geoms_query, summary_data)
+    else:
+      invs = man['pgdb'].get_invalid_geoms_from_table(
+        dbi['dbschema'],
         dbi['table'],
-        {
-          'hrow': [_('id'), _('reason'), _('location')],
-          'rows': [inv.to_list() for inv in invs]
-        }
+        control['format'] == FileFormat.parquet.value
       )
-      summary_data[Rule.invalid.value].append(dbi['table'])
+      if invs:
+        process_result(
+          man['fman'],
+          Rule.invalid.value,
+          dbi['table'],
+          {
+            'hrow': hrow,
+            'rows': to_rows(invs)
+          },
+          file_format=control['format'],
+          tman=man.get('tman')
+        )
+        summary_data[Rule.invalid.value].append(dbi['table'])
   if control['rule'] in (Rule.duplicate.value, Rule.aall.value):
-    dups = man['pgdb'].get_duplicate_geoms_from_table(dbi['dbschema'], dbi['table'])
-    if dups:
-      process_result(
-        man['fman'],
-        Rule.duplicate.value,
-        dbi['table'],
-        {
-          'hrow': [_('id'), _('amount')],
-          'rows': [dup.to_list() for dup in dups]
-        }
-      )
-      summary_data[Rule.duplicate.value].append(dbi['table'])
+    hrow = [_('id'), _('amount')]
+    if control['export'] == Export.copy.value:
+      copy_result(man, dbi, Rule.duplicate.value, hrow, duplicate_geoms_query, summary_data)
+    else:
+      dups = man['pgdb'].get_duplicate_geoms_from_table(dbi['dbschema'], dbi['table'])
+      if dups:
+        process_result(
+          man['fman'],
+          Rule.duplicate.value,
+          dbi['table'],
+          {
+            'hrow': hrow,
+            'rows': to_rows(dups)
+          },
+          file_format=control['format'],
+          tman=man.get('tman')
+        )
+        summary_data[Rule.duplicate.value].append(dbi['table'])
   if control['rule'] in (Rule.multipart.value, Rule.aall.value):
-    muls = man['pgdb'].get_multipart_geoms_from_table(dbi['dbschema'], dbi['table'])
-    if muls:
-      process_result(
-        man['fman'],
-        Rule.multipart.value,
-        dbi['table'],
-        {
-          'hrow': [_('id'), _('number')],
-          'rows': [mul.to_list() for mul in muls]
-        }
-      )
-      summary_data[Rule.multipart.value].append(dbi['table'])
+    hrow = [_('id'), _('number')]
+    if control['export'] == Export.copy.value:
+      copy_result(man, dbi, Rule.multipart.value, hrow, multipart_geoms_query, summary_data)
+    else:
+      muls = man['pgdb'].get_multipart_geoms_from_table(dbi['dbschema'], dbi['table'])
+      if muls:
+        process_result(
+          man['fman'],
+          Rule.multipart.value,
+          dbi['table'],
+          {
+            'hrow': hrow,
+            'rows': to_rows(muls)
+          },
+          file_format=control['format'],
+          tman=man.get('tman')
+        )
+        summary_data[Rule.multipart.value].append(dbi['table'])
   if control['rule'] in (Rule.null.value, Rule.aall.value):
-    nuls = man['pgdb'].get_null_geoms_from_table(dbi['dbschema'], dbi['table'])
-    if nuls:
-      process_result(
-        man['fman'],
-        Rule.null.value,
-        dbi['table'],
-        {
-          'hrow': [_('id')],
-          'rows': [nul.to_list() for nul in nuls]
-        }
-      )
-      summary_data[Rule.null.value].append(dbi['table'])
+    hrow = [_('id')]
+    if control['export'] == Export.copy.value:
+      copy_result(man, dbi, Rule.null.value, hrow, null_geoms_query, summary_data)
+    else:
+      nuls = man['pgdb'].get_null_geoms_from_table(dbi['dbschema'], dbi['table'])
+      if nuls:
+        process_result(
+          man['fman'],
+          Rule.null.value,
+          dbi['table'],
+          {
+            'hrow': hrow,
+            'rows': to_rows(nuls)
+          },
+          file_format=control['format'],
+          tman=man.get('tman')
+        )
+        summary_data[Rule.null.value].append(dbi['table'])
   if control['rule'] == Rule.intersect.value:
     i = dbi['tables'].index(dbi['table']) + 1
     if i < len(dbi['tables']):
@@ -260,7 +420,8 @@ def control_table(man, dbi, control, summary_data):
         dbi['dbschema'],
         dbi['table'],
         dbi['tables'][i:],
-        control['admissibles']
+        control['admissibles'],
+        control['format'] == FileFormat.parquet.value
       )
       if ints:
         process_result(
@@ -278,7 +439,9 @@ def control_table(man, dbi, control, summary_data):
             ],
             'rows': ints
           },
-          ['point', 'line', 'polygon', 'collection']
+          ['point', 'line', 'polygon', 'collection'],
+          control['format'],
+          man.get('tman')
         )
         summary_data[Rule.intersect.value].append(dbi['table'])
 
@@ -289,18 +452,30 @@ def main():
   fman = init_file_manager(args.output, args.rule)
   if not fman:
     sys.exit()
+  if args.format == FileFormat.parquet.value:
+    if args.export == Export.copy.value:
+      logger.warning('%s', _('Copy export is only available for csv format, using rows'))
+      args.export = Export.rows.value
+    try:
+      init_parquet_files(fman, args.rule)
+    except FileManagerError as err:
+      logger.error('%s: %s', _('ERROR'), str(err), exc_info=True)
+      sys.exit()
+  tman = TimeManager(trace=args.trace is not None)
+  tman.start()
   pgdb = init_pgdb(
     args.host,
     args.port,
     args.dbname,
     args.user,
-    args.password
+    args.password,
+    tman
   )
   if not pgdb:
     sys.exit()
   admissibles = read_json_file(args.admissibles)
-  tables = pgdb.get_schema_table_names(args.dbschema)
-  tman = TimeManager()
+  with tman.span('discovery', {'schema': args.dbschema}):
+    tables = pgdb.get_schema_table_names(args.dbschema)
   summary_data = {}
   init_summary_data(' '.join(sys.argv), len(tables), summary_data)
   print('{}...'.format(_('Processing')))
@@ -310,24 +485,35 @@ def main():
   for table in tables:
     print('  {}'.format(table))
     logger.info('  %s', table)
-    control_table(
-      {
-        'fman':fman,
-        'pgdb':pgdb
-      },
-      {
-        'dbschema':args.dbschema,
-        'table':table,
-        'tables':tables,
-      },
-      {
-        'rule':args.rule,
-        'admissibles':admissibles
-      },
-      summary_data)
+    with tman.span('table', {'table': table}):
+      # one rule at a time, so every rule is timed
+      for rule in get_rules(args.rule):
+        with tman.span(rule, {'table': table}):
+          control_table(
+            {
+              'fman':fman,
+              'pgdb':pgdb,
+              'tman':tman
+            },
+            {
+              'dbschema':args.dbschema,
+              'table':table,
+              'tables':tables,
+            },
+            {
+              'rule':rule,
+              'admissibles':admissibles,
+              'export':args.export,
+              'format':args.format
+            },
+            summary_data)
+    tman.count('tables')
+  fman.close_parquet_files()
   tman.end()
   end_summary_data(tman, summary_data)
   fman.write_txt_file(args.summary, summary_data)
+  if args.trace:
+    tman.write_trace(args.trace)
   print('{}.'.format(_('End')))
   logger.info('%s.', _('End'))
 
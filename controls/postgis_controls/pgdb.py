@@ -7,6 +7,7 @@ Functions:
   null_geoms_query.
   point_in_geojson_geom.
   intersection_query.
+  to_rows.
 
 Classes:
   InvalidGeomResult.
@@ -23,13 +24,15 @@ import json
 import logging
 import gettext
 import psycopg2
+from controls.commons_controls.time import get_span
 
-def invalid_geoms_query(schema, table):
+def invalid_geoms_query(schema, table, wkb=False):
   """Returns sql query to check invalid geometries of a table.
 
   Args:
     schema: Name of the schema.
     table: Name of the table.
+    wkb: Boolean indicating if locations are returned as WKB instead of WKT.
 
   Returns:
     String sql query.
@@ -37,11 +40,11 @@ def invalid_geoms_query(schema, table):
   return (
     'SELECT id, '
     'reason(ST_IsValidDetail(geom)), '
-    'ST_AsText(location(ST_IsValidDetail(geom))) '
+    '{}(location(ST_IsValidDetail(geom))) '
     'FROM {}.{} '
     'WHERE ST_IsValid(geom) = false '
     'ORDER BY id'
-  ).format(schema, table)
+  ).format('ST_AsBinary' if wkb else 'ST_AsText', schema, table)
 
 def duplicate_geoms_query(schema, table):
   """ Returns sql query to check duplicate geometries of a table.
@@ -121,13 +124,14 @@ def point_in_geojson_geom(point, geom):
           return True
   return False
 
-def intersection_query(schema, table1, table2):
+def intersection_query(schema, table1, table2, wkb=False):
   """Returns sql query to check intersection between two tables.
 
   Args:
     schema: Name of the schema.
     table1: Name of the first table.
     table2: Name of the second table.
+    wkb: Boolean indicating if intersections are returned as WKB instead of WKT.
 
   Returns:
     String sql query.
@@ -139,7 +143,7 @@ def intersection_query(schema, table1, table2):
     'ST_AsGeoJSON(gi, 3),'
     'ST_AsGeoJSON(g1, 3),'
     'ST_AsGeoJSON(g2, 3),'
-    'ST_AsText(ST_Multi(gi)),'
+    '{3}(ST_Multi(gi)),'
     't1_crosses_t2,'
     'ST_Dimension(gi) '
     'FROM ('
@@ -154,7 +158,18 @@ def intersection_query(schema, table1, table2):
       'WHERE ST_Intersects(t1.geom, t2.geom) AND NOT ST_Touches(t1.geom, t2.geom) '
       'ORDER BY t1.id'
     ') AS foo'
-  ).format(schema, table1, table2)
+  ).format(schema, table1, table2, 'ST_AsBinary' if wkb else 'ST_AsText')
+
+def to_rows(results):
+  """Returns the attribute values of each result.
+
+  Args:
+    results: Iterable of results with a to_list method.
+
+  Returns:
+    Generator of lists with the attribute values.
+  """
+  return (result.to_list() for result in results)
 
 class InvalidGeomResult:
   """Class for a invalid geometry result.
@@ -164,6 +179,8 @@ class InvalidGeomResult:
       reason: Reason for invalidity.
       location: Point where invalidity occurs.
   """
+  __slots__ = ('fid', 'reason', 'location')
+
   def __init__(self, fid=None, reason=None, location=None):
     self.fid = fid
     self.reason = reason
@@ -194,6 +211,7 @@ class DuplicateGeomResult:
       fid: Feature ID.
       number: Number of duplications.
   """
+  __slots__ = ('fid', 'number')
 
   def __init__(self, fid=None, number=None):
     self.fid = fid
@@ -223,6 +241,8 @@ class MultipartGeomResult:
       fid: Feature ID.
       number: Number of duplications.
   """
+  __slots__ = ('fid', 'number')
+
   def __init__(self, fid=None, number=None):
     self.fid = fid
     self.number = number
@@ -250,6 +270,7 @@ class NullGeomResult:
   Attributes:
       fid: Feature ID.
   """
+  __slots__ = ('fid',)
 
   def __init__(self, fid=None):
     self.fid = fid
@@ -281,6 +302,7 @@ class IntersectGeomResult:
       int_geom: Geometry of the intersection.
       msg: Message of invalid intersection.
   """
+  __slots__ = ('table1', 'fid1', 'table2', 'fid2', 'int_geom', 'msg')
 
   def __init__(self, table1=None, fid1=None, table2=None, fid2=None, int_geom=None, msg=None):
     self.table1 = table1
@@ -294,14 +316,14 @@ class IntersectGeomResult:
     """Load attribute values from a list.
 
     Args:
-      arr: List with fid1, table1, fid2, table2, int_geom, msg values.
+      arr: List with table1, fid1, table2, fid2, int_geom, msg values.
     """
     self.table1 = arr[0]
     self.fid1 = arr[1]
-    self.table2 = arr[1]
-    self.fid2 = arr[2]
-    self.int_geom = arr[3]
-    self.msg = arr[4]
+    self.table2 = arr[2]
+    self.fid2 = arr[3]
+    self.int_geom = arr[4]
+    self.msg = arr[5]
 
   def to_list(self):
     """Load attribute values from a list.
@@ -391,13 +413,15 @@ class PGDBManager:
     logger: Logging object.
     conn: Connection to database.
     cursor: Cursor of connection to database.
+    tman: TimeManager instance to time the queries, or None.
   """
 
   def __init__(
     self,
     conn_params=None,
     cred_params=None,
-    logger=None
+    logger=None,
+    tman=None
     ):
     # parameters
     if conn_params is None:
@@ -411,6 +435,7 @@ class PGDBManager:
     self.logger = logger or logging.getLogger(__name__)
     self.conn = None
     self.cursor = None
+    self.tman = tman
     # internal
     self._ = gettext.gettext
 
@@ -453,15 +478,45 @@ class PGDBManager:
     sp_ = uuid.uuid1().hex
     self.cursor.execute('SAVEPOINT "{}"'.format(sp_))
     try:
-      self.cursor.execute(query)
-      rows = self.cursor.fetchall()
+      with get_span(self.tman, 'query', {'query': query}):
+        self.cursor.execute(query)
+      with get_span(self.tman, 'fetch'):
+        rows = self.cursor.fetchall()
     except Exception:
       self.cursor.execute('ROLLBACK TO SAVEPOINT "{}"'.format(sp_))
       raise
     else:
       self.cursor.execute('RELEASE SAVEPOINT "{}"'.format(sp_))
+    if self.tman:
+      self.tman.count('queries')
+      self.tman.count('rows', len(rows))
     return rows
 
+  def copy_query_result(self, query, file):
+    """Execute a query and copy the result, in CSV format and without header, to a file.
+
+    Args:
+      query: SQL string query.
+      file: File object to write the result.
+
+    Raises:
+      PGDBManagerError
+    """
+    sp_ = uuid.uuid1().hex
+    self.cursor.execute('SAVEPOINT "{}"'.format(sp_))
+    try:
+      with get_span(self.tman, 'copy', {'query': query}):
+        self.cursor.copy_expert('COPY ({}) TO STDOUT WITH CSV'.format(query), file)
+    except Exception:
+      self.cursor.execute('ROLLBACK TO SAVEPOINT "{}"'.format(sp_))
+      msg = '{}'.format(self._('Cannot copy query result'))
+      self.logger.error(msg, exc_info=True)
+      raise PGDBManagerError(msg)
+    else:
+      self.cursor.execute('RELEASE SAVEPOINT "{}"'.format(sp_))
+    if self.tman:
+      self.tman.count('queries')
+
   def get_schema_table_names(self, schema):
     """Return a list with the table names in the schema.
 
@@ -488,12 +543,13 @@ class PGDBManager:
       raise PGDBManagerError(msg)
     return rows
 
-  def get_invalid_geoms_from_table(self, schema, table):
+  def get_invalid_geoms_from_table(self, schema, table, wkb=False):
     """Return a list with invalid geometries result.
 
     Args:
       schema: Name of schema.
       table: Name of table.
+      wkb: Boolean indicating if locations are returned as WKB instead of WKT.
 
     Returns:
       InvalidGeomResult list.
@@ -501,7 +557,7 @@ class PGDBManager:
     Raises:
       PGDBManagerError
     """
-    query = invalid_geoms_query(schema, table)
+    query = invalid_geoms_query(schema, table, wkb)
     try:
       rows = self.get_query_result(query)
     except:
@@ -649,7 +705,7 @@ class PGDBManager:
         return self._('invalid addmissible intersection')
     return self._('not a line-line or line-polygon intersection')
 
-  def get_not_allowed_intersection(self, schema, table, tables, admissibles):
+  def get_not_allowed_intersection(self, schema, table, tables, admissibles, wkb=False):
     """Return a list with not allowed intersection geometries result.
 
     Args:
@@ -657,6 +713,7 @@ class PGDBManager:
       table: Name of table.
       tables: Name of tables.
       admissibles: Admissibles intersections dictionary.
+      wkb: Boolean indicating if intersections are returned as WKB instead of WKT.
 
     Returns:
       NotAllowedIntersectionsResult list.
@@ -666,7 +723,7 @@ class PGDBManager:
     """
     values = NotAllowedIntersectionsResult(point=[], line=[], polygon=[], collection=[])
     for table2 in tables:
-      query = intersection_query(schema, table, table2)
+      query = intersection_query(schema, table, table2, wkb)
       self.logger.debug(
         '%s: %s - %s', self._('Intersection'), table, table2
       )
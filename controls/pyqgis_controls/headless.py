@@ -0,0 +1,540 @@
+""" Module that controls the correct flow of the hydrography without QGIS.
+    Geometries are loaded from PostGIS as WKB into shapely, and indexed with STRtree, so the
+    control runs on servers without a QGIS installation.
+
+Examples:
+  $python headless.py -h.
+  $python headless.py dbname dbschema user password output rem conf.
+  $python headless.py test_vector_db hidrografia test_user test_password output
+  remesa.shp config/pyqgis_controls.json --server localhost --port 5432.
+  $python headless.py dbname dbschema user password output rem conf --node-index.
+  $python headless.py dbname dbschema user password output rem conf --network.
+  $python headless.py dbname dbschema user password output rem conf --workers 4.
+  $python headless.py dbname dbschema user password output rem conf --tile-size 5000.
+  $python headless.py dbname dbschema user password output rem conf --trace trace.json.
+
+Attributes:
+  _: gettext
+
+pyqgis_controls.headless
+"""
+import os
+import sys
+import argparse
+import gettext
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import psycopg2
+import shapely
+try:
+    from osgeo import ogr
+except ImportError:
+    ogr = None
+# add top level package to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+#pylint: disable=wrong-import-position
+from controls.commons_controls.file import FileManager, FileManagerError, read_json_file
+from controls.commons_controls.time import TimeManager, get_time, get_span
+from controls.pyqgis_controls.network import NodeIndex, FlowNetwork
+from controls.pyqgis_controls.heights import get_offsets, flow_errors, constant_height_errors
+from controls.pyqgis_controls.tiles import (
+    get_tiles, expand_extent, get_owner_mask, get_extent_filter
+)
+#pylint: enable=wrong-import-position
+
+_ = gettext.gettext
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# shapely geometry type ids checked in the intersections
+POINT = 0
+LINESTRING = 1
+MULTIPOINT = 4
+MULTILINESTRING = 5
+
+# folder of the result files of the worker processes, merged at the end
+PARTS_DIR = 'parts'
+
+FLOW_HEADER = [_('Input_Layer'), _('OBJECTID'), _('Description'), _('Height'),
+               _('Height_difference'), _('X_Coordinate'), _('Y_Coordinate')]
+AREA_HEADER = [_('Input_Layer'), _('OBJECTID'), _('Description'), _('Intersection_Layer'),
+               _('OBJECTID'), _('Height'), _('Height_difference'), _('X_Coordinate'),
+               _('Y_Coordinate')]
+
+def get_args():
+    """ Get and return arguments from input. """
+    parser = argparse.ArgumentParser(
+        description=_(
+            'check the correct direction of the flow, the existence endorheic basin and that' +
+            ' the surfaces at rest have no flow direction, without QGIS.'
+        )
+    )
+    parser.add_argument('dbname', help=_('database name'))
+    parser.add_argument('dbschema', help=_('database schema'))
+    parser.add_argument('user', help=_('database user'))
+    parser.add_argument('password', help=_('database password'))
+    parser.add_argument('output', help=_('output folder'))
+    parser.add_argument('rem', help=_(
+        'shapefile of the polyline with the limits of the consignment'
+    ))
+    parser.add_argument('conf', help=_('json file with the configuration of the control'))
+    parser.add_argument('-s', '--server', default='localhost', help=_('database host'))
+    parser.add_argument('-p', '--port', type=int, default=5432, help=_('database port'))
+    parser.add_argument('-tol1', '--t1', type=float, default=0.1, help=_('Z lines tolerance'))
+    parser.add_argument('-tol2', '--t2', type=float, default=0.01, help=_('Z polygon tolerance'))
+    parser.add_argument('--node-index', action='store_true', help=_(
+        'count the features meeting at the first and last vertex from an index of the lines' +
+        ' endpoints, instead of intersecting the vertex with the layer geometries'
+    ))
+    parser.add_argument('--node-precision', type=int, default=3, help=_(
+        'number of decimals of the coordinates of the endpoints index'
+    ))
+    parser.add_argument('--network', action='store_true', help=_(
+        'check the loops and the heights of the nodes of the network of all the flow layers'
+    ))
+    parser.add_argument('--tile-size', type=float, default=0, help=_(
+        'size of the tiles of the consignment extent checked independently, with the features' +
+        ' of the tile plus the buffer, 0 checks the whole layers'
+    ))
+    parser.add_argument('--buffer', type=float, default=100, help=_(
+        'buffer of the tiles, it should be larger than the features'
+    ))
+    parser.add_argument('-w', '--workers', type=int, default=1, help=_(
+        'number of worker processes, every layer is checked in its own process and the result' +
+        ' files of every control are merged'
+    ))
+    parser.add_argument('--trace', default=None, help=_(
+        'Chrome Trace Event JSON file with the time of the queries, fetches, checks and writes' +
+        ' of every process'
+    ))
+    args = parser.parse_args()
+    return args
+
+class Layer:
+    """ Class with the features of a layer and their spatial index.
+
+    Attributes:
+        name: Layer name.
+        ids: List with the id attribute of every feature.
+        geoms: Array of shapely geometries.
+        attributes: List with the attributes of every feature, without the first one.
+        tree: STRtree spatial index of the geometries.
+    """
+    __slots__ = ('name', 'ids', 'geoms', 'attributes', 'tree')
+
+    def __init__(self, name, ids, geoms, attributes):
+        self.name = name
+        self.ids = ids
+        self.geoms = geoms
+        self.attributes = attributes
+        self.tree = shapely.STRtree(geoms)
+
+    def intersecting(self, geom):
+        """ Return the sorted indexes of the features intersecting a geometry. """
+        return sorted(self.tree.query(geom, predicate='intersects'))
+
+def load_layer(cursor, schema, name, extent=None, tman=None):
+    """ Return a layer loaded from a table, with the geometries as WKB. With an extent, only
+    the features whose bounding box intersects it are loaded. With a TimeManager, the queries
+    and fetches are timed. """
+    with get_span(tman, 'query', {'table': name}):
+        cursor.execute(
+            'SELECT column_name FROM information_schema.columns ' +
+            'WHERE table_schema = %s AND table_name = %s ORDER BY ordinal_position',
+            (schema, name))
+    columns = [row[0] for row in cursor.fetchall() if row[0] != 'geom']
+    with get_span(tman, 'query', {'table': name}):
+        cursor.execute('SELECT {}, ST_AsBinary(geom) FROM {}.{}{}'.format(
+            ', '.join(columns), schema, name,
+            ' WHERE ' + get_extent_filter(schema, name, extent) if extent else ''))
+    with get_span(tman, 'fetch', {'table': name}):
+        rows = cursor.fetchall()
+    id_index = columns.index('id')
+    ids = [row[id_index] for row in rows]
+    attributes = [tuple(row[1:len(columns)]) for row in rows]
+    geoms = shapely.from_wkb([bytes(row[-1]) if row[-1] is not None else None for row in rows])
+    return Layer(name, ids, geoms, attributes)
+
+def load_layers(cursor, schema, names, extent=None, tman=None):
+    """ Return dictionary with the layers, loading every layer once. """
+    logger.info('{}.'.format(_('Constructing spatial indexes...')))
+    layers = {}
+    for name in names:
+        if name not in layers:
+            with get_span(tman, 'load', {'layer': name}):
+                layers[name] = load_layer(cursor, schema, name, extent, tman)
+    logger.info('{}.'.format(_('Finished contruction of spatial indexes...')))
+    return layers
+
+def get_geometry_layer(dir_layer):
+    """ Return the geometry of one feature of a layer. """
+    if ogr is None:
+        raise FileManagerError(_('Cannot read the consignment layer without GDAL'))
+    data_source = ogr.Open(dir_layer)
+    if data_source is None:
+        raise FileManagerError(_('Cannot read the consignment layer'))
+    geom = None
+    for feature in data_source.GetLayer():
+        geom = shapely.from_wkb(bytes(feature.GetGeometryRef().ExportToIsoWkb()))
+    return geom
+
+def init_file_manager(out_dir):
+    """ Initialize and return the file manager, and create output folders. """
+    fman = None
+    try:
+        fman = FileManager(out_dir, logger)
+    except FileManagerError as err:
+        logger.error('{}: {}'.format(_('ERROR'), str(err)), exc_info=True)
+        fman = None
+    return fman
+
+def get_height_error(geom, height, tolerance):
+    """ Return the first vertex (z, x, y) of a point or line intersection with different height
+    from the given one, None otherwise. """
+    if shapely.get_type_id(geom) not in (POINT, LINESTRING, MULTIPOINT, MULTILINESTRING):
+        return None
+    for x, y, z in shapely.get_coordinates(geom, include_z=True):
+        if abs(z - height) >= tolerance:
+            return (z, x, y)
+    return None
+
+def get_node_index(layer, precision=3):
+    """ Return the index of the first and last vertex of the lines of the layer. """
+    endpoints = []
+    for i, geom in enumerate(layer.geoms):
+        if geom is None or geom.is_empty:
+            continue
+        vertices = shapely.get_coordinates(geom, include_z=True)
+        endpoints.append((i, vertices[0], vertices[-1]))
+    return NodeIndex.from_endpoints(endpoints, precision)
+
+def get_flow_network(layers, names, precision=3, tolerance=0.0):
+    """ Return the flow network of the lines of the layers. """
+    lines = []
+    for index, name in enumerate(names):
+        layer = layers[name]
+        for i, geom in enumerate(layer.geoms):
+            if geom is None or geom.is_empty:
+                continue
+            vertices = shapely.get_coordinates(geom, include_z=True)
+            lines.append((index, layer.ids[i], vertices[0], vertices[-1]))
+    return FlowNetwork.from_lines(list(names), lines, precision, tolerance)
+
+def control_network(network, tolerance):
+    """ Return list of errors of the loops and the nodes heights of the flow network. """
+    rows = []
+    for edge in network.loops():
+        rows.append([
+            network.layers[network.edge_layer[edge]], network.edge_fid[edge], _('Error - Loop'),
+            '', '', '', ''])
+    # an edge incident to every node, to report the node
+    node_edge = np.full(len(network.node_x), -1)
+    edges = np.arange(len(network.edge_fid))
+    node_edge[network.edge_target] = edges
+    node_edge[network.edge_source] = edges
+    for node in network.height_inconsistencies(tolerance):
+        edge = node_edge[node]
+        rows.append([
+            network.layers[network.edge_layer[edge]], network.edge_fid[edge],
+            _('Error - Node height'), network.node_z_max[node],
+            network.node_z_max[node] - network.node_z_min[node],
+            network.node_x[node], network.node_y[node]])
+    logger.info('{}: {}, {}: {}.'.format(_('Network sources'), str(len(network.sources())),
+                                         _('sinks'), str(len(network.sinks()))))
+    return rows
+
+def intersects_layers(name, geom, names, layers):
+    """ Return true if exist intesection with other layers, false otherwise. """
+    for other in names:
+        if other != name and other in layers and layers[other].intersecting(geom):
+            return True
+    return False
+
+def control_1(layer, t1):
+    """ Return list of errors of the flow direction of the layer, checking the vertices of all
+    the features at once. """
+    coordinates, index = shapely.get_coordinates(layer.geoms, include_z=True, return_index=True)
+    lengths = np.bincount(index, minlength=len(layer.geoms))
+    features = np.flatnonzero(lengths)
+    offsets = get_offsets(lengths[features])
+    rows = []
+    for feature, vertex, is_previous, dif in flow_errors(coordinates[:, 2], offsets, t1):
+        x, y, z = coordinates[offsets[feature] + vertex]
+        description = _('Error - Previous vertex inflexion') if is_previous \
+            else _('Error - Relative inflexion')
+        rows.append([layer.name, layer.ids[features[feature]], description, z, abs(dif), x, y])
+    return rows
+
+def check_vertex(layer, i, vertex, names, layers, t2, rows, nodes=None):
+    """ Append the errors of the intersections of a vertex with the layer, and return the
+    number of intersections and if it has a continuity error. With a node index, only the
+    features with an endpoint in the vertex are counted. """
+    x, y, z = vertex
+    point = shapely.points(x, y, z)
+    if nodes is not None:
+        intersecting = nodes.get_fids(x, y)
+        errors = [(other_z, x, y) for _j, other_z in nodes.incident(x, y)
+                  if abs(other_z - z) >= t2]
+    else:
+        intersecting = layer.intersecting(point)
+        errors = [get_height_error(shapely.intersection(point, layer.geoms[j]), z, t2)
+                  for j in intersecting]
+    for error in errors:
+        if error:
+            rows.append([
+                layer.name, layer.ids[i], _('Error - Difference in height intersection'),
+                z, abs(error[0] - z), error[1], error[2]])
+    # If exists two intersection with the same atributes, check the continuity
+    continuity = (
+        len(intersecting) == 2 and
+        layer.attributes[intersecting[0]] == layer.attributes[intersecting[1]] and
+        not intersects_layers(layer.name, point, names, layers))
+    return len(intersecting), continuity
+
+def control(layer, layers, names, t2, nodes=None):
+    """ Return the list of errors of the intersections of the first and last vertex, the features
+    to be possible max height and the possible endorreics. """
+    rows = []
+    possible_heights = []
+    possible_endorheics = []
+    for i, geom in enumerate(layer.geoms):
+        if geom is None or geom.is_empty:
+            continue
+        vertices = shapely.get_coordinates(geom, include_z=True)
+        c_1, continuity_1 = check_vertex(layer, i, vertices[0], names, layers, t2, rows, nodes)
+        if continuity_1:
+            rows.append([layer.name, layer.ids[i], _('Error - Continuity'), '', ''])
+        c_2, continuity_2 = check_vertex(layer, i, vertices[-1], names, layers, t2, rows, nodes)
+        if continuity_2 and not continuity_1:
+            rows.append([layer.name, layer.ids[i], _('Error - Continuity'), '', ''])
+        if c_1 + c_2 == 2:
+            possible_endorheics.append(i)
+        else:
+            if c_1 == 1:
+                possible_heights.append((i, vertices[0][2]))
+            if c_2 == 1:
+                possible_heights.append((i, vertices[-1][2]))
+    return rows, possible_heights, possible_endorheics
+
+def is_max_height(layer, possible_heights, names, layers):
+    """ Return list of errors of nodes whos have not the max height. """
+    rows = []
+    for i, height in possible_heights:
+        geom = layer.geoms[i]
+        if (shapely.get_coordinates(geom, include_z=True)[:, 2] > height).any() and \
+           not intersects_layers(layer.name, geom, names, layers):
+            rows.append([
+                layer.name, layer.ids[i], _('Error - Node with no maximum height'), '', '', '', ''])
+    return rows
+
+def is_endorheic(layer, possible_endorheics, geom_rem, names, layers):
+    """ Return list of endorheic currents. """
+    rows = []
+    for i in possible_endorheics:
+        geom = layer.geoms[i]
+        if not geom.intersects(geom_rem) and not intersects_layers(layer.name, geom, names, layers):
+            rows.append([layer.name, layer.ids[i], _('Error - Endorheic'), '', '', '', ''])
+    return rows
+
+def control_4(layer, layers, names, t2):
+    """ Return list of errors of polygons without constant height, or intersecting layers with
+    different height. The heights of all the polygons are checked at once. """
+    coordinates, index = shapely.get_coordinates(layer.geoms, include_z=True, return_index=True)
+    lengths = np.bincount(index, minlength=len(layer.geoms))
+    features = np.flatnonzero(lengths)
+    offsets = get_offsets(lengths[features])
+    has_error, vertices = constant_height_errors(coordinates[:, 2], offsets, t2)
+    # The first vertex determine the height of the polygon
+    heights = coordinates[offsets[:-1], 2]
+    rows = []
+    for vertex, feature in zip(vertices, index[vertices]):
+        x, y, z = coordinates[vertex]
+        height = coordinates[offsets[np.searchsorted(features, feature)], 2]
+        rows.append([
+            layer.name, layer.ids[feature], _('Error - Polygon height'), '', '',
+            height, abs(height - z), x, y])
+    # Verify the intersection has the same height
+    for i, height in zip(features[~has_error], heights[~has_error]):
+        geom = layer.geoms[i]
+        for name in names:
+            other = layers[name]
+            # only the first line intersection error of every layer is reported
+            line_error = False
+            for j in other.intersecting(geom):
+                intersection = shapely.intersection(geom, other.geoms[j])
+                is_line = shapely.get_type_id(intersection) in (LINESTRING, MULTILINESTRING)
+                if is_line and line_error:
+                    continue
+                error = get_height_error(intersection, height, t2)
+                if error:
+                    rows.append([
+                        layer.name, layer.ids[i], _('Error - Intersection  height'), name,
+                        other.ids[j], height, height - error[0]])
+                    line_error = line_error or is_line
+    return rows
+
+def check_flow_layer(layer, layers, f_config, consignment_geometry, args):
+    """ Return list of errors of the controls 1, 2 and 3 of a flow layer. """
+    nodes = get_node_index(layer, args.node_precision) if args.node_index else None
+    rows, heights, endorheics = control(
+        layer, layers, f_config["continuidad"][layer.name], args.t2, nodes)
+    rows += is_max_height(layer, heights, f_config["endorreicas"], layers)
+    rows += is_endorheic(layer, endorheics, consignment_geometry, f_config["endorreicas"], layers)
+    rows += control_1(layer, args.t1)
+    return rows
+
+def check_area_layer(layer, layers, f_config, consignment_geometry, args):
+    """ Return list of errors of the control 4 of a constant height layer. """
+    return control_4(layer, layers, f_config["flujo"], args.t2)
+
+def get_flow_layers(f_config, name):
+    """ Return list with the layers needed by the controls 1, 2 and 3 of a flow layer. """
+    return [name] + f_config["continuidad"][name] + f_config["endorreicas"]
+
+def get_area_layers(f_config, name):
+    """ Return list with the layers needed by the control 4 of a constant height layer. """
+    return [name] + f_config["flujo"]
+
+def get_owned_ids(layer, tile, extent):
+    """ Return set with the ids of the features of the layer that belong to a tile. """
+    mask = get_owner_mask(shapely.bounds(layer.geoms), tile, extent)
+    return {layer.ids[i] for i in np.flatnonzero(mask)}
+
+def check_layers(cursor, args, f_config, jobs, names, consignment_geometry, tman=None):
+    """ Return dictionary with the list of errors of every checked layer, given the list of
+    (check function, layer name) and the layers needed. In tiling mode every tile of the
+    consignment extent is loaded and checked independently, and the errors of the features of
+    every tile are kept. """
+    extent = None
+    tiles = [None]
+    if args.tile_size > 0:
+        extent = shapely.bounds(consignment_geometry).tolist()
+        tiles = get_tiles(extent, args.tile_size)
+    rows = {name: [] for _check, name in jobs}
+    for tile in tiles:
+        if tile is not None:
+            logger.info('{}: {}.'.format(_('Tile'), str(tile)))
+        layers = load_layers(cursor, args.dbschema, names,
+                             expand_extent(tile, args.buffer) if tile else None, tman)
+        for check, name in jobs:
+            layer = layers[name]
+            with get_span(tman, check.__name__, {'layer': name, 'tile': str(tile)}):
+                errors = check(layer, layers, f_config, consignment_geometry, args)
+            if tile is not None:
+                owned = get_owned_ids(layer, tile, extent)
+                errors = [row for row in errors if row[1] in owned]
+            rows[name] += errors
+    return rows
+
+def run_layer(args, f_config, check, name, names, hrow, result_name):
+    """ Run the controls of a layer in a worker process, with its own connection and layers,
+    and write the errors to its own result file in the parts folder. Return the file name and
+    the trace events of the process. """
+    tman = TimeManager(trace=args.trace is not None)
+    consignment_geometry = get_geometry_layer(args.rem) \
+        if check is check_flow_layer or args.tile_size > 0 else None
+    conn = psycopg2.connect(host=args.server, port=args.port, database=args.dbname,
+                            user=args.user, password=args.password)
+    with conn.cursor() as cursor:
+        rows = check_layers(
+            cursor, args, f_config, [(check, name)], names, consignment_geometry, tman)
+    conn.close()
+    fman = init_file_manager(os.path.join(args.output, PARTS_DIR))
+    with tman.span('write', {'file': result_name}):
+        fman.write_csv_file(None, result_name, hrow, rows[name])
+    return result_name, tman.events
+
+def run_workers(args, f_config, fman, tman=None):
+    """ Run the controls of every layer in a pool of worker processes, and merge the result
+    files of every control. With a TimeManager, the trace events of the workers are added to
+    it. """
+    date_time = get_time().strftime("%Y%m%d_%H%M%S_")
+    jobs = []
+    for name in f_config["flujo"]:
+        jobs.append(('Control_Vertex_Height', check_flow_layer, name,
+                     get_flow_layers(f_config, name), FLOW_HEADER))
+    for name in f_config["altura_area"]:
+        jobs.append(('Control_Polygon_Height', check_area_layer, name,
+                     get_area_layers(f_config, name), AREA_HEADER))
+    parts = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = []
+        for control_name, check, name, names, hrow in jobs:
+            result_name = args.dbschema + '_' + date_time + control_name + '_' + name + '.csv'
+            parts.setdefault(control_name, []).append(result_name)
+            futures.append(executor.submit(
+                run_layer, args, f_config, check, name, names, hrow, result_name))
+        for future in as_completed(futures):
+            result_name, events = future.result()
+            if tman is not None:
+                tman.add_events(events)
+            logger.info('{}: {}.'.format(_('Finished layer file'), result_name))
+    for control_name, file_names in parts.items():
+        with get_span(tman, 'merge', {'control': control_name}):
+            fman.merge_csv_files(
+                args.dbschema + '_' + date_time + control_name + '.csv', file_names, PARTS_DIR)
+
+def main():
+    """ Main procedure. """
+    args = get_args()
+    tman = TimeManager(trace=args.trace is not None)
+    f_config = read_json_file(args.conf)
+    fman = init_file_manager(args.output)
+    with tman.span('consignment', {'file': args.rem}):
+        consignment_geometry = get_geometry_layer(args.rem)
+    extent = None
+    if args.tile_size > 0:
+        extent = expand_extent(shapely.bounds(consignment_geometry).tolist(), args.buffer)
+    if args.workers > 1:
+        run_workers(args, f_config, fman, tman)
+    # connected after the workers finished, so they do not inherit the connection
+    conn = psycopg2.connect(host=args.server, port=args.port, database=args.dbname,
+                            user=args.user, password=args.password)
+    if args.workers <= 1:
+        jobs = [(check_flow_layer, name) for name in f_config["flujo"]] + \
+            [(check_area_layer, name) for name in f_config["altura_area"]]
+        with conn.cursor() as cursor:
+            rows = check_layers(
+                cursor, args, f_config, jobs,
+                f_config["indices"] + f_config["flujo"] + f_config["altura_area"],
+                consignment_geometry, tman)
+
+        # iteration of layers to verify control 1, 2, 3
+        for name_l_flow in f_config["flujo"]:
+            date_time = get_time().strftime("%Y%m%d_%H%M%S_")
+            logger.info('{}: {}.'.format(_('Control 1,2,3: Verifing layer'), name_l_flow))
+            result_name = args.dbschema + '_' + date_time \
+                + 'Control_Vertex_Height_' + name_l_flow +'.csv'
+            with tman.span('write', {'file': result_name}):
+                fman.write_csv_file(None, result_name, FLOW_HEADER, rows[name_l_flow])
+
+        # iteration of layers to verify control 4
+        for name_l_constant_height in f_config["altura_area"]:
+            date_time = get_time().strftime("%Y%m%d_%H%M%S_")
+            logger.info('{}: {}.'.format(_('Control 4: Verifing layer'), name_l_constant_height))
+            result_name = args.dbschema + '_' + date_time + 'Control_Polygon_Height_' \
+                + name_l_constant_height +'.csv'
+            with tman.span('write', {'file': result_name}):
+                fman.write_csv_file(None, result_name, AREA_HEADER, rows[name_l_constant_height])
+
+    if args.network:
+        logger.info('{}.'.format(_('Control network: Verifing flow layers')))
+        with conn.cursor() as cursor:
+            layers = load_layers(cursor, args.dbschema, f_config["flujo"], extent, tman)
+        with tman.span('network'):
+            network = get_flow_network(layers, f_config["flujo"], args.node_precision, args.t1)
+            errors = control_network(network, args.t2)
+        result_name = args.dbschema + '_' + get_time().strftime("%Y%m%d_%H%M%S_") \
+            + 'Control_Network.csv'
+        with tman.span('write', {'file': result_name}):
+            fman.write_csv_file(None, result_name, FLOW_HEADER, errors)
+    conn.close()
+    if args.trace:
+        tman.write_trace(args.trace)
+
+    logger.info('{}.'.format(_('End')))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+""" Module with the vectorized heights checks of the hydrography, without QGIS dependencies.
+    The vertices of many features are checked at once, as one array of coordinates and the
+    offsets of the first vertex of every feature.
+
+Functions:
+  get_wkb_coordinates.
+  get_offsets.
+  flow_errors.
+  constant_height_errors.
+
+pyqgis_controls.heights
+"""
+import struct
+import numpy as np
+
+# WKB flags of Z, M and SRID in EWKB geometry types
+EWKB_Z = 0x80000000
+EWKB_M = 0x40000000
+EWKB_SRID = 0x20000000
+
+def _read_wkb(wkb, offset, parts):
+    """ Helper function to read the coordinates arrays of a WKB geometry from offset, appending
+    them to parts, and return the offset of the end of the geometry. """
+    endian = '<' if wkb[offset] == 1 else '>'
+    geometry_type = struct.unpack_from(endian + 'I', wkb, offset + 1)[0]
+    offset += 5
+    has_z = bool(geometry_type & EWKB_Z)
+    has_m = bool(geometry_type & EWKB_M)
+    if geometry_type & EWKB_SRID:
+        offset += 4
+    geometry_type &= 0x0FFFFFFF
+    dimensions, base_type = divmod(geometry_type, 1000)
+    has_z = has_z or dimensions in (1, 3)
+    has_m = has_m or dimensions in (2, 3)
+    n_dims = 2 + has_z + has_m
+    dtype = np.dtype(endian + 'f8')
+    if base_type == 1:
+        values = np.frombuffer(wkb, dtype, n_dims, offset)
+        parts.append((values.reshape(1, n_dims), has_z))
+        return offset + 8 * n_dims
+    count = struct.unpack_from(endian + 'I', wkb, offset)[0]
+    offset += 4
+    if base_type == 2:
+        values = np.frombuffer(wkb, dtype, count * n_dims, offset)
+        parts.append((values.reshape(count, n_dims), has_z))
+        return offset + 8 * count * n_dims
+    if base_type == 3:
+        for _ring in range(count):
+            n_points = struct.unpack_from(endian + 'I', wkb, offset)[0]
+            offset += 4
+            values = np.frombuffer(wkb, dtype, n_points * n_dims, offset)
+            parts.append((values.reshape(n_points, n_dims), has_z))
+            offset += 8 * n_points * n_dims
+        return offset
+    # multi geometries and collections
+    for _geometry in range(count):
+        offset = _read_wkb(wkb, offset, parts)
+    return offset
+
+def get_wkb_coordinates(wkb):
+    """ Return array with the X, Y and Z of the vertices of a WKB or EWKB geometry, with
+    Z as NaN if the geometry has no Z.
+
+    Args:
+      wkb: WKB geometry, as bytes.
+
+    Returns:
+      Array of shape (vertices, 3).
+    """
+    parts = []
+    _read_wkb(bytes(wkb), 0, parts)
+    if not parts:
+        return np.empty((0, 3))
+    coordinates = []
+    for values, has_z in parts:
+        xyz = np.full((len(values), 3), np.nan)
+        xyz[:, :2] = values[:, :2]
+        if has_z:
+            xyz[:, 2] = values[:, 2]
+        coordinates.append(xyz)
+    return np.concatenate(coordinates)
+
+def get_offsets(lengths):
+    """ Return array with the offset of the first vertex of every feature, and the total
+    number of vertices at the end, given the number of vertices of every feature. """
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+def _segment_accumulate(values, segments, ufunc):
+    """ Helper function to accumulate with maximum or minimum every segment of values
+    independently, ignoring NaN. The values are replaced by their integer rank, and every segment
+    is shifted beyond the ranks of the previous ones, so the accumulation restarts in every
+    segment and the values are recovered exactly. """
+    valid = ~np.isnan(values)
+    unique, ranks = np.unique(values[valid], return_inverse=True)
+    span = len(unique) + 2
+    sign = 1 if ufunc is np.maximum else -1
+    shifted = np.full(len(values), -1 if sign > 0 else len(unique), dtype=np.int64)
+    shifted[valid] = ranks
+    shifted += sign * segments * span
+    accumulated = ufunc.accumulate(shifted) - sign * segments * span
+    found = (accumulated >= 0) & (accumulated < len(unique))
+    result = np.full(len(values), np.nan)
+    result[found] = unique[accumulated[found]]
+    return result
+
+def flow_errors(z, offsets, t1):
+    """ Return the first flow direction error of every feature. The direction is given by the
+    first vertex with a height difference greater than the tolerance with the first vertex, and
+    the following vertices can not rise (or descend) more than the tolerance from the previous
+    vertex, nor from the lowest (or highest) height since then.
+
+    Args:
+      z: Array with the Z of the vertices of all the features.
+      offsets: Array with the offset of the first vertex of every feature, and the total number
+        of vertices at the end. Every feature has at least one vertex.
+      t1: Height tolerance.
+
+    Returns:
+      List of (feature index, vertex index, True if the error is with the previous vertex,
+      height difference) of the features with errors.
+    """
+    n_vertices = len(z)
+    if n_vertices == 0:
+        return []
+    starts = offsets[:-1]
+    segments = np.repeat(np.arange(len(starts)), np.diff(offsets))
+    index = np.arange(n_vertices)
+    first = z[starts][segments]
+    # vertex that gives the direction of every feature
+    beyond = (index > starts[segments]) & (np.abs(z - first) > t1)
+    k = np.minimum.reduceat(np.where(beyond, index, n_vertices), starts)
+    has_k = k < n_vertices
+    k_safe = np.where(has_k, k, 0)
+    up = has_k & (z[k_safe] > z[starts])
+    k_vertex = k_safe[segments]
+    up_vertex = up[segments]
+    active = has_k[segments] & (index > k_vertex)
+    # highest height since the direction vertex, or lowest since the vertex before it
+    up_values = np.where(up_vertex & (index >= k_vertex), z, np.nan)
+    down_values = np.where(~up_vertex & (index > k_vertex), z, np.nan)
+    down_values = np.where(~up_vertex & (index == k_vertex), z[np.maximum(index - 1, 0)],
+                           down_values)
+    highest = _segment_accumulate(up_values, segments, np.maximum)
+    lowest = _segment_accumulate(down_values, segments, np.minimum)
+    previous = np.concatenate(([np.nan], z[:-1]))
+    extreme = np.concatenate(([np.nan], np.where(up_vertex, highest, lowest)[:-1]))
+    previous_dif = z - previous
+    extreme_dif = z - extreme
+    previous_error = np.where(up_vertex, previous_dif < -t1, previous_dif > t1) & active
+    extreme_error = np.where(up_vertex, extreme_dif < -t1, extreme_dif > t1) & active
+    error = previous_error | extreme_error
+    first_error = np.minimum.reduceat(np.where(error, index, n_vertices), starts)
+    errors = []
+    for feature in np.flatnonzero(first_error < n_vertices):
+        vertex = first_error[feature]
+        is_previous = bool(previous_error[vertex])
+        errors.append((
+            int(feature), int(vertex - starts[feature]), is_previous,
+            float(previous_dif[vertex] if is_previous else extreme_dif[vertex])))
+    return errors
+
+def constant_height_errors(z, offsets, t2):
+    """ Return the features with vertices whose height differs from the height of their first
+    vertex, and those vertices, with one reduction for all the features.
+
+    Args:
+      z: Array with the Z of the vertices of all the features.
+      offsets: Array with the offset of the first vertex of every feature, and the total number
+        of vertices at the end. Every feature has at least one vertex.
+      t2: Height tolerance.
+
+    Returns:
+      Array with True for the features with errors, and array with the indexes of the vertices
+      with errors.
+    """
+    if len(z) == 0:
+        return np.zeros(len(offsets) - 1, dtype=bool), np.empty(0, dtype=np.int64)
+    starts = offsets[:-1]
+    segments = np.repeat(np.arange(len(starts)), np.diff(offsets))
+    difference = np.abs(z - z[starts][segments])
+    has_error = np.maximum.reduceat(difference, starts) >= t2
+    return has_error, np.flatnonzero(difference >= t2)
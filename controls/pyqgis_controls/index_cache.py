@@ -0,0 +1,67 @@
+""" Module with the on-disk cache of the spatial indexes of the layers, without QGIS
+dependencies. The feature ids, id attributes and bounding boxes of a layer are stored in a
+numpy file with the watermark of the layer, so the index of an unchanged layer is rebuilt
+without fetching its geometries.
+
+Classes:
+  IndexCache.
+
+pyqgis_controls.index_cache
+"""
+import os
+import re
+import numpy as np
+
+class IndexCache:
+    """ Class that stores the indexed data of the layers in a folder, one file per layer of
+    every database. A stored layer is valid while its watermark, like its row count, maximum id
+    and modifications, does not change.
+
+    Attributes:
+        cache_dir: Folder of the cache files.
+        database: Text that identifies the database, like its host, port and name, so layers
+            of other databases with the same names do not share files.
+    """
+    __slots__ = ('cache_dir', 'database')
+
+    def __init__(self, cache_dir, database=''):
+        self.cache_dir = cache_dir
+        self.database = database
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_path(self, schema, name):
+        """ Return the path of the cache file of a layer. """
+        prefix = re.sub(r'[^\w.-]', '_', self.database) + '.' if self.database else ''
+        return os.path.join(self.cache_dir, '{}{}.{}.npz'.format(prefix, schema, name))
+
+    def load(self, schema, name, watermark):
+        """ Return dictionary with the arrays fids, ids and bounds of a layer, None if the layer
+        is not stored or its watermark changed. """
+        path = self.get_path(schema, name)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data['watermark']) != repr(watermark):
+                    return None
+                return {key: data[key] for key in ('fids', 'ids', 'bounds')}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, schema, name, watermark, fids, ids, bounds):
+        """ Store the feature ids, id attributes and bounding boxes (xmin, ymin, xmax, ymax) of
+        a layer. Return False if the id attributes are not numbers,
+        and the layer is not stored. """
+        ids = np.asarray(ids)
+        if ids.dtype.kind not in 'iuf':
+            return False
+        path = self.get_path(schema, name)
+        # written to a temporary file and renamed, so a parallel run never reads half a file
+        temp_path = path + '.{}.tmp'.format(os.getpid())
+        with open(temp_path, 'wb') as cache_file:
+            np.savez(
+                cache_file, watermark=np.array(repr(watermark)),
+                fids=np.asarray(fids, dtype=np.int64), ids=ids,
+                bounds=np.asarray(bounds, dtype=np.float64).reshape(-1, 4))
+        os.replace(temp_path, path)
+        return True
@@ -5,31 +5,58 @@ Examples:
   $python main.py dbname dbschema user password output rem conf.  
   $python main.py dbname dbschema user password output rem conf.
   $python main.py test_vector_db duplicate_geoms test_user test_password output --server localhost --port 5432.
+  $python main.py dbname dbschema user password output rem conf --cache-mb 1024.
+  $python main.py dbname dbschema user password output rem conf --node-index.
+  $python main.py dbname dbschema user password output rem conf --batch-size 0.
+  $python main.py dbname dbschema user password output rem conf --workers 4.
+  $python main.py dbname dbschema user password output rem conf --index-cache cache.
+  $python main.py dbname dbschema user password output rem conf --tile-size 5000.
+  $python main.py dbname dbschema user password output rem conf --trace trace.json.
 
 Attributes:
   _: gettext
 
 pyqgis_controls.main
 """
+import os
 import sys
 import argparse
+import csv
 import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import OrderedDict
+import numpy as np
 import gettext
 import logging
 
 from qgis.core import QgsApplication, QgsDataSourceUri, QgsVectorLayer
-from qgis.core import QgsGeometry, QgsSpatialIndex, QgsWkbTypes, QgsFeature
+from qgis.core import QgsGeometry, QgsSpatialIndex, QgsWkbTypes, QgsFeature, QgsFeatureRequest
+from qgis.core import QgsRectangle
 from PyQt5.QtGui import *
-from src.common.time import (
-    get_time
+# add top level package to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+#pylint: disable=wrong-import-position
+from controls.commons_controls.file import FileManager, FileManagerError
+from controls.commons_controls.time import TimeManager, get_time, get_span
+from controls.pyqgis_controls.network import NodeIndex, get_fingerprint
+from controls.pyqgis_controls.index_cache import IndexCache
+from controls.pyqgis_controls.tiles import (
+    get_tiles, expand_extent, get_owner_mask, get_extent_filter
 )
-from common.file import FileManager, FileManagerError
+from controls.pyqgis_controls.heights import (
+    get_wkb_coordinates, get_offsets, flow_errors, constant_height_errors
+)
+#pylint: enable=wrong-import-position
 
 _ = gettext.gettext
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# folder of the result files of the worker processes, merged at the end
+PARTS_DIR = 'parts'
+
 def get_args():
     """ Get and return arguments from input. """
     parser = argparse.ArgumentParser(
@@ -54,6 +81,39 @@ def get_args():
     ))
     parser.add_argument('-tol1', '--t1', type=float, default=0.1, help=_('Z lines tolerance'))
     parser.add_argument('-tol2', '--t2', type=float, default=0.01, help=_('Z polygon tolerance'))
+    parser.add_argument('--cache-mb', type=int, default=256, help=_(
+        'memory budget in MB of the features cache, 0 disables the cache'
+    ))
+    parser.add_argument('--node-index', action='store_true', help=_(
+        'count the features meeting at the first and last vertex from an index of the lines' +
+        ' endpoints, instead of intersecting the vertex with the layer geometries'
+    ))
+    parser.add_argument('--node-precision', type=int, default=3, help=_(
+        'number of decimals of the coordinates of the endpoints index'
+    ))
+    parser.add_argument('--batch-size', type=int, default=10000, help=_(
+        'number of features whose vertices are checked at once, 0 checks them one by one'
+    ))
+    parser.add_argument('--index-cache', help=_(
+        'folder of the spatial indexes cache, the indexes of the layers whose row count,' +
+        ' maximum id and inserted, updated and deleted rows statistics did not change are' +
+        ' loaded from it, edits of the last second may not be in the statistics yet'
+    ))
+    parser.add_argument('--tile-size', type=float, default=0, help=_(
+        'size of the tiles of the consignment extent checked independently, with the features' +
+        ' of the tile plus the buffer, 0 checks the whole layers'
+    ))
+    parser.add_argument('--buffer', type=float, default=100, help=_(
+        'buffer of the tiles, it should be larger than the features'
+    ))
+    parser.add_argument('-w', '--workers', type=int, default=1, help=_(
+        'number of worker processes, every layer is checked in its own process and the result' +
+        ' files of every control are merged'
+    ))
+    parser.add_argument('--trace', default=None, help=_(
+        'Chrome Trace Event JSON file with the time of the indexes, checks and writes of every' +
+        ' process'
+    ))
     args = parser.parse_args()
     return args
 
@@ -68,26 +128,181 @@ def qgs_exit(qgs):
     """ Exit PyQGIS. """
     qgs.exitQgis()
 
-def create_indexes(l, u, args):
-    """ Return list and dictionary with spatial indexes. """
+class LayerRegistry:
+    """ Class that opens every layer of a schema once, and reuses it for the whole run.
+    Features fetched by id are kept in a LRU cache with a memory budget, so candidate checks
+    of the same features do not fetch them again from the database. With an extent, the layers
+    are filtered by the provider to the features whose bounding box intersects it. The id
+    attributes and bounding boxes of the indexed layers are kept, to find the features of a
+    tile without fetching them again. """
+
+    def __init__(self, uri, schema, cache_mb=0, extent=None):
+        self.uri = uri
+        self.schema = schema
+        self.extent = extent
+        self.layers = {}
+        self.fingerprints = {}
+        self.bounds = {}
+        self.cache_size = cache_mb * 1024 * 1024
+        self.cache_used = 0
+        self.cache = OrderedDict()
+
+    def get(self, name):
+        """ Return the layer, opening it the first time. """
+        if name not in self.layers:
+            self.uri.setDataSource(
+                self.schema, name, "geom",
+                get_extent_filter(self.schema, name, self.extent) if self.extent else '')
+            self.layers[name] = QgsVectorLayer(self.uri.uri(False), name, "postgres")
+        return self.layers[name]
+
+    def get_features(self, name, fids):
+        """ Return list of the features of a layer with the given ids, fetching the features
+        not in cache in one request. """
+        fids = list(fids)
+        if self.cache_size <= 0:
+            return list(get_features(self.get(name), fids))
+        missing = [fid for fid in fids if (name, fid) not in self.cache]
+        fetched = {}
+        if missing:
+            fetched = {feature.id(): feature for feature in get_features(self.get(name), missing)}
+        features = []
+        for fid in fids:
+            key = (name, fid)
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                features.append(self.cache[key][0])
+            elif fid in fetched:
+                feature = fetched[fid]
+                features.append(feature)
+                self._add(key, feature)
+        return features
+
+    def _add(self, key, feature):
+        """ Helper method to add a feature to the cache, evicting the least recently used. """
+        geometry = feature.geometry()
+        size = (geometry.constGet().wkbSize() if not geometry.isNull() else 0) + \
+            64 * len(feature.attributes())
+        self.cache[key] = (feature, size)
+        self.cache_used += size
+        while self.cache_used > self.cache_size and self.cache:
+            _key, (_feature, evicted) = self.cache.popitem(last=False)
+            self.cache_used -= evicted
+
+def get_features(layer, fids):
+    """ Return iterator of the features of a layer with the given ids, in one request. """
+    return layer.getFeatures(QgsFeatureRequest().setFilterFids(list(fids)))
+
+def get_modifications(vector_layer):
+    """ Return the number of rows inserted, updated and deleted in the table of a layer, from
+    the statistics of the database, None if the table has no statistics. """
+    uri = QgsDataSourceUri(vector_layer.dataProvider().dataSourceUri())
+    statement = "(SELECT 1 AS id, n_tup_ins, n_tup_upd, n_tup_del FROM pg_stat_user_tables\
+            WHERE schemaname = '{}' AND relname = '{}')".format(uri.schema(), uri.table())
+    uri.setDataSource('', statement, '', '', 'id')
+    for feature in QgsVectorLayer(uri.uri(False), 'modifications', 'postgres').getFeatures():
+        return tuple(int(value) for value in feature.attributes()[1:])
+    return None
+
+def get_watermark(vector_layer):
+    """ Return the row count, maximum id and modifications of a layer, that change when the
+    layer is edited, also when its geometries are updated in place. """
+    return (vector_layer.featureCount(),
+            vector_layer.maximumValue(vector_layer.fields().indexOf('id')),
+            get_modifications(vector_layer))
+
+def get_fingerprints(vector_layer):
+    """ Return dictionary with the fingerprint of the attributes of every feature of a layer,
+    without fetching the geometries. """
+    request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+    return {feature.id(): get_fingerprint(feature.attributes()[1:])
+            for feature in vector_layer.getFeatures(request)}
+
+def get_layer_data(vector_layer, fingerprints=None):
+    """ Return lists of the feature ids, id attributes and bounding boxes of a layer, NaN for
+    null geometries, in one scan. With a dictionary, the fingerprints of the attributes of
+    every feature are added to it in the same scan. """
+    fids = []
+    ids = []
+    bounds = []
+    for feature in vector_layer.getFeatures():
+        geometry = feature.geometry()
+        box = geometry.boundingBox()
+        fids.append(feature.id())
+        ids.append(feature['id'])
+        bounds.append((box.xMinimum(), box.yMinimum(), box.xMaximum(), box.yMaximum()) \
+            if not geometry.isNull() else (np.nan, ) * 4)
+        if fingerprints is not None:
+            fingerprints[feature.id()] = get_fingerprint(feature.attributes()[1:])
+    return fids, ids, bounds
+
+def load_layer_data(vector_layer, name, registry, cache, fingerprints=None):
+    """ Return lists of the feature ids, id attributes and bounding boxes of a layer, from the
+    cache if the layer did not change, and storing them in the cache otherwise. """
+    watermark = get_watermark(vector_layer)
+    data = cache.load(registry.schema, name, watermark)
+    if data is None:
+        fids, ids, bounds = get_layer_data(vector_layer, fingerprints)
+        cache.save(registry.schema, name, watermark, fids, ids, bounds)
+        return fids, ids, bounds
+    if fingerprints is not None:
+        # the geometries of a cached layer are not scanned, only its attributes
+        fingerprints.update(get_fingerprints(vector_layer))
+    return data['fids'].tolist(), data['ids'].tolist(), data['bounds'].tolist()
+
+def get_index(fids, bounds):
+    """ Return the spatial index of the bounding boxes of the features, without the null
+    geometries. """
+    index = QgsSpatialIndex()
+    for fid, box in zip(fids, bounds):
+        if not np.isnan(box[0]):
+            index.addFeature(fid, QgsRectangle(*box))
+    return index
+
+def create_indexes(l, registry, cache=None, fingerprinted=()):
+    """ Return list and dictionary with spatial indexes. With an index cache, the indexes of
+    the unchanged layers are loaded from it. The fingerprints of the attributes of the
+    features of the fingerprinted layers are kept in the registry, to compare features
+    without fetching them. """
     logger.info('{}.'.format(_('Constructing spatial indexes...')))
 
     dic_featid = {}
     l_ind = {}
 
     for i in l:
-        u.setDataSource(args.dbschema, i, "geom")
-        vector_layer = QgsVectorLayer(u.uri(False), i, "postgres")
-        it_features = vector_layer.getFeatures()
-        index = QgsSpatialIndex(it_features)
-        l_ind[i] = index
-
-        all_features = {feature.id(): feature['id'] for feature in vector_layer.getFeatures()}
-        dic_featid[i] = all_features
+        vector_layer = registry.get(i)
+        fingerprints = {} if i in fingerprinted else None
+        if cache is not None:
+            fids, ids, bounds = load_layer_data(vector_layer, i, registry, cache, fingerprints)
+        else:
+            fids, ids, bounds = get_layer_data(vector_layer, fingerprints)
+        l_ind[i] = get_index(fids, bounds)
+        dic_featid[i] = dict(zip(fids, ids))
+        registry.bounds[i] = (ids, np.asarray(bounds, dtype=np.float64).reshape(-1, 4))
+        if fingerprints is not None:
+            registry.fingerprints[i] = fingerprints
 
     logger.info('{}.'.format(_('Finished contruction of spatial indexes...')))
     return l_ind, dic_featid
 
+def get_node_index(layer, precision=3):
+    """ Return the index of the first and last vertex of the lines of the layer. """
+    endpoints = []
+    for feature in layer.getFeatures():
+        geometry = feature.geometry()
+        if geometry.isNull() or geometry.isEmpty():
+            continue
+        first = geometry.vertexAt(0)
+        last = geometry.vertexAt(geometry.constGet().vertexCount() - 1)
+        endpoints.append((
+            feature.id(), (first.x(), first.y(), first.z()), (last.x(), last.y(), last.z())))
+    return NodeIndex.from_endpoints(endpoints, precision)
+
+def get_index_cache(args):
+    """ Return the spatial indexes cache, None without cache folder. """
+    return IndexCache(args.index_cache, '{}_{}_{}'.format(args.server, args.port, args.dbname)) \
+        if args.index_cache else None
+
 def init_file_manager(out_dir):
     """ Initialize and return the file manager, and create output folders. """
     fman = None
@@ -102,10 +317,9 @@ def get_intersections_continuity(c, json_cont):
     """ Return list with the layers to intersect, given one layer. """
     return json_cont[c]
 
-def control_1(capa1, uri, args, nom_sal, fman):
+def control_1(capa1, registry, args, nom_sal, fman):
     """ Verify the correct flow of the layer. """
-    uri.setDataSource(args.dbschema, capa1, "geom")
-    capa_eje = QgsVectorLayer(uri.uri(False), capa1, "postgres")
+    capa_eje = registry.get(capa1)
     iterador_features = capa_eje.getFeatures()
     cantidad_errores = 0
     for feature in iterador_features:
@@ -173,9 +387,40 @@ def control_1(capa1, uri, args, nom_sal, fman):
                         max_altura = punto_vertice.z()
             altura_anterior = punto_vertice.z()
 
-def control(capa_verificar, c, l_capas_interectar, u, lindx, n_sal, args, df, l_continuity, fman):
+def control_1_batch(capa1, registry, args, nom_sal, fman):
+    """ Verify the correct flow of the layer, checking the vertices of batches of features
+    at once. """
+    batch = []
+    for feature in registry.get(capa1).getFeatures():
+        geometria_feature = feature.geometry()
+        if geometria_feature.isNull() or geometria_feature.isEmpty():
+            continue
+        coordinates = get_wkb_coordinates(geometria_feature.asWkb())
+        if len(coordinates) > 0:
+            batch.append((feature['id'], coordinates))
+        if len(batch) >= args.batch_size:
+            write_flow_errors(capa1, batch, args, nom_sal, fman)
+            batch = []
+    if batch:
+        write_flow_errors(capa1, batch, args, nom_sal, fman)
+
+def write_flow_errors(capa1, batch, args, nom_sal, fman):
+    """ Write the flow errors of a batch of features ids and coordinates. """
+    offsets = get_offsets([len(coordinates) for _id, coordinates in batch])
+    coordinates = np.concatenate([coordinates for _id, coordinates in batch])
+    rows = []
+    for feature, vertex, is_previous, dif in flow_errors(coordinates[:, 2], offsets, args.t1):
+        x, y, z = coordinates[offsets[feature] + vertex]
+        texto_imprimir = _('Error - Previous vertex inflexion') if is_previous \
+            else _('Error - Relative inflexion')
+        rows.append([capa1, batch[feature][0], texto_imprimir, z, abs(dif), x, y])
+    fman.append_csv_rows(nom_sal, rows)
+
+def control(capa_verificar, c, l_capas_interectar, registry, lindx, n_sal, args, df, l_continuity, fman,
+            nodes=None):
     """ Return two list. The first list has the features to be possible max height,
-     and the second list possible endorreics. """
+     and the second list possible endorreics. With a node index, the intersections of the
+     first and last vertex are taken from it. """
     posible_endorreica = []
     posible_cota_1 = []
     posible_cota_2 = []
@@ -205,9 +450,14 @@ def control(capa_verificar, c, l_capas_interectar, u, lindx, n_sal, args, df, l_
 
             primer_vertice = geometria.vertexAt(0)
             ultimo_vertice = geometria.vertexAt(n_vertices-1)
-            (c_1, c_2) = interseccion_misma_z(
-                c, u, primer_vertice, ultimo_vertice, fman, n_sal, feature_id,
-                indice_capa, args, df, lindx, lc_inter)
+            if nodes is not None:
+                (c_1, c_2) = interseccion_nodos(
+                    c, registry, nodes, primer_vertice, ultimo_vertice, fman, n_sal, feature_id,
+                    args, lindx, lc_inter)
+            else:
+                (c_1, c_2) = interseccion_misma_z(
+                    c, registry, primer_vertice, ultimo_vertice, fman, n_sal, feature_id,
+                    indice_capa, args, df, lindx, lc_inter)
 
             contador_intersecciones = c_1 + c_2
             # Posible endorreics
@@ -223,7 +473,7 @@ def control(capa_verificar, c, l_capas_interectar, u, lindx, n_sal, args, df, l_
     return (posibles_cotas, posible_endorreica)
 
 def interseccion_misma_z(
-        in_capa, in_uri, v1, v2, fman, n_out, fid, indx, args, df, lindx, lc_inter
+        in_capa, registry, v1, v2, fman, n_out, fid, indx, args, df, lindx, lc_inter
     ):
     """ Return the number of intersection of the first and last vertex with the input layer."""
     altura1 = v1.z()
@@ -233,11 +483,8 @@ def interseccion_misma_z(
     contador1 = 0
     contador2 = 0
 
-    in_uri.setDataSource(args.dbschema, in_capa, "geom")
-    capa_iterar = QgsVectorLayer(in_uri.uri(False), in_capa, "postgres")
-
     lista_i1 = indx.intersects(geom_v1.boundingBox())
-    features_intersect1 = capa_iterar.getFeatures(lista_i1)
+    features_intersect1 = registry.get_features(in_capa, lista_i1)
     lista_features_inter1 = []
 
     for feature2 in features_intersect1:
@@ -251,17 +498,17 @@ def interseccion_misma_z(
     if contador1 == 2:
         # If exists two intersection, check the continuity
         # Verify if the features have the same atributes
-        if same_feat(lista_features_inter1, capa_iterar):
+        if same_feat(lista_features_inter1, in_capa, registry):
             f = QgsFeature(fid)
             f.setGeometry(geom_v1)
 
             # Chequeo si intersecta otra capa de las definidas
-            if not interseccion_todas_capas(in_capa, f, lc_inter, lindx, args):
+            if not interseccion_todas_capas(in_capa, f, lc_inter, lindx, registry):
                 bandera_repetido = True
                 fman.append_csv_file(n_out, [in_capa, fid, _('Error - Continuity'), '', ''])
 
     lista_i2 = indx.intersects(geom_v2.boundingBox())
-    features_intersect2 = capa_iterar.getFeatures(lista_i2)
+    features_intersect2 = registry.get_features(in_capa, lista_i2)
     lista_features_inter2 = []
 
     for feature2 in features_intersect2:
@@ -272,21 +519,50 @@ def interseccion_misma_z(
             lista_features_inter2.append(feature2.id())
             interseccion_misma_z2(in_capa, geom_inter, altura2, fid, fman, n_out, args)
     if contador2 == 2:
-        if ((not bandera_repetido) and (same_feat(lista_features_inter2, capa_iterar))):
+        if ((not bandera_repetido) and (same_feat(lista_features_inter2, in_capa, registry))):
             f = QgsFeature(fid)
             f.setGeometry(geom_v2)
 
             # Verify if intersects with the other layers
-            if not interseccion_todas_capas(in_capa, f, lc_inter, lindx, args):
+            if not interseccion_todas_capas(in_capa, f, lc_inter, lindx, registry):
                 fman.append_csv_file(n_out, [in_capa, fid, _('Error - Continuity'), '', ''])
 
     return (contador1, contador2)
 
-def same_feat(lf, c):
-    """ Return True if the two features have the same atributes. """
-    feat1 = c.getFeature(lf[0])
-    feat2 = c.getFeature(lf[1])
-    return feat1.attributes()[1:] == feat2.attributes()[1:]
+def interseccion_nodos(in_capa, registry, nodes, v1, v2, fman, n_out, fid, args, lindx, lc_inter):
+    """ Return the number of features with an endpoint in the first and last vertex. """
+    contadores = []
+    bandera_repetido = False
+    for vertice in (v1, v2):
+        altura = vertice.z()
+        for _fid, z in nodes.incident(vertice.x(), vertice.y()):
+            if abs(z - altura) >= args.t2:
+                fman.append_csv_file(
+                    n_out, [
+                        in_capa, fid, _('Error - Difference in height intersection'),
+                        altura, abs(z - altura), vertice.x(), vertice.y()])
+        lista_features = nodes.get_fids(vertice.x(), vertice.y())
+        contadores.append(len(lista_features))
+        # If exists two features, check the continuity
+        if len(lista_features) == 2 and not bandera_repetido and \
+           same_feat(lista_features, in_capa, registry):
+            f = QgsFeature(fid)
+            f.setGeometry(QgsGeometry(vertice))
+            if not interseccion_todas_capas(in_capa, f, lc_inter, lindx, registry):
+                bandera_repetido = True
+                fman.append_csv_file(n_out, [in_capa, fid, _('Error - Continuity'), '', ''])
+    return (contadores[0], contadores[1])
+
+def same_feat(lf, c, registry):
+    """ Return True if the two features have the same atributes, comparing their fingerprints
+    if the layer is indexed. Return False if a feature does not exist. """
+    fingerprints = registry.fingerprints.get(c)
+    if fingerprints is not None and lf[0] in fingerprints and lf[1] in fingerprints:
+        return fingerprints[lf[0]] == fingerprints[lf[1]]
+    features = {feature.id(): feature for feature in registry.get_features(c, lf[:2])}
+    if lf[0] not in features or lf[1] not in features:
+        return False
+    return features[lf[0]].attributes()[1:] == features[lf[1]].attributes()[1:]
 
 def interseccion_misma_z2(c, g, altura, fid, fman, n_out, args):
     """ Writes in file if the intersect geometry has different height from the vertex. """
@@ -324,7 +600,7 @@ def interseccion_misma_z2(c, g, altura, fid, fman, n_out, args):
                         abs(punto.z() - altura), punto.x(), punto.y()])
                 break
 
-def is_max_height(c, c_nom, l_fid, l_ci, l_index, args):
+def is_max_height(c_nom, l_fid, l_ci, l_index, registry):
     """ Return list of errors of nodes whos have not the max height. """
     id_itera = []
     alt_itera = []
@@ -333,7 +609,7 @@ def is_max_height(c, c_nom, l_fid, l_ci, l_index, args):
         id_itera.append(fid[0])
         alt_itera.append(fid[0])
     count = 0
-    it_feat3 = c.getFeatures(id_itera)
+    it_feat3 = registry.get_features(c_nom, id_itera)
     for feat_id in it_feat3:
         geom_f = feat_id.geometry()
         vertices_f = geom_f.vertices()
@@ -343,32 +619,26 @@ def is_max_height(c, c_nom, l_fid, l_ci, l_index, args):
             if p_verti.z() > alt_itera[count]:
                 encontre = True
         if encontre:
-            ritc = interseccion_todas_capas(c_nom, feat_id, l_ci, l_index, args)
+            ritc = interseccion_todas_capas(c_nom, feat_id, l_ci, l_index, registry)
             if not ritc:
                 resultado.append([
                     c_nom, feat_id['id'], _('Error - Node with no maximum height'), '', '', '', ''])
         count = count + 1
     return resultado
 
-def is_endorreics(c, le, u, geom_remesa, l_index, l_inter, args):
+def is_endorreics(c, le, registry, geom_remesa, l_index, l_inter):
     """ Return list of endorheic currents."""
-    u.setDataSource(args.dbschema, c, "geom")
-    capa = QgsVectorLayer(u.uri(False), c, "postgres")
     resultado = []
-    for e in le:
-        f = capa.getFeature(e)
+    for f in registry.get_features(c, le):
         fid = f['id']
         if not f.geometry().intersects(geom_remesa):
-            existe_inter = interseccion_todas_capas(c, f, l_inter, l_index, args)
+            existe_inter = interseccion_todas_capas(c, f, l_inter, l_index, registry)
             if not existe_inter:
                 resultado.append([c, fid, _('Error - Endorheic'), '', '', '', ''])
     return resultado
 
-def interseccion_todas_capas(c, f, lc, l_index, args):
+def interseccion_todas_capas(c, f, lc, l_index, registry):
     """ Return true if exist intesection with other layers, false otherwise. """
-    uri2 = QgsDataSourceUri()
-    uri2.setConnection(args.server, str(args.port), args.dbname, args.user, args.password)
-
     geom = f.geometry()
     bbox_geom = geom.boundingBox()
 
@@ -376,20 +646,17 @@ def interseccion_todas_capas(c, f, lc, l_index, args):
         if cap != c:
             index_capa = l_index[cap]
             lfea = index_capa.intersects(bbox_geom)
-            uri2.setDataSource(args.dbschema, cap, "geom")
-            capa_inter = QgsVectorLayer(uri2.uri(False), cap, 'postgres')
             if lfea != []:
-                it_feat = capa_inter.getFeatures(lfea)
+                it_feat = registry.get_features(cap, lfea)
                 for f_inter in it_feat:
                     geom_inter = f_inter.geometry()
                     if geom_inter.intersects(geom):
                         return True
     return False
 
-def control_4(capa_4, uri, indices, args, nam_sal, lista_intersectar, fman):
+def control_4(capa_4, registry, indices, args, nam_sal, lista_intersectar, fman):
     """ Verify that the height is constant. """
-    uri.setDataSource(args.dbschema, capa_4, "geom")
-    capa_eje = QgsVectorLayer(uri.uri(False), capa_4, "postgres")
+    capa_eje = registry.get(capa_4)
     iterador_features = capa_eje.getFeatures()
 
     hrow = [_('Input_Layer'), _('OBJECTID'), _('Description'), _('Intersection_Layer'),
@@ -423,18 +690,57 @@ def control_4(capa_4, uri, indices, args, nam_sal, lista_intersectar, fman):
             for capa in lista_intersectar:
                 intersectar_capa(
                     capa, geometria_feature, alt_total, capa_4,
-                    feature['id'], uri, indices, args, fman, nam_sal)
+                    feature['id'], registry, indices, args, fman, nam_sal)
+
+def control_4_batch(capa_4, registry, indices, args, nam_sal, lista_intersectar, fman):
+    """ Verify that the height is constant, checking the vertices of batches of features
+    at once. """
+    hrow = [_('Input_Layer'), _('OBJECTID'), _('Description'), _('Intersection_Layer'),
+            _('OBJECTID'), _('Height'), _('Height_difference'), _('X_Coordinate'), _('Y_Coordinate')
+            ]
+    fman.start_csv_file(nam_sal, hrow)
+    batch = []
+    for feature in registry.get(capa_4).getFeatures():
+        geometria_feature = feature.geometry()
+        if geometria_feature.isNull() or geometria_feature.isEmpty():
+            continue
+        coordinates = get_wkb_coordinates(geometria_feature.asWkb())
+        if len(coordinates) > 0:
+            batch.append((feature['id'], geometria_feature, coordinates))
+        if len(batch) >= args.batch_size:
+            check_constant_height(capa_4, batch, registry, indices, args, nam_sal, lista_intersectar, fman)
+            batch = []
+    if batch:
+        check_constant_height(capa_4, batch, registry, indices, args, nam_sal, lista_intersectar, fman)
+
+def check_constant_height(capa_4, batch, registry, indices, args, nam_sal, lista_intersectar, fman):
+    """ Write the polygon height errors of a batch of features ids, geometries and coordinates,
+    and verify the intersections of the polygons without errors. """
+    offsets = get_offsets([len(coordinates) for _id, _geometry, coordinates in batch])
+    coordinates = np.concatenate([coordinates for _id, _geometry, coordinates in batch])
+    has_error, vertices = constant_height_errors(coordinates[:, 2], offsets, args.t2)
+    # The first vertex determine the height of the polygon
+    alturas = coordinates[offsets[:-1], 2]
+    features = np.searchsorted(offsets, vertices, side='right') - 1
+    fman.append_csv_rows(nam_sal, [
+        [capa_4, batch[feature][0], _('Error - Polygon height'), '', '', alturas[feature],
+         abs(alturas[feature] - coordinates[vertex][2]), coordinates[vertex][0],
+         coordinates[vertex][1]]
+        for vertex, feature in zip(vertices, features)])
+    # Verify the intersection has the same height
+    for feature in np.flatnonzero(~has_error):
+        for capa in lista_intersectar:
+            intersectar_capa(
+                capa, batch[feature][1], alturas[feature], capa_4,
+                batch[feature][0], registry, indices, args, fman, nam_sal)
 
 def intersectar_capa(
-        c, g_f, altura_pol, c_original, fea_original, uri, indexs, args, fman, nam_sal):
+        c, g_f, altura_pol, c_original, fea_original, registry, indexs, args, fman, nam_sal):
     """ Intersect with layer verifing that the height is the same. """
-    uri.setDataSource(args.dbschema, c, "geom")
-    capa_cargada = QgsVectorLayer(uri.uri(False), c, "postgres")
-
     index = indexs[c]
     hay_error = False
     lista_resultante = index.intersects(g_f.boundingBox())
-    features_intersect = capa_cargada.getFeatures(lista_resultante)
+    features_intersect = registry.get_features(c, lista_resultante)
     for f in features_intersect:
         if g_f.intersects(f.geometry()):
             geom_interseccion = g_f.intersection(f.geometry())
@@ -487,9 +793,145 @@ def load_config(dir_file_conf):
         file = json.load(json_data)
     return file
 
-if __name__ == '__main__':
+def check_flow_layer(name_l_flow, registry, l_ind, d_feat, f_config, consignment_geometry, args,
+                     result_name, fman):
+    """ Verify the controls 1, 2 and 3 of a flow layer. """
+    layer_check = registry.get(name_l_flow)
+    cotas, endorreicas = control(
+        layer_check, name_l_flow, f_config["endorreicas"],
+        registry, l_ind, result_name, args, d_feat, f_config["continuidad"], fman,
+        get_node_index(layer_check, args.node_precision) if args.node_index else None)
+    r_cota = is_max_height(
+        name_l_flow, cotas, f_config["endorreicas"], l_ind, registry)
+    r_endo = is_endorreics(
+        name_l_flow, endorreicas, registry, consignment_geometry,
+        l_ind, f_config["endorreicas"])
+    fman.append_csv_rows(result_name, r_cota)
+    fman.append_csv_rows(result_name, r_endo)
+
+    if args.batch_size > 0:
+        control_1_batch(name_l_flow, registry, args, result_name, fman)
+    else:
+        control_1(name_l_flow, registry, args, result_name, fman)
+
+def check_area_layer(name_l_constant_height, registry, l_ind, d_feat, f_config,
+                     consignment_geometry, args, result_name, fman):
+    """ Verify the control 4 of a constant height layer. """
+    if args.batch_size > 0:
+        control_4_batch(
+            name_l_constant_height, registry, l_ind, args, result_name, f_config["flujo"], fman)
+    else:
+        control_4(name_l_constant_height, registry, l_ind, args, result_name, f_config["flujo"], fman)
+
+def get_owned_ids(registry, name, tile, extent):
+    """ Return set with the ids, as text, of the features of a layer that belong to a tile,
+    from the bounding boxes kept while indexing it. """
+    if name in registry.bounds:
+        ids, bounds = registry.bounds[name]
+    else:
+        # the layer is not indexed, so it is scanned once
+        _fids, ids, bounds = get_layer_data(registry.get(name))
+    mask = get_owner_mask(bounds, tile, extent)
+    return {str(ids[i]) for i in np.flatnonzero(mask)}
+
+def append_owned_rows(tile_name, result_name, owned, header, fman):
+    """ Append the rows of the features of a tile from the tile result file to the result
+    file, with the header of the tile file if required, and remove the tile file. """
+    tile_path = os.path.join(fman.output_dir, tile_name)
+    with open(tile_path, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        hrow = next(reader, None)
+        rows = [row for row in reader if len(row) > 1 and row[1] in owned]
+    os.remove(tile_path)
+    if header:
+        fman.start_csv_file(result_name, hrow)
+    fman.append_csv_rows(result_name, rows)
+
+def check_tiles(jobs, uri, f_config, consignment_geometry, args, fman, tman=None):
+    """ Verify the layers of the list of (check function, layer name, result file name),
+    checking every tile of the consignment extent independently, with its own layers filtered
+    by the tile plus the buffer, and keep the errors of the features of every tile. """
+    box = consignment_geometry.boundingBox()
+    extent = (box.xMinimum(), box.yMinimum(), box.xMaximum(), box.yMaximum())
+    for i, tile in enumerate(get_tiles(extent, args.tile_size)):
+        logger.info('{}: {}.'.format(_('Tile'), str(tile)))
+        registry = LayerRegistry(
+            uri, args.dbschema, args.cache_mb, expand_extent(tile, args.buffer))
+        with get_span(tman, 'index', {'tile': str(tile)}):
+            l_ind, d_feat = create_indexes(
+                f_config["indices"], registry, fingerprinted=f_config["flujo"])
+        for check, name, result_name in jobs:
+            tile_name = 'tile_' + result_name
+            with get_span(tman, check.__name__, {'layer': name, 'tile': str(tile)}):
+                check(name, registry, l_ind, d_feat, f_config, consignment_geometry, args,
+                      tile_name, fman)
+            with get_span(tman, 'write', {'file': result_name}):
+                append_owned_rows(tile_name, result_name,
+                                  get_owned_ids(registry, name, tile, extent), i == 0, fman)
+
+def run_layer(args, f_config, check, name, result_name):
+    """ Run the controls of a layer in a worker process, with its own QGIS instance, layers and
+    indexes, and write the errors to its own result file in the parts folder. Return the file
+    name and the trace events of the process. """
+    tman = TimeManager(trace=args.trace is not None)
+    qgs = qgs_init(args.dirqgis)
+    uri = QgsDataSourceUri()
+    uri.setConnection(args.server, str(args.port), args.dbname, args.user, args.password)
+    fman = init_file_manager(os.path.join(args.output, PARTS_DIR))
+    consignment_geometry = get_geometry_layer(args.rem) \
+        if check is check_flow_layer or args.tile_size > 0 else None
+    if args.tile_size > 0:
+        check_tiles([(check, name, result_name)], uri, f_config, consignment_geometry, args, fman,
+                    tman)
+    else:
+        registry = LayerRegistry(uri, args.dbschema, args.cache_mb)
+        with tman.span('index'):
+            l_ind, d_feat = create_indexes(
+                f_config["indices"], registry, get_index_cache(args), f_config["flujo"])
+        with tman.span(check.__name__, {'layer': name}):
+            check(name, registry, l_ind, d_feat, f_config, consignment_geometry, args,
+                  result_name, fman)
+    qgs_exit(qgs)
+    return result_name, tman.events
+
+def run_workers(args, f_config, fman, tman=None):
+    """ Run the controls of every layer in a pool of worker processes, and merge the result
+    files of every control. With a TimeManager, the trace events of the workers are added to
+    it. """
+    date_time = get_time().strftime("%Y%m%d_%H%M%S_")
+    jobs = [('Control_Vertex_Height', check_flow_layer, name) for name in f_config["flujo"]] + \
+        [('Control_Polygon_Height', check_area_layer, name) for name in f_config["altura_area"]]
+    parts = {}
+    # every worker starts its own QGIS application, not a copy of the parent one
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as executor:
+        futures = []
+        for control_name, check, name in jobs:
+            result_name = args.dbschema + '_' + date_time + control_name + '_' + name + '.csv'
+            parts.setdefault(control_name, []).append(result_name)
+            futures.append(executor.submit(run_layer, args, f_config, check, name, result_name))
+        for future in as_completed(futures):
+            result_name, events = future.result()
+            if tman is not None:
+                tman.add_events(events)
+            logger.info('{}: {}.'.format(_('Finished layer file'), result_name))
+    for control_name, file_names in parts.items():
+        with get_span(tman, 'merge', {'control': control_name}):
+            fman.merge_csv_files(
+                args.dbschema + '_' + date_time + control_name + '.csv', file_names, PARTS_DIR)
+
+def main():
+    """ Main procedure. """
     args = get_args()
-    params = ' '.join(sys.argv)
+    tman = TimeManager(trace=args.trace is not None)
+    f_config = load_config(args.conf)
+    fman = init_file_manager(args.output)
+    if args.workers > 1:
+        run_workers(args, f_config, fman, tman)
+        if args.trace:
+            tman.write_trace(args.trace)
+        logger.info('{}.'.format(_('End')))
+        return
 
     # start qgis
     qgs = qgs_init(args.dirqgis)
@@ -498,47 +940,40 @@ if __name__ == '__main__':
     uri = QgsDataSourceUri()
     uri.setConnection(args.server, str(args.port), args.dbname, args.user, args.password)
 
-    # load configuration
-    f_config = load_config(args.conf)
-
     # initialization of variables
-    l_ind = {}
-    d_feat = {}
-    l_continuity = f_config["continuidad"]
-    fman = init_file_manager(args.output)
-    consignment_geometry = get_geometry_layer(args.rem)
-
-    l_ind, d_feat = create_indexes(f_config["indices"], uri, args)
-
-    # iteration of layers to verify control 1, 2, 3
+    with tman.span('consignment', {'file': args.rem}):
+        consignment_geometry = get_geometry_layer(args.rem)
+    jobs = []
     for name_l_flow in f_config["flujo"]:
         date_time = get_time().strftime("%Y%m%d_%H%M%S_")
-        logger.info('{}: {}.'.format(_('Control 1,2,3: Verifing layer'), name_l_flow))
-        uri.setDataSource(args.dbschema, name_l_flow, "geom")
-        layer_check = QgsVectorLayer(uri.uri(False), name_l_flow, "postgres")
         result_name = args.dbschema + '_' + date_time \
             + 'Control_Vertex_Height_' + name_l_flow +'.csv'
-        cotas, endorreicas = control(
-            layer_check, name_l_flow, f_config["endorreicas"],
-            uri, l_ind, result_name, args, d_feat, l_continuity, fman)
-        r_cota = is_max_height(
-            layer_check, name_l_flow, cotas, f_config["endorreicas"], l_ind, args)
-        r_endo = is_endorreics(
-            name_l_flow, endorreicas, uri, consignment_geometry,
-            l_ind, f_config["endorreicas"], args)
-        fman.append_csv_file(result_name, r_cota)
-        fman.append_csv_file(result_name, r_endo)
-
-        control_1(name_l_flow, uri, args, result_name, fman)
-
-    # iteration of layers to verify control 4
+        jobs.append((check_flow_layer, name_l_flow, result_name))
     for name_l_constant_height in f_config["altura_area"]:
         date_time = get_time().strftime("%Y%m%d_%H%M%S_")
-        logger.info('{}: {}.'.format(_('Control 4: Verifing layer'), name_l_constant_height))
         result_name = args.dbschema + '_' + date_time + 'Control_Polygon_Height_' \
             + name_l_constant_height +'.csv'
-        control_4(name_l_constant_height, uri, l_ind, args, result_name, f_config["flujo"], fman)
-
+        jobs.append((check_area_layer, name_l_constant_height, result_name))
+
+    if args.tile_size > 0:
+        check_tiles(jobs, uri, f_config, consignment_geometry, args, fman, tman)
+    else:
+        registry = LayerRegistry(uri, args.dbschema, args.cache_mb)
+        with tman.span('index'):
+            l_ind, d_feat = create_indexes(
+                f_config["indices"], registry, get_index_cache(args), f_config["flujo"])
+        # iteration of layers to verify control 1, 2, 3 and control 4
+        for check, name, result_name in jobs:
+            logger.info('{}: {}.'.format(_('Verifing layer'), name))
+            with tman.span(check.__name__, {'layer': name}):
+                check(name, registry, l_ind, d_feat, f_config, consignment_geometry, args,
+                      result_name, fman)
+
+    if args.trace:
+        tman.write_trace(args.trace)
     logger.info('{}.'.format(_('End')))
     # exit qgis
     qgs_exit(qgs)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+""" Module with the hydrography network structures, without QGIS dependencies.
+
+Functions:
+  get_fingerprint.
+
+Classes:
+  NodeIndex.
+  FlowNetwork.
+
+pyqgis_controls.network
+"""
+import hashlib
+import numpy as np
+
+def get_fingerprint(values):
+    """ Return a 64 bits integer hash of a list of attributes values, to compare the features
+    meeting at a node within a run. """
+    digest = hashlib.blake2b(repr(list(values)).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+class NodeIndex:
+    """ Class that maps the endpoints of the lines of a layer to their incident features.
+    Endpoints are keyed by their rounded X and Y, and keep the Z of every incidence, so heights
+    of the lines meeting at a node can be compared.
+
+    Attributes:
+        precision: Number of decimals of the rounded coordinates.
+        nodes: Dictionary from rounded (X, Y) to list of incident (feature id, Z).
+    """
+    __slots__ = ('precision', 'nodes')
+
+    def __init__(self, precision=3):
+        self.precision = precision
+        self.nodes = {}
+
+    @classmethod
+    def from_endpoints(cls, endpoints, precision=3):
+        """ Return the node index of an iterable of (feature id, first vertex, last vertex),
+        with the vertices as (X, Y, Z). """
+        index = cls(precision)
+        for fid, first, last in endpoints:
+            index.add(fid, *first)
+            index.add(fid, *last)
+        return index
+
+    def get_key(self, x, y):
+        """ Return the key of a coordinate. """
+        return (round(x, self.precision), round(y, self.precision))
+
+    def add(self, fid, x, y, z):
+        """ Add an incidence of a feature to the node of a coordinate. """
+        incidences = self.nodes.setdefault(self.get_key(x, y), [])
+        # closed lines are incident once
+        if (fid, z) not in incidences:
+            incidences.append((fid, z))
+
+    def incident(self, x, y):
+        """ Return list of (feature id, Z) incident to the node of a coordinate. """
+        return self.nodes.get(self.get_key(x, y), [])
+
+    def get_fids(self, x, y):
+        """ Return sorted list of the ids of the features incident to the node of a coordinate. """
+        return sorted({fid for fid, _z in self.incident(x, y)})
+
+    def degree(self, x, y):
+        """ Return the number of features incident to the node of a coordinate. """
+        return len(self.get_fids(x, y))
+
+class FlowNetwork:
+    """ Class with the directed graph of the hydrography lines, stored in arrays.
+    Nodes are the rounded endpoints of the lines, and every line is an edge oriented from its
+    highest to its lowest endpoint. Lines with endpoints at the same height, up to the tolerance,
+    keep their digitized direction and are marked as flat.
+
+    Attributes:
+        layers: List of the layers names.
+        node_x: Array with the X of every node.
+        node_y: Array with the Y of every node.
+        node_z_min: Array with the minimum Z of the endpoints of every node.
+        node_z_max: Array with the maximum Z of the endpoints of every node.
+        edge_layer: Array with the layer index of every edge.
+        edge_fid: Array with the feature id of every edge.
+        edge_source: Array with the source node of every edge.
+        edge_target: Array with the target node of every edge.
+        edge_flat: Array with True for the edges without height difference.
+    """
+    __slots__ = ('layers', 'node_x', 'node_y', 'node_z_min', 'node_z_max', 'edge_layer',
+                 'edge_fid', 'edge_source', 'edge_target', 'edge_flat')
+
+    def __init__(self, layers, nodes, edges, tolerance=0.0):
+        self.layers = layers
+        coordinates = np.array(nodes, dtype=np.float64).reshape(-1, 2)
+        self.node_x = coordinates[:, 0]
+        self.node_y = coordinates[:, 1]
+        self.edge_layer = np.array([edge[0] for edge in edges], dtype=np.int32)
+        self.edge_fid = np.array([edge[1] for edge in edges], dtype=np.int64)
+        first = np.array([edge[2] for edge in edges], dtype=np.int64)
+        last = np.array([edge[3] for edge in edges], dtype=np.int64)
+        z_first = np.array([edge[4] for edge in edges], dtype=np.float64)
+        z_last = np.array([edge[5] for edge in edges], dtype=np.float64)
+        self.node_z_min = np.full(len(nodes), np.inf)
+        self.node_z_max = np.full(len(nodes), -np.inf)
+        for node, z in ((first, z_first), (last, z_last)):
+            np.minimum.at(self.node_z_min, node, z)
+            np.maximum.at(self.node_z_max, node, z)
+        self.edge_flat = np.abs(z_last - z_first) <= tolerance
+        upward = z_last > z_first
+        self.edge_source = np.where(upward, last, first)
+        self.edge_target = np.where(upward, first, last)
+
+    @classmethod
+    def from_lines(cls, layers, lines, precision=3, tolerance=0.0):
+        """ Return the network of an iterable of (layer index, feature id, first vertex,
+        last vertex), with the vertices as (X, Y, Z). """
+        index = {}
+        nodes = []
+        edges = []
+        for layer, fid, first, last in lines:
+            ends = []
+            for x, y, _z in (first, last):
+                key = (round(x, precision), round(y, precision))
+                if key not in index:
+                    index[key] = len(nodes)
+                    nodes.append(key)
+                ends.append(index[key])
+            edges.append((layer, fid, ends[0], ends[1], first[2], last[2]))
+        return cls(layers, nodes, edges, tolerance)
+
+    def in_degree(self):
+        """ Return array with the number of edges flowing to every node. """
+        return np.bincount(self.edge_target, minlength=len(self.node_x))
+
+    def out_degree(self):
+        """ Return array with the number of edges flowing from every node. """
+        return np.bincount(self.edge_source, minlength=len(self.node_x))
+
+    def sinks(self):
+        """ Return array with the nodes where the flow ends. """
+        return np.flatnonzero((self.in_degree() > 0) & (self.out_degree() == 0))
+
+    def sources(self):
+        """ Return array with the nodes where the flow starts. """
+        return np.flatnonzero((self.out_degree() > 0) & (self.in_degree() == 0))
+
+    def height_inconsistencies(self, tolerance):
+        """ Return array with the nodes whose endpoints have different heights. """
+        return np.flatnonzero(self.node_z_max - self.node_z_min >= tolerance)
+
+    def loops(self):
+        """ Return array with the edges that are part of a loop, or flow to one, found as the
+        edges left by a topological sort (Kahn). Flat edges are not followed. """
+        sloped = np.flatnonzero(~self.edge_flat)
+        source = self.edge_source[sloped]
+        target = self.edge_target[sloped]
+        n_nodes = len(self.node_x)
+        # outgoing edges of every node, in compressed arrays
+        order = np.argsort(source, kind='stable')
+        offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(source, minlength=n_nodes), out=offsets[1:])
+        targets = target[order]
+        in_degree = np.bincount(target, minlength=n_nodes)
+        stack = list(np.flatnonzero(in_degree == 0))
+        removed = np.zeros(n_nodes, dtype=bool)
+        while stack:
+            node = stack.pop()
+            removed[node] = True
+            for next_node in targets[offsets[node]:offsets[node + 1]]:
+                in_degree[next_node] -= 1
+                if in_degree[next_node] == 0:
+                    stack.append(next_node)
+        return sloped[~removed[source]]
@@ -0,0 +1,63 @@
+""" Module with the tiles of the consignment extent, without QGIS dependencies.
+    Every tile is checked independently with the features intersecting the tile plus a buffer,
+    and a feature belongs to the tile with the lower left corner of its bounding box, clamped
+    to the extent, so every feature is reported by one tile.
+
+Functions:
+  get_tiles.
+  expand_extent.
+  get_owner_mask.
+  get_extent_filter.
+
+pyqgis_controls.tiles
+"""
+import math
+import numpy as np
+
+def get_tiles(extent, tile_size):
+    """ Return list of the tiles (xmin, ymin, xmax, ymax) of an extent, row by row. The last
+    tiles of every row and column are clipped to the extent. """
+    xmin, ymin, xmax, ymax = extent
+    columns = max(1, math.ceil((xmax - xmin) / tile_size))
+    rows = max(1, math.ceil((ymax - ymin) / tile_size))
+    tiles = []
+    for row in range(rows):
+        for column in range(columns):
+            tiles.append((
+                xmin + column * tile_size, ymin + row * tile_size,
+                min(xmin + (column + 1) * tile_size, xmax), min(ymin + (row + 1) * tile_size, ymax)
+            ))
+    return tiles
+
+def expand_extent(extent, buffer):
+    """ Return the extent (xmin, ymin, xmax, ymax) expanded by a buffer. """
+    xmin, ymin, xmax, ymax = extent
+    return (xmin - buffer, ymin - buffer, xmax + buffer, ymax + buffer)
+
+def get_owner_mask(bounds, tile, extent):
+    """ Return array with True for the features that belong to a tile of the extent.
+
+    Args:
+      bounds: Array of shape (features, 4) with the bounding boxes of the features, NaN for
+        empty geometries.
+      tile: Tile (xmin, ymin, xmax, ymax).
+      extent: Extent (xmin, ymin, xmax, ymax) of all the tiles.
+
+    Returns:
+      Array of booleans.
+    """
+    bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+    mask = np.ones(len(bounds), dtype=bool)
+    for axis in (0, 1):
+        corner = np.clip(bounds[:, axis], extent[axis], extent[axis + 2])
+        # tiles are half open, but the last ones include the end of the extent
+        upper = (corner < tile[axis + 2]) | \
+            ((tile[axis + 2] >= extent[axis + 2]) & (corner == tile[axis + 2]))
+        mask &= (corner >= tile[axis]) & upper
+    return mask
+
+def get_extent_filter(schema, name, extent):
+    """ Return the SQL condition of the features of a table whose bounding box intersects an
+    extent, with the SRID of the geometry column. """
+    return "geom && ST_MakeEnvelope({}, {}, {}, {}, Find_SRID('{}', '{}', 'geom'))".format(
+        *[repr(float(value)) for value in extent], schema, name)
@@ -14,8 +14,12 @@ import csv
 import os
 import shutil
 from controls.commons_controls.file import (
-  FileManager, read_json_file, read_twf_file, get_files_path
+  FileManager, FileManagerError, read_json_file, read_twf_file, get_files_path
 )
+try:
+  import pyarrow.parquet
+except ImportError:
+  pyarrow = None
 
 class TestFileManager(unittest.TestCase):
   """Class to manage unit test of FileManager methods.
@@ -86,6 +90,47 @@ class TestFileManager(unittest.TestCase):
       self._('incorrect csv row')
     )
 
+  def test_append_csv_rows(self):
+    """Unit test of FileManager method append_csv_rows."""
+    file_name = 'file_name.csv'
+    hrow = ['Header A', 'Header B', 'Header C']
+    self.fman.start_csv_file(file_name, hrow)
+    file_path = os.path.join(self.fman.output_dir, file_name)
+    rows = [['1', '1', '1'], ['2', '2', '2']]
+    self.fman.append_csv_rows(file_name, rows)
+    self.fman.append_csv_rows(file_name, [])
+    with open(file_path, 'r', newline='') as csvfile:
+      reader = csv.reader(csvfile)
+      next(reader)
+      arows = list(reader)
+    self.assertEqual(
+      rows,
+      arows,
+      self._('incorrect csv rows')
+    )
+
+  def test_merge_csv_files(self):
+    """Unit test of FileManager method merge_csv_files."""
+    dir_name = 'parts'
+    self.fman.add_dir(dir_name)
+    hrow = ['Header A', 'Header B']
+    self.fman.write_csv_file(dir_name, 'part_1.csv', hrow, [['1', '1']])
+    self.fman.write_csv_file(dir_name, 'part_2.csv', hrow, [['2', '2'], ['3', '3']])
+    merged = self.fman.merge_csv_files(
+      'merged.csv', ['part_1.csv', 'part_2.csv', 'part_3.csv'], dir_name)
+    self.assertEqual(merged, 2, self._('incorrect number of merged files'))
+    with open(os.path.join(self.fman.output_dir, 'merged.csv'), 'r', newline='') as csvfile:
+      arows = list(csv.reader(csvfile))
+    self.assertEqual(
+      [hrow, ['1', '1'], ['2', '2'], ['3', '3']],
+      arows,
+      self._('incorrect csv rows')
+    )
+    self.assertFalse(
+      os.path.isfile(os.path.join(self.fman.get_dir(dir_name), 'part_1.csv')),
+      self._('merged file not removed')
+    )
+
   def test_write_csv_file(self):
     """Unit test of FileManager method write_csv_file."""
     file_name = 'file_name.csv'
@@ -108,6 +153,65 @@ class TestFileManager(unittest.TestCase):
       self._('incorrect csv rows')
     )
 
+  def test_copy_csv_file(self):
+    """Unit test of FileManager method copy_csv_file."""
+    file_name = 'file_name.csv'
+    hrow = ['Header A', 'Header B', 'Header C']
+    file_path = os.path.join(self.fman.output_dir, file_name)
+    actual = self.fman.copy_csv_file(
+      None, file_name, hrow, lambda file: file.write('1,1,1\n2,2,2\n')
+    )
+    self.assertTrue(actual, self._('incorrect copy_csv_file return value'))
+    with open(file_path, 'r', newline='') as csvfile:
+      reader = csv.reader(csvfile)
+      arows = [next(reader), next(reader), next(reader)]
+    self.assertEqual(
+      [hrow, ['1', '1', '1'], ['2', '2', '2']],
+      arows,
+      self._('incorrect csv rows')
+    )
+    with open(file_path, 'rb') as csvfile:
+      self.assertEqual(
+        b'Header A,Header B,Header C\n1,1,1\n2,2,2\n',
+        csvfile.read(),
+        self._('incorrect csv line terminators')
+      )
+    actual = self.fman.copy_csv_file(None, file_name, hrow, lambda file: None)
+    self.assertFalse(actual, self._('incorrect copy_csv_file return value'))
+    self.assertFalse(
+      os.path.isfile(file_path),
+      self._('empty csv file was not removed')
+    )
+
+  @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+  def test_parquet_file(self):
+    """Unit test of FileManager methods start_parquet_file, append_parquet_file and
+    close_parquet_files."""
+    file_name = 'file_name.parquet'
+    columns = [('table', 'string'), ('id', 'int64'), ('geom', 'binary'), ('conform', 'bool_')]
+    with self.assertRaises(FileManagerError):
+      self.fman.append_parquet_file(file_name, [['t1', 1, b'\x01', True]])
+    self.fman.start_parquet_file(file_name, columns)
+    self.fman.append_parquet_file(file_name, [['t1', 1, b'\x01', True], ['t1', 2, None, False]])
+    self.fman.append_parquet_file(file_name, [['t2', 3, memoryview(b'\x02'), True]])
+    self.fman.close_parquet_files()
+    table = pyarrow.parquet.read_table(os.path.join(self.fman.output_dir, file_name))
+    self.assertEqual(
+      [(field.name, str(field.type)) for field in table.schema],
+      [('table', 'string'), ('id', 'int64'), ('geom', 'binary'), ('conform', 'bool')],
+      self._('incorrect parquet schema')
+    )
+    self.assertEqual(
+      table.to_pydict(),
+      {
+        'table': ['t1', 't1', 't2'],
+        'id': [1, 2, 3],
+        'geom': [b'\x01', None, b'\x02'],
+        'conform': [True, False, True]
+      },
+      self._('incorrect parquet rows')
+    )
+
   def test_write_txt_file(self):
     """Unit test of FileManager method write_txt_file."""
     file_name = 'file_name.txt'
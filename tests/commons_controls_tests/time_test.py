@@ -12,12 +12,14 @@ Classes:
 """
 import unittest
 import gettext
+import json
+import os
 import time
 from datetime import datetime
 
 
 from controls.commons_controls.time import (
-  TimeManager, TimeManagerError, TimeUnit, get_time, get_duration
+  TimeManager, TimeManagerError, TimeUnit, get_time, get_duration, get_span
 )
 
 class TestTimeManager(unittest.TestCase):
@@ -61,6 +63,81 @@ class TestTimeManager(unittest.TestCase):
     self.tman.end()
     self.assertTrue(self.tman.time(TimeUnit.second) > 0)
 
+  def test_span(self):
+    """Unit test of TimeManager methods span and timed."""
+    @self.tman.timed('read')
+    def read():
+      time.sleep(0.01)
+    for __ in range(2):
+      with self.tman.span('image'):
+        read()
+    with self.assertRaises(ValueError):
+      with self.tman.span('image'):
+        raise ValueError()
+    self.assertEqual(
+      sorted(self.tman.spans),
+      [('image',), ('image', 'read')],
+      self._('incorrect span paths')
+    )
+    self.assertEqual(self.tman.spans[('image',)][0], 3, self._('incorrect span count'))
+    self.assertEqual(self.tman.spans[('image', 'read')][0], 2, self._('incorrect span count'))
+    self.assertTrue(
+      self.tman.spans[('image',)][1] >= self.tman.spans[('image', 'read')][1] >= 2e7,
+      self._('incorrect span duration')
+    )
+
+  def test_write_trace(self):
+    """Unit test of TimeManager methods add_events and write_trace."""
+    file_path = '_common-tests-time-test-trace_.json'
+    tman = TimeManager(trace=True)
+    with tman.span('image', {'file': 'img.tif'}):
+      with tman.span('read'):
+        pass
+    tman.add_events([{'name': 'worker', 'cat': 'worker', 'ph': 'X', 'ts': 0, 'dur': 1,
+                      'pid': 0, 'tid': 0}])
+    try:
+      tman.write_trace(file_path)
+      with open(file_path, 'r', encoding='utf-8') as json_file:
+        trace = json.load(json_file)
+    finally:
+      if os.path.exists(file_path):
+        os.remove(file_path)
+    events = trace['traceEvents']
+    self.assertEqual(
+      [event['name'] for event in events],
+      ['worker', 'image', 'read'],
+      self._('incorrect trace events')
+    )
+    image, read = events[1:]
+    self.assertEqual(
+      (image['ph'], image['cat'], image['pid'], image['args']),
+      ('X', 'image', os.getpid(), {'file': 'img.tif'}),
+      self._('incorrect trace event')
+    )
+    self.assertEqual(read['cat'], 'image', self._('incorrect trace event category'))
+    self.assertTrue(
+      image['ts'] <= read['ts'] and read['ts'] + read['dur'] <= image['ts'] + image['dur'],
+      self._('incorrect trace event times')
+    )
+    self.assertEqual(TimeManager().events, [], self._('events kept without trace'))
+
+  def test_get_summary_data(self):
+    """Unit test of TimeManager methods count and get_summary_data."""
+    self.tman.start()
+    with self.tman.span('table'):
+      with self.tman.span('query'):
+        self.tman.count('rows', 5)
+    self.tman.count('rows')
+    self.tman.end()
+    summary_data = self.tman.get_summary_data()
+    self.assertEqual(
+      list(summary_data),
+      ['Time table', 'Time table/query', 'Count rows'],
+      self._('incorrect summary keys')
+    )
+    self.assertIn(', 1 calls, ', summary_data['Time table/query'], self._('incorrect summary value'))
+    self.assertEqual(summary_data['Count rows'], 6, self._('incorrect counter'))
+
 class TestTimeFunctions(unittest.TestCase):
   """Class to manage unit test of time module functions."""
 
@@ -85,6 +162,15 @@ class TestTimeFunctions(unittest.TestCase):
     val = get_duration(dts, dte, TimeUnit.second)
     # acepted error 20 miliseconds
     self.assertTrue(
-      0.998 <= val <= 1.002,
+      0.98 <= val <= 1.02,
       self._('incorrect get_duration return value')
     )
+
+  def test_get_span(self):
+    """Unit test of function get_span."""
+    with get_span(None, 'span'):
+      pass
+    tman = TimeManager()
+    with get_span(tman, 'span'):
+      pass
+    self.assertEqual(tman.spans[('span',)][0], 1, self._('incorrect span count'))
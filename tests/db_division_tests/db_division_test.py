@@ -12,7 +12,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath
 
 from controls.db_division.main import ( # pylint: disable=import-error, C0413
     db_connect, create_consignments_table, convert_consignments_srid, get_consignments,
-    create_schema, get_tables_from_original_schema, create_table, load_data
+    create_schema, get_tables_from_original_schema, create_table, load_data, load_data_single_scan,
+    create_consignments_pieces_table, finish_table, get_geometry_columns, create_view, refresh_view,
+    create_state_tables, get_changed_consignments, save_consignments_state, update_data,
+    get_primary_key
 )
 
 class TestDividisionBD(unittest.TestCase):
@@ -99,6 +102,28 @@ class TestDividisionBD(unittest.TestCase):
             self.assertEqual(len(rows), 1)
             self.assertEqual(rows[0][0], 31981)
 
+    def test_get_geometry_columns(self):
+        """Unit test of get_geometry_columns function."""
+        conn = db_connect(self.host, self.port, self.db, self.user, self.password)
+        with conn.cursor() as c:
+            geometry_columns = get_geometry_columns(c, 'cartografia_nacional_hidrografia', 'public', 'remesa_nacional')
+            self.assertEqual(len(geometry_columns), 4)
+            self.assertEqual(geometry_columns[('cartografia_nacional_hidrografia', 'agua_a')][0], 31981)
+            self.assertIn(('public', 'remesa_nacional'), geometry_columns)
+
+    def test_create_consignments_pieces_table(self):
+        """Unit test of create_consignments_pieces_table function."""
+        conn = db_connect(self.host, self.port, self.db, self.user, self.password)
+        with conn.cursor() as c:
+            pieces_table = create_consignments_pieces_table(c, 'public', 'remesa_nacional', 256)
+            self.assertEqual(pieces_table, 'remesa_nacional_pieces')
+            statement = 'SELECT COUNT(DISTINCT remesa), MAX(ST_NPoints(geom)) FROM public.remesa_nacional_pieces;'
+            c.execute(statement)
+            rows = c.fetchall()
+            self.assertEqual(len(rows), 1)
+            self.assertEqual(rows[0][0], 12)
+            self.assertLessEqual(rows[0][1], 256)
+
     def test_create_schema(self):
         """Unit test of create_schema function."""
         # create schema for the new consignment - id = rn01
@@ -144,5 +169,93 @@ class TestDividisionBD(unittest.TestCase):
             self.assertEqual(len(rows), 1)
             self.assertEqual(rows[0][0], 4455)
 
+    def test_finish_table(self):
+        """Unit test of finish_table procedure."""
+        conn = db_connect(self.host, self.port, self.db, self.user, self.password)
+        with conn.cursor() as c:
+            table_original = 'cartografia_nacional_hidrografia.agua_a'
+            table_new = 'rn01.agua_a'
+            c.execute('DROP TABLE IF EXISTS rn01.agua_a')
+            create_table(c, table_original, table_new, True)
+            load_data(c, 'public', 'remesa_nacional', 1, 'agua_a', table_original, table_new)
+            finish_table(c, table_original, table_new)
+            statement = "SELECT relpersistence FROM pg_class WHERE oid = 'rn01.agua_a'::regclass"
+            c.execute(statement)
+            rows = c.fetchall()
+            self.assertEqual(rows[0][0], 'p')
+            statement = "SELECT COUNT(*) FROM pg_indexes WHERE schemaname = 'rn01' AND tablename = 'agua_a' AND indexdef LIKE '%gist%'"
+            c.execute(statement)
+            rows = c.fetchall()
+            self.assertEqual(rows[0][0], 1)
+
+    def test_load_data_single_scan(self):
+        """Unit test of load_data_single_scan procedure."""
+        conn = db_connect(self.host, self.port, self.db, self.user, self.password)
+        with conn.cursor() as c:
+            table_name = 'agua_estancada_desconocida_a'
+            table_original = 'cartografia_nacional_hidrografia.agua_estancada_desconocida_a'
+            schemas = {1: create_schema(c, 'public', 'rn', 1)}
+            create_table(c, table_original, 'rn01.agua_estancada_desconocida_a')
+            load_data_single_scan(c, 'public', 'remesa_nacional', schemas, table_name, table_original)
+            statement = "SELECT COUNT(*) FROM rn01.agua_estancada_desconocida_a"
+            c.execute(statement)
+            rows = c.fetchall()
+            self.assertEqual(len(rows), 1)
+            self.assertEqual(rows[0][0], 4455)
+
+    def test_create_view(self):
+        """Unit test of create_view and refresh_view procedures."""
+        conn = db_connect(self.host, self.port, self.db, self.user, self.password)
+        with conn.cursor() as c:
+            table_original = 'cartografia_nacional_hidrografia.agua_estancada_desconocida_a'
+            view_new = 'rn01.agua_estancada_desconocida_a_mv'
+            c.execute('DROP MATERIALIZED VIEW IF EXISTS ' + view_new)
+            create_view(c, 'public', 'remesa_nacional', 1, table_original, view_new, True)
+            refresh_view(c, table_original, view_new)
+            statement = "SELECT COUNT(*) FROM " + view_new
+            c.execute(statement)
+            rows = c.fetchall()
+            self.assertEqual(len(rows), 1)
+            self.assertEqual(rows[0][0], 4455)
+
+    def test_get_changed_consignments(self):
+        """Unit test of get_changed_consignments and save_consignments_state functions."""
+        conn = db_connect(self.host, self.port, self.db, self.user, self.password)
+        with conn.cursor() as c:
+            c.execute('DROP TABLE IF EXISTS public.remesa_nacional_state')
+            create_state_tables(c, 'public', 'remesa_nacional')
+            changed, unchanged, removed = get_changed_consignments(c, 'public', 'remesa_nacional', 'rn')
+            self.assertEqual(len(changed), 12)
+            self.assertEqual((unchanged, removed), ([], []))
+            save_consignments_state(c, 'public', 'remesa_nacional')
+            changed, unchanged, removed = get_changed_consignments(c, 'public', 'remesa_nacional', 'rn')
+            self.assertIn(1, unchanged)
+            self.assertNotIn(1, changed)
+            self.assertEqual(removed, [])
+
+    def test_update_data(self):
+        """Unit test of update_data procedure joining the consignments pieces table."""
+        conn = db_connect(self.host, self.port, self.db, self.user, self.password)
+        with conn.cursor() as c:
+            table_name = 'agua_estancada_desconocida_a'
+            table_original = 'cartografia_nacional_hidrografia.agua_estancada_desconocida_a'
+            table_new = 'rn01.agua_estancada_desconocida_a'
+            c.execute('DROP TABLE IF EXISTS public.remesa_nacional_rows_state')
+            create_state_tables(c, 'public', 'remesa_nacional')
+            pieces_table = create_consignments_pieces_table(c, 'public', 'remesa_nacional', 256)
+            schemas = {1: create_schema(c, 'public', 'rn', 1)}
+            c.execute('DROP TABLE IF EXISTS ' + table_new)
+            create_table(c, table_original, table_new)
+            for _ in range(2):
+                update_data(c, 'public', 'remesa_nacional', pieces_table, schemas, table_name,
+                            table_original, get_primary_key(c, table_original))
+                c.execute("SELECT COUNT(*) FROM " + table_new)
+                self.assertEqual(c.fetchall()[0][0], 4455)
+            statement = "SELECT COUNT(*) FROM public.remesa_nacional_rows_state WHERE table_name = '" + table_name + "'"
+            c.execute(statement)
+            rows = c.fetchall()
+            c.execute("SELECT COUNT(*) FROM " + table_original)
+            self.assertEqual(rows[0][0], c.fetchall()[0][0])
+
 if __name__ == "__main__":
     unittest.main()
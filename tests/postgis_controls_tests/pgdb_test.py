@@ -5,13 +5,17 @@ Examples:
 
 Classes:
   TestPGDBManager.
+  TestPGDBResults.
   TestPGDBFunctions.
 """
+import io
 import unittest
 
 from controls.postgis_controls.pgdb import (
   invalid_geoms_query, duplicate_geoms_query, multipart_geoms_query, null_geoms_query,
-  point_in_geojson_geom, intersection_query, PGDBManager, PGDBConnection, PGDBCredentials
+  point_in_geojson_geom, intersection_query, to_rows, PGDBManager, PGDBManagerError,
+  PGDBConnection, PGDBCredentials, InvalidGeomResult, DuplicateGeomResult, MultipartGeomResult,
+  NullGeomResult, IntersectGeomResult
 )
 
 class TestPGDBManager(unittest.TestCase):
@@ -53,6 +57,21 @@ class TestPGDBManager(unittest.TestCase):
     actual = self.pgdb.get_schema_table_names('public')
     self.assertEqual(actual, [])
 
+  def test_copy_query_result(self):
+    """Unit test of PGDBManager method copy_query_result."""
+    self.pgdb.connect()
+    file = io.StringIO()
+    self.pgdb.copy_query_result(
+      invalid_geoms_query('invalid_geoms', 'linestrings'),
+      file
+    )
+    self.assertEqual(
+      file.getvalue(),
+      '5,Too few points in geometry component,POINT(0 0)\n'
+    )
+    with self.assertRaises(PGDBManagerError):
+      self.pgdb.copy_query_result('SELECT COUNT(*) FROM xxxx.yyyy', file)
+
   def test_get_invalid_geoms_from_table(self):
     """Unit test of PGDBManager method get_invalid_geoms_from_table."""
     self.pgdb.connect()
@@ -232,6 +251,28 @@ class TestPGDBManager(unittest.TestCase):
     )
 
 
+class TestPGDBResults(unittest.TestCase):
+  """Class to manage unit test of the results classes."""
+
+  def test_from_list_to_list(self):
+    """Unit test of results methods from_list and to_list."""
+    values = [
+      (InvalidGeomResult(), [5, 'Too few points in geometry component', 'POINT(0 0)']),
+      (DuplicateGeomResult(), [2, 2]),
+      (MultipartGeomResult(), [2, 3]),
+      (NullGeomResult(), [4]),
+      (IntersectGeomResult(), ['lines1', 1, 'lines2', 2, 'POINT(0 0)', 'crosses'])
+    ]
+    for result, arr in values:
+      result.from_list(arr)
+      self.assertEqual(result.to_list(), arr)
+      self.assertFalse(hasattr(result, '__dict__'))
+
+  def test_to_rows(self):
+    """Unit test of function to_rows."""
+    actual = list(to_rows([DuplicateGeomResult(2, 2), DuplicateGeomResult(4, 2)]))
+    self.assertEqual(actual, [[2, 2], [4, 2]])
+
 class TestPGDBFunctions(unittest.TestCase):
   """Class to manage unit test of pgdb functions."""
 
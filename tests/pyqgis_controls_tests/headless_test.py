@@ -0,0 +1,87 @@
+"""Module that contains the unit tests for controls.pyqgis_controls.headless.
+
+Examples:
+  $python -m unittest headless_test.py
+
+Classes:
+  TestHeadless.
+"""
+import unittest
+import sys
+import os
+import shapely
+
+# add top level package to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+from controls.pyqgis_controls.headless import ( # pylint: disable=import-error, C0413
+    Layer, get_height_error, control_1, control, is_endorheic, control_4, get_node_index,
+    get_owned_ids
+)
+
+class TestHeadless(unittest.TestCase):
+    """Class to manage unit test of headless methods."""
+    def setUp(self):
+        """Unit test setup."""
+        self.flow = Layer('curso_de_agua_l', [1, 2, 3], shapely.from_wkt([
+            'LINESTRING Z (0 0 10, 5 0 9, 10 0 8)',
+            'LINESTRING Z (10 0 8, 15 0 7, 20 0 6)',
+            'LINESTRING Z (0 10 5, 5 10 6, 10 10 7, 15 10 6.5)'
+        ]), [('a', ), ('a', ), ('b', )])
+        self.area = Layer('agua_a', [1, 2], shapely.from_wkt([
+            'POLYGON Z ((14 -1 7, 16 -1 7, 16 1 7, 14 1 7, 14 -1 7))',
+            'POLYGON Z ((30 30 1, 31 30 1, 31 31 2, 30 30 1))'
+        ]), [(), ()])
+        self.layers = {'curso_de_agua_l': self.flow, 'agua_a': self.area}
+
+    def test_get_height_error(self):
+        """Unit test of get_height_error function."""
+        self.assertIsNone(get_height_error(shapely.from_wkt('POINT Z (1 2 3)'), 3, 0.01))
+        self.assertEqual(get_height_error(shapely.from_wkt('POINT Z (1 2 3)'), 4, 0.01), (3, 1, 2))
+        self.assertEqual(
+            get_height_error(shapely.from_wkt('LINESTRING Z (0 0 4, 1 1 3)'), 4, 0.01), (3, 1, 1))
+        self.assertIsNone(get_height_error(shapely.from_wkt('POLYGON Z ((0 0 1, 1 0 1, 1 1 1, 0 0 1))'), 4, 0.01))
+
+    def test_control_1(self):
+        """Unit test of control_1 function."""
+        rows = control_1(self.flow, 0.1)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][:3], ['curso_de_agua_l', 3, 'Error - Previous vertex inflexion'])
+        self.assertEqual((rows[0][5], rows[0][6]), (15, 10))
+
+    def test_control(self):
+        """Unit test of control and is_endorheic functions."""
+        rows, heights, endorheics = control(self.flow, self.layers, ['agua_a'], 0.01)
+        self.assertEqual(rows, [['curso_de_agua_l', 1, 'Error - Continuity', '', ''],
+                                ['curso_de_agua_l', 2, 'Error - Continuity', '', '']])
+        self.assertEqual(heights, [(0, 10), (1, 6)])
+        self.assertEqual(endorheics, [2])
+        rem = shapely.from_wkt('LINESTRING (100 100, 200 200)')
+        self.assertEqual(is_endorheic(self.flow, [2], rem, ['agua_a'], self.layers),
+                         [['curso_de_agua_l', 3, 'Error - Endorheic', '', '', '', '']])
+
+    def test_control_node_index(self):
+        """Unit test of control function with a node index."""
+        nodes = get_node_index(self.flow)
+        self.assertEqual(nodes.get_fids(10, 0), [0, 1])
+        rows, heights, endorheics = control(self.flow, self.layers, ['agua_a'], 0.01, nodes)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(heights, [(0, 10), (1, 6)])
+        self.assertEqual(endorheics, [2])
+
+    def test_control_4(self):
+        """Unit test of control_4 function."""
+        rows = control_4(self.area, self.layers, ['curso_de_agua_l'], 0.01)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0][:3], ['agua_a', 2, 'Error - Polygon height'])
+        self.assertEqual(rows[1][:5], ['agua_a', 1, 'Error - Intersection  height', 'curso_de_agua_l', 2])
+
+    def test_get_owned_ids(self):
+        """Unit test of get_owned_ids function."""
+        extent = (0, 0, 20, 20)
+        self.assertEqual(get_owned_ids(self.flow, (0, 0, 10, 10), extent), {1})
+        self.assertEqual(get_owned_ids(self.flow, (10, 0, 20, 10), extent), {2})
+        self.assertEqual(get_owned_ids(self.flow, (0, 10, 10, 20), extent), {3})
+
+if __name__ == "__main__":
+    unittest.main()
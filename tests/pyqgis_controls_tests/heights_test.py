@@ -0,0 +1,62 @@
+"""Module that contains the unit tests for controls.pyqgis_controls.heights.
+
+Examples:
+  $python -m unittest heights_test.py
+
+Classes:
+  TestHeights.
+"""
+import unittest
+import sys
+import os
+import numpy as np
+import shapely
+
+# add top level package to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+from controls.pyqgis_controls.heights import ( # pylint: disable=import-error, C0413
+    get_wkb_coordinates, get_offsets, flow_errors, constant_height_errors
+)
+
+class TestHeights(unittest.TestCase):
+    """Class to manage unit test of heights functions."""
+    def test_get_wkb_coordinates(self):
+        """Unit test of get_wkb_coordinates function."""
+        geom = shapely.from_wkt('MULTILINESTRING Z ((0 0 10, 5 0 9), (5 0 9, 10 0 8))')
+        self.assertTrue(np.array_equal(
+            get_wkb_coordinates(shapely.to_wkb(geom, flavor='iso')),
+            shapely.get_coordinates(geom, include_z=True)))
+        self.assertTrue(np.array_equal(
+            get_wkb_coordinates(shapely.to_wkb(shapely.set_srid(geom, 31981), include_srid=True)),
+            shapely.get_coordinates(geom, include_z=True)))
+        self.assertTrue(np.isnan(get_wkb_coordinates(shapely.to_wkb(shapely.from_wkt('POINT (1 2)')))[0][2]))
+
+    def test_get_offsets(self):
+        """Unit test of get_offsets function."""
+        self.assertEqual(list(get_offsets([3, 1, 2])), [0, 3, 4, 6])
+
+    def test_flow_errors(self):
+        """Unit test of flow_errors function."""
+        profiles = [
+            [10, 9, 8, 7],
+            [10, 10.05, 9, 9.5],
+            [5, 6, 7, 6.95, 6.91, 6.85],
+            [1, 1.05, 0.95],
+            [3, 2, 1.5, 1.95, 1.6]
+        ]
+        offsets = get_offsets([len(profile) for profile in profiles])
+        errors = flow_errors(np.concatenate(profiles).astype(float), offsets, 0.1)
+        self.assertEqual([error[:3] for error in errors], [(1, 3, True), (2, 5, False), (4, 3, True)])
+        self.assertAlmostEqual(errors[1][3], -0.15)
+
+    def test_constant_height_errors(self):
+        """Unit test of constant_height_errors function."""
+        profiles = [[7, 7, 7.005, 7], [1, 1.02, 0.98, 1], [3]]
+        offsets = get_offsets([len(profile) for profile in profiles])
+        has_error, vertices = constant_height_errors(np.concatenate(profiles).astype(float), offsets, 0.01)
+        self.assertEqual(list(has_error), [False, True, False])
+        self.assertEqual(list(vertices), [5, 6])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Module that contains the unit tests for controls.pyqgis_controls.index_cache.
+
+Examples:
+  $python -m unittest index_cache_test.py
+
+Classes:
+  TestIndexCache.
+"""
+import unittest
+import sys
+import os
+import shutil
+import numpy as np
+
+# add top level package to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+from controls.pyqgis_controls.index_cache import IndexCache # pylint: disable=import-error, C0413
+
+class TestIndexCache(unittest.TestCase):
+    """Class to manage unit test of IndexCache methods."""
+    def setUp(self):
+        """Unit test setup."""
+        self.cache = IndexCache('_pyqgis-tests-index-cache-dir_')
+
+    def test_save_load(self):
+        """Unit test of save and load methods."""
+        self.assertIsNone(self.cache.load('hidrografia', 'agua_a', (2, 20)))
+        self.assertTrue(self.cache.save(
+            'hidrografia', 'agua_a', (2, 20), [1, 2], [10, 20],
+            [(0, 0, 1, 1), (1, 1, 2, 2)]))
+        data = self.cache.load('hidrografia', 'agua_a', (2, 20))
+        self.assertEqual(data['fids'].tolist(), [1, 2])
+        self.assertEqual(data['ids'].tolist(), [10, 20])
+        self.assertNotIn('fingerprints', data)
+        np.testing.assert_array_equal(data['bounds'], [[0, 0, 1, 1], [1, 1, 2, 2]])
+        self.assertIsNone(self.cache.load('hidrografia', 'agua_a', (3, 21)))
+        self.assertIsNone(self.cache.load('hidrografia', 'curso_de_agua_l', (2, 20)))
+
+    def test_save_not_numbers(self):
+        """Unit test of save method with id attributes that are not numbers."""
+        self.assertFalse(self.cache.save('hidrografia', 'agua_a', (1, 'a'), [1], ['a'],
+                                        [(0, 0, 1, 1)]))
+        self.assertIsNone(self.cache.load('hidrografia', 'agua_a', (1, 'a')))
+
+    def test_database(self):
+        """Unit test of the cache files of layers with the same names in other databases."""
+        other = IndexCache(self.cache.cache_dir, 'localhost_5432_other/db')
+        self.assertNotEqual(other.get_path('hidrografia', 'agua_a'),
+                            self.cache.get_path('hidrografia', 'agua_a'))
+        self.assertEqual(os.path.dirname(other.get_path('hidrografia', 'agua_a')),
+                         self.cache.cache_dir)
+        self.assertTrue(self.cache.save(
+            'hidrografia', 'agua_a', (2, 20), [1, 2], [10, 20], [(0, 0, 1, 1), (1, 1, 2, 2)]))
+        self.assertIsNone(other.load('hidrografia', 'agua_a', (2, 20)))
+
+    def tearDown(self):
+        """Unit test tear down."""
+        shutil.rmtree(self.cache.cache_dir)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Module that contains the unit tests for controls.pyqgis_controls.network.
+
+Examples:
+  $python -m unittest network_test.py
+
+Classes:
+  TestFingerprint.
+  TestNodeIndex.
+  TestFlowNetwork.
+"""
+import unittest
+import sys
+import os
+
+# add top level package to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+from controls.pyqgis_controls.network import NodeIndex, FlowNetwork, get_fingerprint # pylint: disable=import-error, C0413
+
+class TestFingerprint(unittest.TestCase):
+    """Class to manage unit test of get_fingerprint function."""
+    def test_get_fingerprint(self):
+        """Unit test of get_fingerprint function."""
+        self.assertEqual(get_fingerprint(['a', 1]), get_fingerprint(('a', 1)))
+        self.assertNotEqual(get_fingerprint(['a', 1]), get_fingerprint(['a', 2]))
+
+class TestNodeIndex(unittest.TestCase):
+    """Class to manage unit test of NodeIndex methods."""
+    def setUp(self):
+        """Unit test setup."""
+        self.index = NodeIndex.from_endpoints([
+            (1, (0, 0, 10), (10, 0, 8)),
+            (2, (10.0001, 0, 8.5), (20, 0, 6)),
+            (3, (5, 5, 5), (5, 5, 5))
+        ])
+
+    def test_incident(self):
+        """Unit test of incident method."""
+        self.assertEqual(self.index.incident(10, 0), [(1, 8), (2, 8.5)])
+        self.assertEqual(self.index.incident(30, 0), [])
+
+    def test_degree(self):
+        """Unit test of get_fids and degree methods."""
+        self.assertEqual(self.index.get_fids(10, 0), [1, 2])
+        self.assertEqual(self.index.degree(0, 0), 1)
+        self.assertEqual(self.index.degree(5, 5), 1)
+        self.assertEqual(NodeIndex.from_endpoints([(1, (0, 0, 0), (1, 0, 0)), (2, (0.01, 0, 0), (2, 0, 0))], 1).degree(0, 0), 2)
+
+class TestFlowNetwork(unittest.TestCase):
+    """Class to manage unit test of FlowNetwork methods."""
+    def setUp(self):
+        """Unit test setup."""
+        self.network = FlowNetwork.from_lines(['curso_de_agua_l'], [
+            (0, 1, (0, 0, 10), (10, 0, 8)),
+            (0, 2, (20, 0, 6), (10, 0, 8)),
+            (0, 3, (20, 0, 6), (30, 0, 4)),
+            (0, 4, (50, 0, 1), (40, 0, 1)),
+            (0, 5, (0, 10, 5), (10, 10, 4)),
+            (0, 6, (10, 10, 4), (10, 20, 3)),
+            (0, 7, (10, 20, 3), (0, 10, 2))
+        ], tolerance=0.01)
+
+    def test_edges(self):
+        """Unit test of edges orientation."""
+        self.assertEqual(list(self.network.edge_source[:3]), [0, 1, 2])
+        self.assertEqual(list(self.network.edge_target[:3]), [1, 2, 3])
+        self.assertEqual(list(self.network.edge_flat), [False, False, False, True, False, False, False])
+
+    def test_sinks_sources(self):
+        """Unit test of sinks and sources methods."""
+        self.assertEqual(list(self.network.sources()), [0, 4])
+        self.assertEqual(list(self.network.sinks()), [3, 5])
+
+    def test_loops(self):
+        """Unit test of loops and height_inconsistencies methods."""
+        self.assertEqual(list(self.network.edge_fid[self.network.loops()]), [5, 6, 7])
+        self.assertEqual(list(self.network.height_inconsistencies(0.01)), [6])
+
+if __name__ == "__main__":
+    unittest.main()
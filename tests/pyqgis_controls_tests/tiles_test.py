@@ -0,0 +1,48 @@
+"""Module that contains the unit tests for controls.pyqgis_controls.tiles.
+
+Examples:
+  $python -m unittest tiles_test.py
+
+Classes:
+  TestTiles.
+"""
+import unittest
+import sys
+import os
+import numpy as np
+
+# add top level package to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+from controls.pyqgis_controls.tiles import ( # pylint: disable=import-error, C0413
+    get_tiles, expand_extent, get_owner_mask, get_extent_filter
+)
+
+class TestTiles(unittest.TestCase):
+    """Class to manage unit test of tiles functions."""
+    def test_get_tiles(self):
+        """Unit test of get_tiles function."""
+        self.assertEqual(get_tiles((0, 0, 25, 10), 10), [
+            (0, 0, 10, 10), (10, 0, 20, 10), (20, 0, 25, 10)])
+        self.assertEqual(get_tiles((0, 0, 0, 0), 10), [(0, 0, 0, 0)])
+        self.assertEqual(expand_extent((0, 0, 25, 10), 5), (-5, -5, 30, 15))
+
+    def test_get_owner_mask(self):
+        """Unit test of get_owner_mask function, every feature belongs to one tile."""
+        extent = (0, 0, 20, 20)
+        bounds = np.array([
+            (1, 1, 2, 2), (9, 9, 12, 12), (10, 0, 11, 1), (-5, 15, 3, 16), (20, 20, 25, 25),
+            (-10, -10, -8, -8), (np.nan, np.nan, np.nan, np.nan)])
+        masks = np.array([get_owner_mask(bounds, tile, extent) for tile in get_tiles(extent, 10)])
+        self.assertEqual(masks.sum(axis=0).tolist(), [1, 1, 1, 1, 1, 1, 0])
+        self.assertEqual(masks[0].tolist(), [True, True, False, False, False, True, False])
+        self.assertEqual(masks[3].tolist(), [False, False, False, False, True, False, False])
+
+    def test_get_extent_filter(self):
+        """Unit test of get_extent_filter function."""
+        self.assertEqual(
+            get_extent_filter('hidrografia', 'agua_a', (0, 1, 2, 3.5)),
+            "geom && ST_MakeEnvelope(0.0, 1.0, 2.0, 3.5, Find_SRID('hidrografia', 'agua_a', 'geom'))")
+
+if __name__ == "__main__":
+    unittest.main()